@@ -1,10 +1,8 @@
+# Primeiro import: marca o início da carga (tempo até o app ficar pronto)
+from aquecimento import aquecer_textblob, carregar_textblob, estado_aquecimento, iniciar_aquecimento, marcar_pronto
 from flask import Flask, render_template, request, jsonify, session, Response, redirect, url_for, flash, has_request_context
 from flask_socketio import SocketIO, emit
-import imaplib
-import email
-from email.header import decode_header
 import re
-from textblob import TextBlob
 import threading
 import time
 import datetime
@@ -15,6 +13,39 @@ import secrets
 import hashlib
 import sqlite3
 import os
+import socket
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pool_imap import PoolIMAPAssincrono
+from motor_imap import (
+    ITENS_MESSAGE_ID, MAX_TENTATIVAS_UID, avancar_checkpoint, compactar_conjunto, dividir_em_lotes,
+    extrair_message_id, init_tabelas_motor, limite_do_checkpoint, limpar_falhas_uid, obter_metadados_caixa,
+    registrar_falhas_uid
+)
+import motor_imap_async
+from motor_imap_async import (
+    ErroIMAP, LoopIMAP, fetch_em_lotes, listar_em_fluxo, selecionar_uids_pendentes,
+    suporta_condstore, message_ids_da_pasta, consulta_gmail, pre_classificar_no_servidor,
+    duplicatas_por_gm_msgid, RegistroCaixa, pastas_existentes, comandos_para_criar, registrar_pasta,
+    remetentes_novos_da_pasta, pular_mensagens_da_pasta, exemplos_novos_da_pasta, nome_pasta_imap,
+    iniciar_checkpoint_sem_historico, em_executor,
+    TEMPO_IDLE_SEGUNDOS
+)
+from pipeline_organizacao import executar_pipeline
+from parser_email import decodificar_cabecalho, extrair_corpo, ler_cabecalhos
+from classificador import (
+    CAMPOS_REGRA, CATEGORIAS_PALAVRAS, ClassificadorRegras, classificar_por_cabecalhos, classificar_por_palavras
+)
+from sentimento import LEXICO, NEGACOES, LIMITE_NEGATIVO, LIMITE_POSITIVO, categorias_por_sentimento
+from cache_classificacao import CacheClassificacao, init_tabela_cache, versao_regras
+from indice_remetentes import (
+    LIMITE_APRENDIZADO_PASTA, IndiceRemetentes, init_tabela_indice, pasta_aprendivel, registrar_observacoes
+)
+from modelo_bayes import (
+    LIMITE_TREINO_PASTA, ModeloBayes, chave_checkpoint, init_tabela_bayes, remover_modelo, resumo_modelo,
+    texto_do_email, treinar
+)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = secrets.token_hex(16)
@@ -100,12 +131,58 @@ def init_database():
         )
     ''')
     
+    # Regras de classificação definidas pelo usuário
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_rules (
+            regra_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            campo TEXT NOT NULL,
+            valor TEXT NOT NULL,
+            prioridade INTEGER DEFAULT 0,
+            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    ''')
+    
+    # Contas com modo push (IMAP IDLE) ativo
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS push_enrollments (
+            user_id TEXT PRIMARY KEY,
+            excluir_inbox BOOLEAN DEFAULT 1,
+            ativado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    ''')
+    
+    # Lease das vigias push: um só processo (host:pid) mantém as sessões IDLE
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS push_lease (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            dono TEXT NOT NULL,
+            expira_em REAL NOT NULL
+        )
+    ''')
+    
     # Índices para melhor performance
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_id ON user_activities(user_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_timestamp ON user_activities(timestamp)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_action ON user_activities(action)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_invite_created_by ON invite_codes(created_by)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_invite_used ON invite_codes(used)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_rules_user_id ON user_rules(user_id)')
+    
+    # Tabelas do motor IMAP (checkpoints de sincronização etc.)
+    init_tabelas_motor()
+    
+    # Cache de classificação por conteúdo
+    init_tabela_cache()
+    
+    # Índice remetente → categoria
+    init_tabela_indice()
+    
+    # Modelos Naive Bayes por usuário
+    init_tabela_bayes()
     
     # Inserir usuário admin padrão se não existir
     cursor.execute('SELECT COUNT(*) FROM users WHERE user_id = ?', ('admin',))
@@ -424,6 +501,175 @@ def remover_credenciais_gmail(user_id):
         print(f"Erro ao remover credenciais Gmail: {e}")
         return False
 
+# ===============================
+# CONTAS NO MODO PUSH (IMAP IDLE)
+# ===============================
+def ativar_push_usuario(user_id, excluir_inbox=True):
+    """Inscreve o usuário no modo push"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO push_enrollments (user_id, excluir_inbox, ativado_em)
+            VALUES (?, ?, ?)
+        ''', (user_id, excluir_inbox, datetime.datetime.now().isoformat()))
+        
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Erro ao ativar modo push: {e}")
+        return False
+
+def desativar_push_usuario(user_id):
+    """Remove o usuário do modo push"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM push_enrollments WHERE user_id = ?', (user_id,))
+        
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Erro ao desativar modo push: {e}")
+        return False
+
+def renovar_lease_push(dono):
+    """Obtém (se livre ou vencido) ou renova o lease das vigias push; True se `dono` o detém"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        agora = time.time()
+        
+        cursor.execute('INSERT OR IGNORE INTO push_lease (id, dono, expira_em) VALUES (1, ?, 0)', (dono,))
+        cursor.execute('''
+            UPDATE push_lease SET dono = ?, expira_em = ?
+            WHERE id = 1 AND (dono = ? OR expira_em < ?)
+        ''', (dono, agora + DURACAO_LEASE_PUSH, dono, agora))
+        obtido = cursor.rowcount == 1
+        
+        conn.commit()
+        conn.close()
+        return obtido
+    except Exception as e:
+        print(f"Erro ao renovar lease do modo push: {e}")
+        return False
+
+def liberar_lease_push(dono):
+    """Libera o lease (se `dono` o detém), para outro processo assumir sem esperar o vencimento"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('UPDATE push_lease SET expira_em = 0 WHERE id = 1 AND dono = ?', (dono,))
+        
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Erro ao liberar lease do modo push: {e}")
+        return False
+
+def obter_inscricoes_push():
+    """Retorna [{'user_id', 'excluir_inbox'}] de todas as contas no modo push"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT user_id, excluir_inbox FROM push_enrollments')
+        
+        inscricoes = [{'user_id': row[0], 'excluir_inbox': bool(row[1])} for row in cursor.fetchall()]
+        conn.close()
+        return inscricoes
+    except Exception as e:
+        print(f"Erro ao obter inscrições do modo push: {e}")
+        return []
+
+# ===============================
+# REGRAS DE CLASSIFICAÇÃO DO USUÁRIO
+# ===============================
+def listar_regras_usuario(user_id):
+    """Retorna as regras do usuário em ordem de prioridade"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT regra_id, categoria, campo, valor, prioridade FROM user_rules
+            WHERE user_id = ?
+            ORDER BY prioridade, regra_id
+        ''', (user_id,))
+        
+        regras = [
+            {'id': row[0], 'categoria': row[1], 'campo': row[2], 'valor': row[3], 'prioridade': row[4]}
+            for row in cursor.fetchall()
+        ]
+        conn.close()
+        return regras
+    except Exception as e:
+        print(f"Erro ao listar regras: {e}")
+        return []
+
+def adicionar_regra_usuario(user_id, categoria, campo, valor, prioridade=0):
+    """Cria uma regra e retorna seu id (ou None em caso de erro)"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO user_rules (user_id, categoria, campo, valor, prioridade, criado_em)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (user_id, categoria, campo, valor, prioridade, datetime.datetime.now().isoformat()))
+        regra_id = cursor.lastrowid
+        
+        conn.commit()
+        conn.close()
+        invalidar_regras_usuario(user_id)
+        return regra_id
+    except Exception as e:
+        print(f"Erro ao adicionar regra: {e}")
+        return None
+
+def atualizar_regra_usuario(user_id, regra_id, categoria, campo, valor, prioridade=0):
+    """Altera uma regra do usuário; False se ela não existir"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE user_rules SET categoria = ?, campo = ?, valor = ?, prioridade = ?
+            WHERE regra_id = ? AND user_id = ?
+        ''', (categoria, campo, valor, prioridade, regra_id, user_id))
+        alterada = cursor.rowcount > 0
+        
+        conn.commit()
+        conn.close()
+        invalidar_regras_usuario(user_id)
+        return alterada
+    except Exception as e:
+        print(f"Erro ao atualizar regra: {e}")
+        return False
+
+def remover_regra_usuario(user_id, regra_id):
+    """Remove uma regra do usuário; False se ela não existir"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM user_rules WHERE regra_id = ? AND user_id = ?', (regra_id, user_id))
+        removida = cursor.rowcount > 0
+        
+        conn.commit()
+        conn.close()
+        invalidar_regras_usuario(user_id)
+        return removida
+    except Exception as e:
+        print(f"Erro ao remover regra: {e}")
+        return False
+
 # ===============================
 # ESTATÍSTICAS DO USUÁRIO
 # ===============================
@@ -717,7 +963,22 @@ def exportar_atividades_csv(user_id=None):
 # CONFIGURAÇÕES
 # ===============================
 SERVIDOR_IMAP = "imap.gmail.com"
-LIMITE_EMAILS = 2000
+LIMITE_EMAILS = 10000  # Por execução; o fluxo mantém a memória limitada (None = sem limite)
+MODO_LISTAGEM = "cabecalhos"  # "cabecalhos" (cabeçalhos primeiro, corpo sob demanda) ou "completo" (RFC822)
+CONEXOES_PARALELAS = 4  # Conexões usadas na listagem da INBOX (1 = sem paralelismo)
+PRE_CLASSIFICACAO_GMAIL = False  # Classifica primeiro pelo índice de busca do Gmail (X-GM-RAW), sem baixar
+MODO_MARCADORES_GMAIL = False  # No Gmail, aplica marcadores (X-GM-LABELS) em vez de copiar para pastas
+TAMANHO_LOTE_APLICACAO = 1000  # Máximo de UIDs por comando ao aplicar uma categoria (MOVE, COPY/STORE ou marcadores)
+LOTE_MINIMO_APLICACAO = 100  # UIDs acumulados de uma categoria que já disparam o comando, durante o fluxo
+ESPERA_MAXIMA_APLICACAO = 5  # Segundos que um UID classificado aguarda, no máximo, pelo comando da categoria
+MOTOR_SENTIMENTO = "lexico"  # "lexico" (léxico PT/EN com NumPy, em lote) ou "textblob" (um e-mail por vez)
+USAR_CACHE_CLASSIFICACAO = True  # Reaproveita a categoria de e-mails com o mesmo conteúdo (memória + SQLite)
+USAR_INDICE_REMETENTES = True  # Classifica remetentes conhecidos pelo índice aprendido, antes do corpo
+APRENDER_DAS_PASTAS = True  # Antes de organizar, lê o From das mensagens novas em cada pasta de categoria
+USAR_BAYES = True  # Usa o Naive Bayes do usuário (se treinado) antes das palavras-chave e o atualiza com as pastas
+MAX_CLASSIFICACOES_USUARIOS = 50  # Regras e modelos de usuários mantidos em memória (LRU)
+DURACAO_LEASE_PUSH = 60  # Segundos de validade do lease das vigias push (renovado a cada terço)
+AQUECER_NA_INICIALIZACAO = True  # Após o boot, carrega em segundo plano o que o primeiro job usaria (TextBlob etc.)
 INTERVALO_SEGUNDOS = 3 * 60 * 60  # 3 horas
 TIMEOUT_CONEXAO = 30  # Timeout de conexão em segundos
 MAX_ERROS_CONSECUTIVOS = 10  # Máximo de erros antes de parar
@@ -729,15 +990,26 @@ agendador_ativo = False
 agendador_thread = None
 stop_event = threading.Event()
 
-# Função auxiliar para emitir eventos com contexto
-def emit_evento(evento, dados):
-    """Emite eventos WebSocket com contexto de aplicação"""
+# Eventos emitidos de dentro do loop IMAP saem por esta thread (uma só: mantém a ordem)
+executor_eventos = ThreadPoolExecutor(max_workers=1, thread_name_prefix="EventosSocketIO")
+
+def _emitir(evento, dados):
     try:
         socketio.emit(evento, dados)
         socketio.sleep(0)  # Permite que o evento seja processado
     except Exception as e:
         print(f"Erro ao emitir evento {evento}: {e}")
 
+# Função auxiliar para emitir eventos com contexto
+def emit_evento(evento, dados):
+    """Emite eventos WebSocket com contexto de aplicação (sem bloquear o loop IMAP)"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        _emitir(evento, dados)
+    else:
+        executor_eventos.submit(_emitir, evento, dados)
+
 # ===============================
 # DECORADORES DE AUTENTICAÇÃO
 # ===============================
@@ -788,53 +1060,167 @@ def admin_required(f):
 def limpar_texto(texto):
     return re.sub(r"[^a-zA-Z0-9áéíóúãõâêôçÁÉÍÓÚÃÕÂÊÔÇ ]", "", texto)
 
-def classificar_email(assunto, corpo):
-    texto = f"{assunto} {corpo}".lower()
-    categorias = {
-        "Faturas": ["boleto", "pagamento", "vencimento", "conta", "nota fiscal", "pix"],
-        "Trabalho": ["projeto", "relatório", "reunião", "anexo", "cliente", "documento"],
-        "Pessoal": ["amizade", "convite", "parabéns", "evento", "família"],
-        "Marketing": ["promoção", "desconto", "oferta", "newsletter", "cupom"],
-        "Sistema": ["erro", "bug", "alerta", "sistema", "login"],
-    }
-    for categoria, palavras in categorias.items():
-        if any(p in texto for p in palavras):
-            return categoria
-    
-    # Análise de sentimento com fallback
+# Operadores de busca do Gmail somados às palavras na pré-classificação
+OPERADORES_GMAIL = {
+    "Marketing": ["category:promotions"],
+}
+
+# Uma busca X-GM-RAW por categoria, na mesma ordem de prioridade
+CONSULTAS_GMAIL = [
+    (categoria, consulta_gmail(palavras, OPERADORES_GMAIL.get(categoria, ())))
+    for categoria, palavras in CATEGORIAS_PALAVRAS.items()
+]
+
+def sentimento_textblob(texto):
+    """Categoria pela polaridade do TextBlob (MOTOR_SENTIMENTO = "textblob"), importado no primeiro uso"""
     try:
-        blob = TextBlob(texto)
-        sentimento = blob.sentiment.polarity
-        if sentimento < -0.1:
+        TextBlob = carregar_textblob()
+        sentimento = TextBlob(texto).sentiment.polarity
+        if sentimento < LIMITE_NEGATIVO:
             return "Problemas"
-        elif sentimento > 0.3:
+        elif sentimento > LIMITE_POSITIVO:
             return "Positivos"
     except Exception:
         # Se TextBlob falhar, retorna categoria padrão
         pass
-    
     return "Neutros"
 
-def conectar_email(email_usuario, senha, log_callback=None):
+def classificar_conteudo(emails, regras=None, bayes=None):
+    """
+    Classifica um lote de e-mails ({'assunto', 'corpo'[, 'remetente', 'list_id']}):
+    regras do usuário (ClassificadorRegras), previsões confiáveis do Naive
+    Bayes do usuário (ModeloBayes, o lote inteiro de uma vez), palavras-chave
+    e, para os que não casarem, análise de sentimento do lote inteiro de uma vez.
+    """
+    textos = [f"{e['assunto']} {e['corpo']}".lower() for e in emails]
+    if regras:
+        categorias = [
+            regras.categoria(e.get("remetente", ""), e.get("list_id", ""), e["assunto"], e["corpo"])
+            for e in emails
+        ]
+    else:
+        categorias = [None] * len(emails)
+    
+    if bayes:
+        sem_regra = [i for i, categoria in enumerate(categorias) if not categoria]
+        for i, categoria in zip(sem_regra, bayes.prever([texto_do_email(emails[i]) for i in sem_regra])):
+            categorias[i] = categoria
+    
+    categorias = [categoria or classificar_por_palavras(texto) for categoria, texto in zip(categorias, textos)]
+    
+    sem_categoria = [i for i, categoria in enumerate(categorias) if not categoria]
+    if sem_categoria:
+        restantes = [textos[i] for i in sem_categoria]
+        if MOTOR_SENTIMENTO == "textblob":
+            sentimentos = [sentimento_textblob(texto) for texto in restantes]
+        else:
+            sentimentos = categorias_por_sentimento(restantes)
+        for i, categoria in zip(sem_categoria, sentimentos):
+            categorias[i] = categoria
+    
+    return categorias
+
+# Cache por conteúdo; a versão muda (e o cache antigo é descartado) se as regras mudarem
+VERSAO_REGRAS_PADRAO = versao_regras(
+    CATEGORIAS_PALAVRAS, MOTOR_SENTIMENTO, LEXICO, NEGACOES, LIMITE_NEGATIVO, LIMITE_POSITIVO
+)
+CACHE_CLASSIFICACAO = CacheClassificacao(VERSAO_REGRAS_PADRAO) if USAR_CACHE_CLASSIFICACAO else None
+CLASSIFICACAO_PADRAO = {'regras': None, 'bayes': None, 'cache': CACHE_CLASSIFICACAO}
+
+# Regras compiladas e modelo por usuário: user_id -> {'regras', 'bayes', 'cache'} (LRU)
+classificacao_usuarios = OrderedDict()
+trava_classificacao_usuarios = threading.Lock()
+
+def classificacao_do_usuario(user_id):
+    """
+    Retorna {'regras': ClassificadorRegras ou None, 'bayes': ModeloBayes ou None,
+    'cache': CacheClassificacao ou None} do usuário. Regras e modelo são lidos
+    do banco uma vez; o resultado vale até a próxima edição ou treino
+    (invalidar_regras_usuario) ou até sair da LRU de MAX_CLASSIFICACOES_USUARIOS.
+    Sem regras nem modelo próprios, o usuário usa a classificação padrão e o
+    cache compartilhado.
+    """
+    if not user_id:
+        return CLASSIFICACAO_PADRAO
+    
+    with trava_classificacao_usuarios:
+        classificacao = classificacao_usuarios.get(user_id)
+        if classificacao is not None:
+            classificacao_usuarios.move_to_end(user_id)
+        else:
+            linhas = [(r['categoria'], r['campo'], r['valor']) for r in listar_regras_usuario(user_id)]
+            regras = ClassificadorRegras(linhas)
+            bayes = ModeloBayes.carregar(user_id) if USAR_BAYES else None
+            if regras.vazio and not bayes:
+                classificacao = CLASSIFICACAO_PADRAO
+            else:
+                cache = None
+                if USAR_CACHE_CLASSIFICACAO:
+                    versao = versao_regras(VERSAO_REGRAS_PADRAO, linhas, bayes.versao if bayes else None)
+                    cache = CacheClassificacao(versao, escopo=user_id)
+                classificacao = {'regras': None if regras.vazio else regras, 'bayes': bayes, 'cache': cache}
+            classificacao_usuarios[user_id] = classificacao
+            if len(classificacao_usuarios) > MAX_CLASSIFICACOES_USUARIOS:
+                classificacao_usuarios.popitem(last=False)
+    return classificacao
+
+def invalidar_regras_usuario(user_id):
+    """Descarta as regras compiladas e o modelo do usuário; a próxima classificação os recarrega"""
+    with trava_classificacao_usuarios:
+        classificacao_usuarios.pop(user_id, None)
+
+def classificar_emails(emails, user_id=None):
+    """
+    Categorias de um lote de e-mails. Os que já vêm com 'categoria' (decidida
+    pelos cabeçalhos) a mantêm; os demais são buscados no cache de
+    classificação e só os desconhecidos passam por classificar_conteudo,
+    com as regras e o modelo do usuário.
+    """
+    categorias = [e.get("categoria") for e in emails]
+    pendentes = [i for i, categoria in enumerate(categorias) if not categoria]
+    if pendentes:
+        classificacao = classificacao_do_usuario(user_id)
+        regras, bayes = classificacao['regras'], classificacao['bayes']
+        lote = [emails[i] for i in pendentes]
+        if classificacao['cache']:
+            novas = classificacao['cache'].classificar(lote, lambda restantes: classificar_conteudo(restantes, regras, bayes))
+        else:
+            novas = classificar_conteudo(lote, regras, bayes)
+        for i, categoria in zip(pendentes, novas):
+            categorias[i] = categoria
+    return categorias
+
+def classificar_email(assunto, corpo):
+    return classificar_emails([{"assunto": assunto, "corpo": corpo}])[0]
+
+async def conectar_email(email_usuario, senha, log_callback=None):
     """Conecta ao servidor Gmail via IMAP com tratamento de erros e timeout"""
     try:
         if log_callback:
             log_callback(f"🔌 Iniciando conexão com {SERVIDOR_IMAP}...")
         
         # Timeout de 30 segundos para conexão
-        imap = imaplib.IMAP4_SSL(SERVIDOR_IMAP, timeout=30)
+        imap = motor_imap_async.ClienteIMAPAssincrono(SERVIDOR_IMAP, timeout=TIMEOUT_CONEXAO)
+        await imap.conectar()
         
         if log_callback:
             log_callback(f"🔐 Autenticando usuário: {email_usuario}")
         
-        imap.login(email_usuario, senha)
+        # Capacidades já conhecidas da conta dispensam o CAPABILITY após o login
+        metadados = await em_executor(obter_metadados_caixa, email_usuario)
+        try:
+            await imap.login(email_usuario, senha, capacidades=metadados['capabilities'] if metadados else None)
+        except Exception:
+            await imap.logout()
+            raise
+        imap.registro = RegistroCaixa(email_usuario)
         
         if log_callback:
             log_callback(f"✅ Conexão estabelecida com sucesso!")
         
         return imap
         
-    except imaplib.IMAP4.error as e:
+    except ErroIMAP as e:
         erro_msg = str(e).lower()
         if 'authentication failed' in erro_msg or 'invalid credentials' in erro_msg:
             raise Exception("❌ ERRO DE AUTENTICAÇÃO\n\n"
@@ -852,125 +1238,530 @@ def conectar_email(email_usuario, senha, log_callback=None):
         raise Exception(f"❌ Erro ao conectar ao servidor: {str(e)}\n\n"
                        "Verifique sua conexão com a internet.")
 
-def listar_emails(imap, limite=LIMITE_EMAILS, log_callback=None, progress_callback=None):
-    """Lista emails com tratamento de erro e timeout"""
-    try:
+# Todos os jobs IMAP rodam como corrotinas neste único event loop
+loop_imap = LoopIMAP()
+
+# Sessões autenticadas reaproveitadas entre execuções (por conta); as ociosas
+# são fechadas por uma tarefa periódica no loop IMAP
+pool_conexoes = PoolIMAPAssincrono(conectar_email, loop=loop_imap)
+
+# Uma organização por conta de cada vez (manual ou modo push)
+travas_organizacao = {}
+
+def trava_da_conta(conta):
+    """Retorna o asyncio.Lock da conta (usar dentro do loop IMAP)"""
+    return travas_organizacao.setdefault(conta.strip().lower(), asyncio.Lock())
+
+async def selecionar_emails(imap, limite=LIMITE_EMAILS, log_callback=None, conta=None):
+    """Seleciona a INBOX e retorna os UIDs a processar (no máximo `limite`; None = todos)"""
+    if log_callback:
+        log_callback(f"📬 Selecionando caixa de entrada (INBOX)...")
+    
+    # UIDs em vez de números de sequência; com `conta`, só o que chegou após o checkpoint
+    ids, incremental = await selecionar_uids_pendentes(imap, conta, "INBOX")
+    
+    if log_callback:
+        log_callback(f"🔍 Buscando e-mails na caixa de entrada...")
+    
+    if ids is None:
         if log_callback:
-            log_callback(f"📬 Selecionando caixa de entrada (INBOX)...")
-        
-        imap.select("INBOX")
-        
+            log_callback(f"❌ Erro ao buscar e-mails na INBOX")
+        return []
+    
+    total_inbox = len(ids)
+    limite_real = total_inbox if limite is None else min(limite, total_inbox)
+    
+    if incremental:
+        # Mais antigos primeiro, para o checkpoint nunca pular e-mails novos
+        ids_para_processar = ids[:limite_real]
         if log_callback:
-            log_callback(f"🔍 Buscando e-mails na caixa de entrada...")
-        
-        status, mensagens = imap.search(None, "ALL")
-        if status != "OK":
-            if log_callback:
-                log_callback(f"❌ Erro ao buscar e-mails. Status: {status}")
-            return []
-        
-        ids = mensagens[0].split()
-        total_inbox = len(ids)
-        limite_real = min(limite, total_inbox)
-        
+            log_callback(f"📊 E-mails novos desde a última execução: {total_inbox}")
+            log_callback(f"📥 Carregando {limite_real} e-mails novos...")
+    else:
+        ids_para_processar = ids[-limite_real:] if limite_real else []
         if log_callback:
             log_callback(f"📊 Total de e-mails encontrados: {total_inbox}")
             log_callback(f"📥 Carregando os últimos {limite_real} e-mails...")
-        
-        emails = []
-        ids_para_processar = ids[-limite_real:]
-        erros_consecutivos = 0
-        max_erros = 10  # Máximo de erros consecutivos antes de parar
-        
-        for idx, num in enumerate(ids_para_processar, 1):
-            try:
-                if progress_callback:
-                    percentual_listagem = (idx / limite_real) * 100
-                    progress_callback(idx / limite_real, f"Carregando e-mails: {idx}/{limite_real} ({int(percentual_listagem)}%)")
-                
-                if log_callback and idx % 50 == 0:
-                    log_callback(f"📖 Carregados {idx}/{limite_real} e-mails...")
-                
-                # Timeout individual para cada fetch
-                status, data = imap.fetch(num, "(RFC822)")
-                if status != "OK":
-                    erros_consecutivos += 1
-                    if erros_consecutivos >= max_erros:
-                        if log_callback:
-                            log_callback(f"⚠️ Muitos erros consecutivos. Parando listagem.")
-                        break
-                    continue
-                
-                # Reseta contador de erros em caso de sucesso
-                erros_consecutivos = 0
-                
-                msg = email.message_from_bytes(data[0][1])
-                assunto, cod = decode_header(msg["Subject"])[0]
-                if isinstance(assunto, bytes):
-                    assunto = assunto.decode(cod or "utf-8", errors="ignore")
-                
-                corpo = ""
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain":
-                        corpo += part.get_payload(decode=True).decode(errors="ignore")
-                
-                emails.append({
-                    "id": num,
-                    "assunto": assunto or "(Sem assunto)",
-                    "corpo": corpo
-                })
-                
-            except Exception as e:
+    
+    return ids_para_processar
+
+async def listar_emails(imap, ids, log_callback=None, progress_callback=None, modo=MODO_LISTAGEM, conexoes_extras=None,
+                        regras=None, indice=None, palavras=True):
+    """
+    Gera os e-mails dos UIDs em fluxo, bloco a bloco, sem montar a lista
+    inteira na memória (ver pipeline_organizacao). `regras` (ClassificadorRegras
+    do usuário) e `indice` (IndiceRemetentes) entram na decisão só pelos
+    cabeçalhos, antes de baixar o corpo; `palavras=False` deixa as
+    palavras-chave para depois do corpo (usuário com modelo Naive Bayes).
+    """
+    total = len(ids)
+    
+    # Conexões extras leem a INBOX em modo somente leitura, em paralelo com a principal
+    extras = []
+    for extra in conexoes_extras or []:
+        try:
+            if (await extra.select("INBOX", readonly=True))[0] == "OK":
+                extras.append(extra)
+        except Exception:
+            pass
+    if extras and log_callback:
+        log_callback(f"🔀 Buscando em paralelo com {len(extras) + 1} conexões")
+    
+    if modo == "cabecalhos":
+        async for registro in listar_em_fluxo(
+            imap,
+            ids,
+            lambda registro: classificar_por_cabecalhos(registro, regras, indice, palavras),
+            progress_callback=progress_callback,
+            usar_uid=True,
+            conexoes_extras=extras
+        ):
+            yield registro
+        return
+    
+    erros_consecutivos = 0
+    max_erros = 10  # Máximo de erros consecutivos antes de parar
+    
+    # Um FETCH por lote (ex.: 1001:1200) em vez de um por mensagem
+    idx = 0
+    async for num, itens in fetch_em_lotes(imap, ids, "(RFC822)", usar_uid=True, conexoes_extras=extras):
+        idx += 1
+        try:
+            if progress_callback:
+                percentual_listagem = (idx / total) * 100
+                progress_callback(idx / total, f"Carregando e-mails: {idx}/{total} ({int(percentual_listagem)}%)")
+            
+            if log_callback and idx % 50 == 0:
+                log_callback(f"📖 Carregados {idx}/{total} e-mails...")
+            
+            if not itens or 'RFC822' not in itens:
                 erros_consecutivos += 1
-                if log_callback and idx % 10 == 0:
-                    log_callback(f"⚠️ Erro ao processar e-mail {idx}: {str(e)[:50]}")
-                
                 if erros_consecutivos >= max_erros:
                     if log_callback:
-                        log_callback(f"❌ Muitos erros consecutivos ({max_erros}). Parando listagem.")
+                        log_callback(f"⚠️ Muitos erros consecutivos. Parando listagem.")
                     break
                 continue
-        
+            
+            # Reseta contador de erros em caso de sucesso
+            erros_consecutivos = 0
+            
+            # Só cabeçalhos e um trecho limitado da primeira parte de texto
+            cabecalhos = ler_cabecalhos(itens['RFC822'])
+            remetente = decodificar_cabecalho(cabecalhos["From"])
+            
+            yield {
+                "id": num,
+                "assunto": decodificar_cabecalho(cabecalhos["Subject"]) or "(Sem assunto)",
+                "corpo": extrair_corpo(itens['RFC822'], cabecalhos=cabecalhos),
+                "remetente": remetente,
+                "list_id": decodificar_cabecalho(cabecalhos["List-Id"]),
+                "categoria": indice.categoria(remetente) if indice else None
+            }
+            
+        except Exception as e:
+            erros_consecutivos += 1
+            if log_callback and idx % 10 == 0:
+                log_callback(f"⚠️ Erro ao processar e-mail {idx}: {str(e)[:50]}")
+            
+            if erros_consecutivos >= max_erros:
+                if log_callback:
+                    log_callback(f"❌ Muitos erros consecutivos ({max_erros}). Parando listagem.")
+                break
+            continue
+
+async def mover_email(imap, email_id, categoria, log_callback=None):
+    """Move email com tratamento robusto de erros (email_id: UID ou conjunto como 1:40,45)"""
+    try:
         if log_callback:
-            log_callback(f"✅ {len(emails)} e-mails carregados com sucesso!")
+            log_callback(f"📤 Movendo e-mail para: {categoria}")
         
-        return emails
+        # CREATE (só se a pasta não consta nos metadados), COPY e STORE vão juntos
+        # no socket (um round trip); email_id é um UID ou conjunto de UIDs.
+        *_, copia, marcacao = await imap.pipeline(await comandos_para_criar(imap, categoria) + [
+            ('UID', 'COPY', email_id, nome_pasta_imap(categoria)),
+            ('UID', 'STORE', email_id, '+FLAGS.SILENT', '(\\Deleted)')
+        ])
+        
+        if isinstance(copia, Exception) or copia[0] != "OK":
+            if log_callback:
+                motivo = copia if isinstance(copia, Exception) else copia[1][0]
+                log_callback(f"⚠️ Falha ao copiar e-mail para {categoria}: {str(motivo)[:100]}")
+            # A pasta anotada pode ter sido apagada: o próximo lote refaz o LIST
+            await registrar_pasta(imap, categoria, existe=False)
+            # O STORE já foi enviado: desfaz a marcação para o e-mail não ser expurgado
+            if not isinstance(marcacao, Exception) and marcacao[0] == "OK":
+                await imap.uid('STORE', email_id, '-FLAGS.SILENT', '(\\Deleted)')
+            return False
+        
+        await registrar_pasta(imap, categoria)
+        
+        if isinstance(marcacao, Exception) or marcacao[0] != "OK":
+            if log_callback:
+                log_callback(f"⚠️ E-mail copiado, mas não marcado para exclusão: {str(marcacao)[:100]}")
+            return False
+        
+        return True
         
     except Exception as e:
         if log_callback:
-            log_callback(f"❌ Erro ao listar e-mails: {str(e)}")
-        raise
+            log_callback(f"⚠️ Erro ao mover e-mail: {str(e)[:100]}")
+        return False
 
-def mover_email(imap, email_id, categoria, log_callback=None):
-    """Move email com tratamento robusto de erros"""
+async def mover_com_move(imap, conjunto, categoria, log_callback=None):
+    """
+    UID MOVE (RFC 6851): copia e retira da INBOX em um único comando,
+    sem \\Deleted nem EXPUNGE posterior.
+    """
     try:
         if log_callback:
-            log_callback(f"📁 Criando/verificando pasta: {categoria}")
+            log_callback(f"🚚 Movendo e-mails para: {categoria}")
         
-        # Ignora erro se pasta já existe
-        try:
-            imap.create(categoria)
-        except:
-            pass  # Pasta já existe
+        # CREATE só se a pasta não consta nos metadados da conexão
+        *_, movimento = await imap.pipeline(await comandos_para_criar(imap, categoria) + [
+            ('UID', 'MOVE', conjunto, nome_pasta_imap(categoria))
+        ])
+        
+        if isinstance(movimento, Exception) or movimento[0] != "OK":
+            if log_callback:
+                motivo = movimento if isinstance(movimento, Exception) else movimento[1][0]
+                log_callback(f"⚠️ Falha ao mover e-mails para {categoria}: {str(motivo)[:100]}")
+            await registrar_pasta(imap, categoria, existe=False)
+            return False
         
+        await registrar_pasta(imap, categoria)
+        return True
+    
+    except Exception as e:
         if log_callback:
-            log_callback(f"📤 Copiando e-mail para: {categoria}")
+            log_callback(f"⚠️ Erro ao mover e-mails: {str(e)[:100]}")
+        return False
+
+async def aplicar_marcador(imap, conjunto, categoria, remover_inbox=True, log_callback=None):
+    """
+    Modo marcadores (Gmail): adiciona o marcador da categoria ao conjunto de UIDs
+    e, opcionalmente, tira o marcador \\Inbox. Nada é copiado nem expurgado.
+    """
+    try:
+        # Marcadores seguem a mesma codificação dos nomes de pasta
+        comandos = [('UID', 'STORE', conjunto, '+X-GM-LABELS', f'({nome_pasta_imap(categoria)})')]
+        if remover_inbox:
+            comandos.append(('UID', 'STORE', conjunto, '-X-GM-LABELS', '(\\Inbox)'))
         
-        imap.copy(email_id, categoria)
+        respostas = await imap.pipeline(comandos)
+        marcacao = respostas[0]
         
-        if log_callback:
-            log_callback(f"🗑️ Marcando e-mail original para exclusão")
+        if isinstance(marcacao, Exception) or marcacao[0] != "OK":
+            if log_callback:
+                motivo = marcacao if isinstance(marcacao, Exception) else marcacao[1][0]
+                log_callback(f"⚠️ Falha ao aplicar o marcador {categoria}: {str(motivo)[:100]}")
+            # A remoção do \Inbox já foi enviada: devolve as mensagens à INBOX
+            if remover_inbox and not isinstance(respostas[1], Exception) and respostas[1][0] == "OK":
+                await imap.uid('STORE', conjunto, '+X-GM-LABELS', '(\\Inbox)')
+            return False
         
-        imap.store(email_id, '+FLAGS', '\\Deleted')
+        # O Gmail cria o marcador que ainda não existe
+        await registrar_pasta(imap, categoria)
         
-        return True
+        if remover_inbox and (isinstance(respostas[1], Exception) or respostas[1][0] != "OK"):
+            if log_callback:
+                log_callback(f"⚠️ Marcador {categoria} aplicado, mas as mensagens continuam na INBOX")
         
+        return True
+    
     except Exception as e:
         if log_callback:
-            log_callback(f"⚠️ Erro ao mover e-mail: {str(e)[:100]}")
+            log_callback(f"⚠️ Erro ao aplicar marcador: {str(e)[:100]}")
+        return False
+
+async def mover_pre_classificados(imap, ids, aplicar_lote, log_callback=None):
+    """
+    Classifica pelo índice de busca do Gmail e aplica cada categoria de uma vez,
+    sem baixar as mensagens. Retorna os UIDs que sobraram para a classificação local.
+    """
+    atribuidos = await pre_classificar_no_servidor(imap, ids, CONSULTAS_GMAIL)
+    if not atribuidos:
+        return ids
+    
+    por_categoria = {}
+    for uid, categoria in atribuidos.items():
+        por_categoria.setdefault(categoria, []).append(uid)
+    
+    for categoria, uids in por_categoria.items():
+        await aplicar_lote(categoria, sorted(uids))
+    
+    if log_callback:
+        log_callback(f"⚡ {len(atribuidos)} e-mails classificados pelo índice de busca do Gmail, sem download")
+    
+    return [uid for uid in ids if int(uid) not in atribuidos]
+
+async def aprender_remetentes_das_pastas(imap, conta, log_callback=None):
+    """
+    Lê o From das mensagens novas de cada pasta de categoria (inclusive as
+    movidas à mão pelo usuário) e as soma ao índice de remetentes da conta.
+    Retorna True se as pastas foram lidas.
+    """
+    pastas = await pastas_existentes(imap)
+    if pastas is None:
         return False
+    
+    observacoes = []
+    for pasta in sorted(p for p in pastas if pasta_aprendivel(p)):
+        try:
+            remetentes = await remetentes_novos_da_pasta(imap, conta, pasta, LIMITE_APRENDIZADO_PASTA)
+        except Exception:
+            remetentes = None
+        if remetentes:
+            observacoes.extend((remetente, pasta) for remetente in remetentes)
+    
+    registrados = await em_executor(registrar_observacoes, conta, observacoes)
+    if log_callback and observacoes:
+        log_callback(f"🧭 {len(observacoes)} mensagens novas nas pastas → {registrados} rotas de remetente atualizadas")
+    return True
+
+async def treinar_bayes_das_pastas(imap, conta, user_id, log_callback=None, progress_callback=None):
+    """
+    Soma ao modelo Naive Bayes do usuário as mensagens novas de cada pasta de
+    categoria (assunto + começo do corpo), com checkpoint próprio por pasta.
+    Retorna o número de mensagens usadas, ou None se as pastas não puderem ser lidas.
+    """
+    pastas = await pastas_existentes(imap)
+    if pastas is None:
+        return None
+    
+    pastas = sorted(p for p in pastas if pasta_aprendivel(p))
+    usados = 0
+    for idx, pasta in enumerate(pastas, 1):
+        if progress_callback:
+            progress_callback(idx / len(pastas), f"🧠 Lendo {pasta} ({idx}/{len(pastas)})")
+        try:
+            exemplos = await exemplos_novos_da_pasta(
+                imap, conta, pasta, chave_checkpoint(user_id, pasta), LIMITE_TREINO_PASTA
+            )
+        except Exception as e:
+            if log_callback:
+                log_callback(f"⚠️ Não foi possível ler {pasta}: {str(e)[:100]}")
+            continue
+        if exemplos:
+            # Treino fora do event loop (tokenização + contagens)
+            usados += await em_executor(treinar, user_id, [(pasta, texto_do_email(e)) for e in exemplos])
+    
+    invalidar_regras_usuario(user_id)
+    if log_callback and usados:
+        log_callback(f"🧠 {usados} mensagens novas das pastas somadas ao modelo Naive Bayes")
+    return usados
+
+async def organizar_uids(imap, ids, conta, log_callback=None, progress_callback=None, conexoes_extras=None,
+                         excluir_inbox=True, user_id=None, pastas_aprendidas=False, pastas_treinadas=False):
+    """
+    Classifica os UIDs da INBOX (já selecionada) em fluxo, aplica as categorias
+    em lote e avança o checkpoint da conta.
+    Retorna {'movidos', 'com_erro', 'categorias': {categoria: N}, 'marcadores'}.
+    
+    Os UIDs são agrupados por categoria e cada grupo recebe um comando só:
+    X-GM-LABELS no modo marcadores (Gmail), UID MOVE se o servidor anunciar
+    MOVE e `excluir_inbox`, ou UID COPY + UID STORE nos demais casos.
+    Os grupos são aplicados durante o fluxo (LOTE_MINIMO_APLICACAO UIDs,
+    ESPERA_MAXIMA_APLICACAO segundos ou fila de classificados vazia), e o
+    checkpoint acompanha o que já foi aplicado.
+    Se o fluxo for interrompido, aplica o que já foi classificado, salva o
+    checkpoint e propaga o erro. `user_id` aplica as regras do usuário.
+    
+    Remetentes conhecidos são classificados pelo índice aprendido; os demais
+    alimentam o índice ao fim. `pastas_aprendidas` indica que as pastas já
+    foram lidas nesta execução (aprender_remetentes_das_pastas): o que for
+    movido agora para elas não é contado de novo na próxima leitura;
+    `pastas_treinadas`, o mesmo para o modelo Naive Bayes (treinar_bayes_das_pastas),
+    que assim não treina com as próprias previsões.
+    """
+    total = len(ids)
+    classificacao = await em_executor(classificacao_do_usuario, user_id)
+    regras, bayes = classificacao['regras'], classificacao['bayes']
+    indice = await em_executor(IndiceRemetentes.carregar, conta) if USAR_INDICE_REMETENTES else None
+    observacoes = []  # (uid, remetente, categoria) fora do índice, aprendidas ao fim
+    marcadores = MODO_MARCADORES_GMAIL and 'X-GM-EXT-1' in imap.capabilities
+    usar_move = not marcadores and excluir_inbox and 'MOVE' in imap.capabilities
+    categorias_count = {}
+    resultado = {'movidos': 0, 'com_erro': 0, 'categorias': categorias_count, 'marcadores': marcadores}
+    uids_processados = []
+    uids_com_erro = []
+    esgotados = set()  # UIDs que já falharam MAX_TENTATIVAS_UID execuções: não seguram o checkpoint
+    lotes = {}  # categoria -> UIDs classificados aguardando o comando
+    desde = {}  # categoria -> instante (monotonic) do UID mais antigo aguardando
+    ultimo_visto = 0  # Maior UID já entregue a mover (chegam em ordem crescente)
+    vistos = 0
+    
+    if log_callback:
+        if marcadores:
+            log_callback("🏷️ Modo marcadores: aplicando X-GM-LABELS em vez de copiar para pastas")
+        elif usar_move:
+            log_callback("🚚 MOVE disponível: um comando por categoria")
+        if indice:
+            log_callback(f"🧭 Índice de remetentes: {len(indice)} rotas conhecidas")
+        if bayes:
+            log_callback(f"🧠 Modelo Naive Bayes: {len(bayes.categorias)} categorias")
+    
+    async def aplicar_lote(categoria, uids):
+        """Aplica a categoria aos UIDs com um comando por lote (conjunto compacto)"""
+        for lote in dividir_em_lotes(uids, TAMANHO_LOTE_APLICACAO):
+            uids_processados.extend(lote)
+            categorias_count[categoria] = categorias_count.get(categoria, 0) + len(lote)
+            conjunto = compactar_conjunto(lote)
+            if marcadores:
+                sucesso = await aplicar_marcador(imap, conjunto, categoria, excluir_inbox, log_callback=log_callback)
+            elif usar_move:
+                sucesso = await mover_com_move(imap, conjunto, categoria, log_callback=log_callback)
+            else:
+                sucesso = await mover_email(imap, conjunto, categoria, log_callback=log_callback)
+            if sucesso:
+                resultado['movidos'] += len(lote)
+            else:
+                resultado['com_erro'] += len(lote)
+                uids_com_erro.extend(lote)
+                desistidos = await em_executor(registrar_falhas_uid, conta, "INBOX", lote)
+                if desistidos:
+                    esgotados.update(desistidos)
+                    aviso = (f"⚠️ {len(desistidos)} e-mails falharam em {MAX_TENTATIVAS_UID} execuções seguidas "
+                             f"(UIDs {compactar_conjunto(sorted(desistidos))}): ficam na INBOX e o checkpoint segue adiante")
+                    if log_callback:
+                        log_callback(aviso)
+                    else:
+                        print(f"{aviso} ({conta})")
+    
+    async def aplicar_prontos(todos=False):
+        """
+        Aplica os grupos com LOTE_MINIMO_APLICACAO UIDs ou com UIDs aguardando há
+        ESPERA_MAXIMA_APLICACAO segundos (`todos`: qualquer grupo), para a
+        movimentação e o checkpoint acompanharem a busca
+        """
+        agora = time.monotonic()
+        for categoria in list(lotes):
+            if todos or len(lotes[categoria]) >= LOTE_MINIMO_APLICACAO or agora - desde[categoria] >= ESPERA_MAXIMA_APLICACAO:
+                desde.pop(categoria)
+                await aplicar_lote(categoria, lotes.pop(categoria))
+    
+    async def salvar_checkpoint_parcial(concluido=False):
+        """
+        Checkpoint: próximas execuções buscam só UIDs acima deste. Para antes
+        do primeiro erro (para que ele seja tentado de novo, até MAX_TENTATIVAS_UID
+        execuções) e, durante o fluxo, não passa do último UID visto
+        (pré-classificados podem ir além)
+        """
+        limite = None if concluido else ultimo_visto
+        ultimo = limite_do_checkpoint([uid for uid in uids_processados if limite is None or uid <= limite],
+                                      uids_com_erro, esgotados)
+        if ultimo:
+            await em_executor(avancar_checkpoint, conta, "INBOX", ultimo)
+            await em_executor(limpar_falhas_uid, conta, "INBOX", ultimo)
+    
+    async def ao_esvaziar():
+        """Fila vazia: aplica tudo o que está acumulado e salva o checkpoint"""
+        await aplicar_prontos(todos=True)
+        await salvar_checkpoint_parcial()
+    
+    async def mover(e, categoria):
+        nonlocal vistos, ultimo_visto
+        vistos += 1
+        ultimo_visto = max(ultimo_visto, int(e["id"]))
+        
+        if indice is not None and not indice.categoria(e.get("remetente")):
+            observacoes.append((int(e["id"]), e.get("remetente"), categoria))
+        
+        lotes.setdefault(categoria, []).append(int(e["id"]))
+        desde.setdefault(categoria, time.monotonic())
+        await aplicar_prontos()
+        
+        if progress_callback:
+            progress_callback(vistos / total, f"Organizando: {vistos}/{total}")
+        
+        if log_callback:
+            log_callback(f"📨 ({vistos}/{total}) {e['assunto'][:50]} → {categoria}")
+    
+    concluido = False
+    try:
+        pendentes = ids
+        # As consultas do Gmail seguem as palavras padrão: regras e modelo do usuário têm precedência
+        if PRE_CLASSIFICACAO_GMAIL and not regras and not bayes:
+            pendentes = await mover_pre_classificados(imap, ids, aplicar_lote, log_callback=log_callback)
+            vistos = total - len(pendentes)
+        
+        await executar_pipeline(
+            listar_emails(imap, pendentes, log_callback=log_callback, conexoes_extras=conexoes_extras,
+                          regras=regras, indice=indice, palavras=not bayes),
+            lambda lote: classificar_emails(lote, user_id),
+            mover,
+            ocioso=ao_esvaziar
+        )
+        concluido = True
+    finally:
+        # Lotes ainda pendentes (também se o fluxo falhou, para o checkpoint não pular UIDs)
+        await aplicar_prontos(todos=True)
+        await salvar_checkpoint_parcial(concluido)
+        
+        # Índice de remetentes: aprende com o que foi aplicado sem erro
+        if observacoes:
+            com_erro = set(uids_com_erro)
+            await em_executor(registrar_observacoes, conta, [(r, c) for uid, r, c in observacoes if uid not in com_erro])
+        if pastas_aprendidas or pastas_treinadas:
+            for categoria in categorias_count:
+                checkpoints = [categoria] if pastas_aprendidas else []
+                if pastas_treinadas:
+                    checkpoints.append(chave_checkpoint(user_id, categoria))
+                try:
+                    await pular_mensagens_da_pasta(imap, conta, categoria, checkpoints)
+                except Exception:
+                    pass
+    
+    return resultado
+
+async def remover_duplicatas_gmail(imap, pastas_organizadas, log_callback=None, progress_callback=None):
+    """Remove da INBOX as mensagens que já estão em alguma pasta, comparando X-GM-MSGID"""
+    if log_callback:
+        log_callback("⚡ Gmail detectado: comparando X-GM-MSGID em lote")
+    
+    try:
+        duplicatas, pastas_com_erro = await duplicatas_por_gm_msgid(
+            imap,
+            pastas_organizadas,
+            progress_callback=(lambda p, t: progress_callback(0.2 + p * 0.6, t)) if progress_callback else None
+        )
+    except Exception as e:
+        if log_callback:
+            log_callback(f"❌ Erro ao mapear e-mails: {str(e)[:100]}")
+        return 0
+    
+    if pastas_com_erro > 0 and log_callback:
+        log_callback(f"⚠️ {pastas_com_erro} pastas com erro")
+    
+    if not duplicatas:
+        if log_callback:
+            log_callback("✅ Nenhuma duplicata encontrada")
+        if progress_callback:
+            progress_callback(1.0, "✅ Nenhuma duplicata")
+        return 0
+    
+    if log_callback:
+        log_callback(f"🗑️ Removendo {len(duplicatas)} duplicatas...")
+    
+    try:
+        status, _ = await imap.uid('STORE', compactar_conjunto(duplicatas), '+FLAGS.SILENT', '(\\Deleted)')
+        if status != "OK":
+            if log_callback:
+                log_callback("❌ Erro ao marcar duplicatas para remoção")
+            return 0
+        await imap.expunge()
+    except Exception as e:
+        if log_callback:
+            log_callback(f"❌ Erro ao remover duplicatas: {str(e)[:100]}")
+        return 0
+    
+    if log_callback:
+        log_callback(f"✅ {len(duplicatas)} duplicatas removidas")
+    if progress_callback:
+        progress_callback(1.0, f"✅ {len(duplicatas)} duplicatas removidas!")
+    
+    return len(duplicatas)
 
-def verificar_e_remover_duplicatas(imap, log_callback=None, progress_callback=None):
+async def verificar_e_remover_duplicatas(imap, log_callback=None, progress_callback=None, conta=None):
     if log_callback:
         log_callback("\n" + "=" * 50)
         log_callback("🔍 VERIFICANDO DUPLICATAS")
@@ -980,15 +1771,15 @@ def verificar_e_remover_duplicatas(imap, log_callback=None, progress_callback=No
     if log_callback:
         log_callback("📂 Listando todas as pastas do Gmail...")
     
-    status, pastas = imap.list()
-    if status != "OK":
+    # Vem dos metadados da conexão; o LIST só é refeito quando eles vencem
+    pastas = await pastas_existentes(imap)
+    if pastas is None:
         if log_callback:
             log_callback("❌ Erro ao listar pastas")
         return 0
     
     pastas_organizadas = []
-    for pasta in pastas:
-        pasta_nome = pasta.decode().split('"/"')[-1].strip(' "')
+    for pasta_nome in sorted(pastas):
         if pasta_nome not in ['INBOX', '[Gmail]'] and not pasta_nome.startswith('[Gmail]/'):
             pastas_organizadas.append(pasta_nome)
     
@@ -998,101 +1789,81 @@ def verificar_e_remover_duplicatas(imap, log_callback=None, progress_callback=No
     if progress_callback:
         progress_callback(0.2, "📂 Pastas listadas")
     
-    # Obtém IDs dos e-mails na INBOX
-    imap.select("INBOX")
-    status, msgs_inbox = imap.search(None, "ALL")
+    # Gmail: compara X-GM-MSGID (inteiros) em lote, sem ler cabeçalhos
+    if 'X-GM-EXT-1' in imap.capabilities:
+        return await remover_duplicatas_gmail(imap, pastas_organizadas, log_callback, progress_callback)
+    
+    # Obtém UIDs dos e-mails na INBOX
+    await imap.select("INBOX")
+    status, msgs_inbox = await imap.uid('SEARCH', None, "ALL")
     if status != "OK":
         return 0
     
-    ids_inbox = msgs_inbox[0].split()
-    if not ids_inbox:
+    uids_inbox = [int(uid) for uid in msgs_inbox[0].split()] if msgs_inbox[0] else []
+    if not uids_inbox:
         if log_callback:
             log_callback("📭 INBOX vazia")
         return 0
     
-    total_inbox = len(ids_inbox)
+    total_inbox = len(uids_inbox)
     
     # Limita a 1000 e-mails mais recentes
     LIMITE_VERIFICACAO = 1000
     if total_inbox > LIMITE_VERIFICACAO:
-        ids_inbox = ids_inbox[-LIMITE_VERIFICACAO:]
+        uids_inbox = uids_inbox[-LIMITE_VERIFICACAO:]
         if log_callback:
             log_callback(f"⚠️ Verificando últimos {LIMITE_VERIFICACAO} de {total_inbox} e-mails")
     
     if log_callback:
-        log_callback(f"📧 E-mails a verificar: {len(ids_inbox)}")
-    
-    # Mapeia Message-IDs com tratamento de erro
-    inbox_message_ids = {}
-    erros_mapping = 0
+        log_callback(f"📧 E-mails a verificar: {len(uids_inbox)}")
     
-    for idx, email_id in enumerate(ids_inbox, 1):
-        try:
-            status, data = imap.fetch(email_id, "(BODY[HEADER.FIELDS (MESSAGE-ID)])")
-            if status == "OK":
-                msg = email.message_from_bytes(data[0][1])
-                message_id = msg.get("Message-ID", "").strip()
-                if message_id:
-                    inbox_message_ids[message_id] = email_id
-            else:
+    # Mapeia Message-IDs com UID FETCH em lote (BODY.PEEK não marca como lido)
+    inbox_message_ids = {}
+    erros_mapping = 0
+    
+    try:
+        idx = 0
+        async for uid, itens in fetch_em_lotes(imap, uids_inbox, ITENS_MESSAGE_ID, usar_uid=True):
+            idx += 1
+            if itens is None:
                 erros_mapping += 1
-        except Exception as e:
-            erros_mapping += 1
-            if erros_mapping > MAX_ERROS_CONSECUTIVOS:
-                if log_callback:
-                    log_callback(f"❌ Muitos erros ao mapear e-mails. Abortando.")
-                return 0
-        
-        if progress_callback and idx % 20 == 0:
-            progresso = 0.2 + (idx / len(ids_inbox)) * 0.3
-            progress_callback(progresso, f"Mapeando: {idx}/{len(ids_inbox)}")
-        
-        # Keepalive
-        if idx % KEEPALIVE_INTERVALO == 0:
-            try:
-                imap.noop()
-            except:
-                pass
+            else:
+                message_id = extrair_message_id(itens)
+                if message_id:
+                    inbox_message_ids[message_id] = uid
+            
+            if progress_callback and idx % 100 == 0:
+                progresso = 0.2 + (idx / len(uids_inbox)) * 0.3
+                progress_callback(progresso, f"Mapeando: {idx}/{len(uids_inbox)}")
+    except Exception as e:
+        if log_callback:
+            log_callback(f"❌ Erro ao mapear e-mails: {str(e)[:100]}")
+        return 0
+    
+    if erros_mapping and log_callback:
+        log_callback(f"⚠️ {erros_mapping} e-mails sem Message-ID lido")
     
     # Verifica duplicatas com tratamento de erro
     duplicatas_encontradas = set()
     pastas_com_erro = 0
+    pastas_inalteradas = 0
+    
+    # CONDSTORE: pastas sem mudança desde a última verificação vêm do cache
+    condstore = bool(conta) and await suporta_condstore(imap)
+    if condstore and log_callback:
+        log_callback("⚡ CONDSTORE disponível: pastas inalteradas serão puladas")
     
     for idx_pasta, pasta in enumerate(pastas_organizadas, 1):
         try:
-            status, _ = imap.select(f'"{pasta}"' if ' ' in pasta else pasta, readonly=True)
-            if status != "OK":
-                pastas_com_erro += 1
-                continue
-            
-            status, msgs_pasta = imap.search(None, "ALL")
-            if status != "OK":
+            message_ids_pasta, origem = await message_ids_da_pasta(imap, pasta, conta=conta, condstore=condstore)
+            if message_ids_pasta is None:
                 pastas_com_erro += 1
                 continue
             
-            ids_pasta = msgs_pasta[0].split()
-            if not ids_pasta:
-                continue
+            if origem == "cache":
+                pastas_inalteradas += 1
             
-            for idx_email, email_id in enumerate(ids_pasta, 1):
-                try:
-                    status, data = imap.fetch(email_id, "(BODY[HEADER.FIELDS (MESSAGE-ID)])")
-                    if status == "OK":
-                        msg = email.message_from_bytes(data[0][1])
-                        message_id = msg.get("Message-ID", "").strip()
-                        
-                        if message_id in inbox_message_ids:
-                            duplicatas_encontradas.add(message_id)
-                    
-                    # Keepalive
-                    if idx_email % KEEPALIVE_INTERVALO == 0:
-                        try:
-                            imap.noop()
-                        except:
-                            pass
-                            
-                except Exception as e:
-                    continue
+            duplicatas_encontradas.update(message_ids_pasta & inbox_message_ids.keys())
         
         except Exception as e:
             pastas_com_erro += 1
@@ -1105,6 +1876,9 @@ def verificar_e_remover_duplicatas(imap, log_callback=None, progress_callback=No
             progresso = 0.5 + (idx_pasta / len(pastas_organizadas)) * 0.3
             progress_callback(progresso, f"Verificando: {idx_pasta}/{len(pastas_organizadas)}")
     
+    if pastas_inalteradas and log_callback:
+        log_callback(f"⚡ {pastas_inalteradas} pastas sem alterações (cache reaproveitado)")
+    
     if pastas_com_erro > 0 and log_callback:
         log_callback(f"⚠️ {pastas_com_erro} pastas com erro")
     
@@ -1117,25 +1891,20 @@ def verificar_e_remover_duplicatas(imap, log_callback=None, progress_callback=No
             log_callback(f"🗑️ Removendo {len(duplicatas_encontradas)} duplicatas...")
         
         try:
-            imap.select("INBOX")
+            await imap.select("INBOX")
             removidos = 0
             erros_remocao = 0
             
-            for message_id in duplicatas_encontradas:
-                try:
-                    if message_id in inbox_message_ids:
-                        email_id = inbox_message_ids[message_id]
-                        imap.store(email_id, '+FLAGS', '\\Deleted')
-                        removidos += 1
-                except Exception as e:
-                    erros_remocao += 1
-                    if erros_remocao > MAX_ERROS_CONSECUTIVOS:
-                        if log_callback:
-                            log_callback(f"❌ Muitos erros ao remover. Abortando.")
-                        break
+            # Uma única marcação por UID (no máximo LIMITE_VERIFICACAO mensagens)
+            uids_duplicados = [inbox_message_ids[message_id] for message_id in duplicatas_encontradas]
+            status, _ = await imap.uid('STORE', compactar_conjunto(uids_duplicados), '+FLAGS.SILENT', '(\\Deleted)')
+            if status == "OK":
+                removidos = len(uids_duplicados)
+            else:
+                erros_remocao = len(uids_duplicados)
             
             try:
-                imap.expunge()
+                await imap.expunge()
             except Exception as e:
                 if log_callback:
                     log_callback(f"⚠️ Erro ao expurgar: {str(e)[:50]}")
@@ -1843,12 +2612,10 @@ def organizar():
         }
     )
     
-    # Executa em thread separada e envia progresso via WebSocket
-    thread = threading.Thread(
-        target=processar_organizacao,
-        args=(email_usuario, senha, excluir_inbox, request.sid if hasattr(request, 'sid') else None, user_id)
-    )
-    thread.start()
+    # Executa como corrotina no loop IMAP e envia progresso via WebSocket
+    loop_imap.submeter(processar_organizacao(
+        email_usuario, senha, excluir_inbox, request.sid if hasattr(request, 'sid') else None, user_id
+    ))
     
     return jsonify({'message': 'Organização iniciada'}), 202
 
@@ -1881,11 +2648,7 @@ def verificar_duplicatas_route():
         }
     )
     
-    thread = threading.Thread(
-        target=processar_duplicatas,
-        args=(email_usuario, senha, user_id)
-    )
-    thread.start()
+    loop_imap.submeter(processar_duplicatas(email_usuario, senha, user_id))
     
     return jsonify({'message': 'Verificação iniciada'}), 202
 
@@ -1901,10 +2664,202 @@ def limpar_logs():
     execucoes_logs = []
     return jsonify({'message': 'Logs limpos'}), 200
 
+@app.route('/api/push', methods=['GET'])
+@login_required
+def status_push_route():
+    user_id = session.get('user_id')
+    # A vigia pode estar em outro processo (o dono do lease): vale a inscrição
+    inscrito = any(i['user_id'] == user_id for i in obter_inscricoes_push())
+    return jsonify({'ativo': inscrito})
+
+@app.route('/api/push/ativar', methods=['POST'])
+@login_required
+def ativar_push_route():
+    data = request.json or {}
+    excluir_inbox = data.get('excluir_inbox', True)
+    user_id = session.get('user_id')
+    
+    # O modo push roda sem o navegador aberto: exige credenciais salvas
+    if not obter_credenciais_gmail(user_id):
+        return jsonify({'error': 'Salve suas credenciais do Gmail para ativar o modo push'}), 400
+    
+    if not ativar_push_usuario(user_id, excluir_inbox):
+        return jsonify({'error': 'Erro ao ativar modo push'}), 500
+    
+    # Fora do dono do lease, a coordenação inicia a vigia no próximo ciclo
+    if detem_lease_push:
+        iniciar_vigia_push(user_id, excluir_inbox)
+    registrar_atividade(
+        user_id=user_id,
+        action='push_mode_enabled',
+        details={'excluir_inbox': excluir_inbox, 'timestamp': datetime.datetime.now().isoformat()}
+    )
+    return jsonify({'message': 'Modo push ativado'}), 200
+
+@app.route('/api/push/desativar', methods=['POST'])
+@login_required
+def desativar_push_route():
+    user_id = session.get('user_id')
+    desativar_push_usuario(user_id)
+    parar_vigia_push(user_id)
+    registrar_atividade(
+        user_id=user_id,
+        action='push_mode_disabled',
+        details={'timestamp': datetime.datetime.now().isoformat()}
+    )
+    return jsonify({'message': 'Modo push desativado'}), 200
+
+# ===============================
+# ROTAS DE REGRAS DE CLASSIFICAÇÃO
+# ===============================
+def validar_regra(data):
+    """Retorna ((categoria, campo, valor, prioridade), None) ou (None, mensagem de erro)"""
+    categoria = str(data.get('categoria') or '').strip()
+    campo = str(data.get('campo') or '').strip()
+    valor = str(data.get('valor') or '').strip()
+    
+    if not categoria or not valor:
+        return None, 'Categoria e valor são obrigatórios'
+    if len(categoria) > 100 or len(valor) > 500:
+        return None, 'Categoria ou valor muito longo'
+    if any(c in categoria for c in '"\\\r\n'):
+        return None, 'Nome de categoria inválido'
+    if campo not in CAMPOS_REGRA:
+        return None, f"Campo inválido (use: {', '.join(CAMPOS_REGRA)})"
+    try:
+        prioridade = int(data.get('prioridade', 0))
+    except (TypeError, ValueError):
+        return None, 'Prioridade deve ser um número inteiro'
+    
+    return (categoria, campo, valor, prioridade), None
+
+@app.route('/api/regras', methods=['GET'])
+@login_required
+def listar_regras_route():
+    """Lista as regras de classificação do usuário"""
+    user_id = session.get('user_id')
+    return jsonify({
+        'success': True,
+        'regras': listar_regras_usuario(user_id),
+        'campos': list(CAMPOS_REGRA)
+    })
+
+@app.route('/api/regras', methods=['POST'])
+@login_required
+def adicionar_regra_route():
+    """Cria uma regra de classificação"""
+    regra, erro = validar_regra(request.json or {})
+    if erro:
+        return jsonify({'error': erro}), 400
+    
+    user_id = session.get('user_id')
+    regra_id = adicionar_regra_usuario(user_id, *regra)
+    if regra_id is None:
+        return jsonify({'error': 'Erro ao salvar regra'}), 500
+    
+    registrar_atividade(
+        user_id=user_id,
+        action='rule_created',
+        details={'regra_id': regra_id, 'categoria': regra[0], 'campo': regra[1]}
+    )
+    return jsonify({'success': True, 'id': regra_id, 'message': 'Regra criada'})
+
+@app.route('/api/regras/<int:regra_id>', methods=['PUT'])
+@login_required
+def atualizar_regra_route(regra_id):
+    """Altera uma regra de classificação"""
+    regra, erro = validar_regra(request.json or {})
+    if erro:
+        return jsonify({'error': erro}), 400
+    
+    user_id = session.get('user_id')
+    if not atualizar_regra_usuario(user_id, regra_id, *regra):
+        return jsonify({'error': 'Regra não encontrada'}), 404
+    
+    registrar_atividade(
+        user_id=user_id,
+        action='rule_updated',
+        details={'regra_id': regra_id, 'categoria': regra[0], 'campo': regra[1]}
+    )
+    return jsonify({'success': True, 'message': 'Regra atualizada'})
+
+@app.route('/api/regras/<int:regra_id>', methods=['DELETE'])
+@login_required
+def remover_regra_route(regra_id):
+    """Remove uma regra de classificação"""
+    user_id = session.get('user_id')
+    if not remover_regra_usuario(user_id, regra_id):
+        return jsonify({'error': 'Regra não encontrada'}), 404
+    
+    registrar_atividade(
+        user_id=user_id,
+        action='rule_deleted',
+        details={'regra_id': regra_id}
+    )
+    return jsonify({'success': True, 'message': 'Regra removida'})
+
+# ===============================
+# ROTAS DO MODELO NAIVE BAYES
+# ===============================
+@app.route('/api/bayes', methods=['GET'])
+@login_required
+def status_bayes_route():
+    """Categorias do modelo do usuário, e-mails vistos em cada uma e se o modelo está em uso"""
+    user_id = session.get('user_id')
+    categorias = resumo_modelo(user_id)
+    return jsonify({
+        'success': True,
+        'habilitado': USAR_BAYES,
+        'ativo': bool(categorias) and classificacao_do_usuario(user_id)['bayes'] is not None,
+        'categorias': categorias
+    })
+
+@app.route('/api/bayes/treinar', methods=['POST'])
+@login_required
+def treinar_bayes_route():
+    """Ativa o modelo (ou o atualiza) com as mensagens já presentes nas pastas de categoria"""
+    if not USAR_BAYES:
+        return jsonify({'error': 'Modelo Naive Bayes desabilitado'}), 400
+    
+    data = request.json or {}
+    email_usuario = data.get('email')
+    senha = data.get('senha')
+    user_id = session.get('user_id')
+    
+    # Se não foram fornecidas, tentar usar as credenciais salvas
+    if not email_usuario or not senha:
+        credenciais = obter_credenciais_gmail(user_id)
+        if credenciais:
+            email_usuario = email_usuario or credenciais['gmail_email']
+            senha = senha or credenciais['gmail_password']
+    
+    if not email_usuario or not senha:
+        return jsonify({'error': 'Email e senha são obrigatórios'}), 400
+    
+    loop_imap.submeter(processar_treino_bayes(email_usuario, senha, user_id))
+    
+    return jsonify({'message': 'Treino iniciado'}), 202
+
+@app.route('/api/bayes', methods=['DELETE'])
+@login_required
+def remover_bayes_route():
+    """Desativa o modelo: apaga as contagens e os checkpoints de treino"""
+    user_id = session.get('user_id')
+    if not remover_modelo(user_id):
+        return jsonify({'error': 'Erro ao remover modelo'}), 500
+    invalidar_regras_usuario(user_id)
+    
+    registrar_atividade(user_id=user_id, action='bayes_deleted', details={})
+    return jsonify({'success': True, 'message': 'Modelo removido'})
+
 # ===============================
 # PROCESSAMENTO VIA WEBSOCKET
 # ===============================
-def processar_organizacao(email_usuario, senha, excluir_inbox, sid=None, user_id=None):
+async def processar_organizacao(email_usuario, senha, excluir_inbox, sid=None, user_id=None):
+    # Uma organização por conta de cada vez (manual ou modo push)
+    trava = trava_da_conta(email_usuario)
+    await trava.acquire()
+    
     logs = []
     emails_organizados = 0
     categorias_criadas = []
@@ -1915,12 +2870,10 @@ def processar_organizacao(email_usuario, senha, excluir_inbox, sid=None, user_id
         logs.append(log_completo)
         execucoes_logs.append(log_completo)
         emit_evento('log', {'message': log_completo})
-        print(f"LOG EMITIDO: {log_completo}")  # Debug
         return log_completo
     
     def atualizar_progresso(progresso, texto):
         emit_evento('progresso', {'progresso': progresso, 'texto': texto})
-        print(f"PROGRESSO: {progresso*100}% - {texto}")  # Debug
     
     try:
         adicionar_log("🚀 ===== INICIANDO ORGANIZAÇÃO =====")
@@ -1928,82 +2881,84 @@ def processar_organizacao(email_usuario, senha, excluir_inbox, sid=None, user_id
         # Conecta com timeout
         atualizar_progresso(0.05, "🔌 Conectando...")
         try:
-            imap = conectar_email(email_usuario, senha, log_callback=adicionar_log)
+            imap = await pool_conexoes.obter(email_usuario, senha, log_callback=adicionar_log)
         except Exception as e:
             adicionar_log(str(e))
             emit_evento('erro', {'message': str(e)})
             atualizar_progresso(0, "❌ Erro na conexão")
             return
         
-        # Lista emails com timeout e recuperação
+        # Índice de remetentes: aprende com as pastas (inclusive correções feitas à mão)
+        pastas_aprendidas = False
+        if USAR_INDICE_REMETENTES and APRENDER_DAS_PASTAS:
+            atualizar_progresso(0.08, "🧭 Lendo remetentes das pastas...")
+            try:
+                pastas_aprendidas = await aprender_remetentes_das_pastas(imap, email_usuario, log_callback=adicionar_log)
+            except Exception as e:
+                adicionar_log(f"⚠️ Não foi possível ler as pastas: {str(e)[:100]}")
+        
+        # Modelo Naive Bayes (se o usuário ativou): soma as mensagens novas das pastas
+        pastas_treinadas = False
+        if USAR_BAYES and user_id and await em_executor(resumo_modelo, user_id):
+            atualizar_progresso(0.09, "🧠 Atualizando modelo Naive Bayes...")
+            try:
+                pastas_treinadas = await treinar_bayes_das_pastas(imap, email_usuario, user_id, log_callback=adicionar_log) is not None
+            except Exception as e:
+                adicionar_log(f"⚠️ Não foi possível atualizar o modelo: {str(e)[:100]}")
+        
+        # Seleciona os UIDs pendentes (checkpoint) antes de iniciar o fluxo
         atualizar_progresso(0.1, "📥 Listando e-mails...")
         try:
-            emails = listar_emails(imap, log_callback=adicionar_log, progress_callback=lambda p, t: atualizar_progresso(0.1 + p * 0.2, t))
+            ids = await selecionar_emails(imap, log_callback=adicionar_log, conta=email_usuario)
         except Exception as e:
             adicionar_log(f"❌ Erro ao listar e-mails: {str(e)}")
-            try:
-                imap.logout()
-            except:
-                pass
+            await pool_conexoes.descartar(imap)
             emit_evento('erro', {'message': f"Erro ao listar e-mails: {str(e)}"})
             atualizar_progresso(0, "❌ Erro")
             return
         
-        total = len(emails)
+        total = len(ids)
         if not total:
             adicionar_log("⚠️ Nenhum e-mail encontrado")
-            try:
-                imap.logout()
-            except:
-                pass
+            await pool_conexoes.devolver(imap)
             atualizar_progresso(1.0, "Concluído")
             emit_evento('conclusao', {'total': 0, 'categorias': {}})
             return
         
-        # Organiza com tratamento de erro individual
+        # Organiza em fluxo: busca, classificação e movimentação ao mesmo tempo
         adicionar_log(f"📊 Organizando {total} e-mails...")
-        categorias_count = {}
-        emails_movidos = 0
-        emails_com_erro = 0
         
-        for i, e in enumerate(emails, 1):
-            try:
-                categoria = classificar_email(e["assunto"], e["corpo"])
-                categorias_count[categoria] = categorias_count.get(categoria, 0) + 1
-                
-                # Rastreia categorias criadas
-                if categoria not in categorias_criadas:
-                    categorias_criadas.append(categoria)
-                
-                sucesso = mover_email(imap, e["id"], categoria, log_callback=adicionar_log)
-                if sucesso:
-                    emails_movidos += 1
-                    emails_organizados += 1
-                else:
-                    emails_com_erro += 1
-                
-                progresso = 0.3 + (i / total) * 0.5
-                atualizar_progresso(progresso, f"Organizando: {i}/{total}")
-                
-                adicionar_log(f"📨 ({i}/{total}) {e['assunto'][:50]} → {categoria}")
-                
-                # Keepalive a cada 100 emails
-                if i % 100 == 0:
-                    try:
-                        imap.noop()  # Mantém conexão ativa
-                        adicionar_log(f"🔄 Conexão mantida ativa ({i}/{total})")
-                    except:
-                        adicionar_log(f"⚠️ Reconectando ao servidor...")
-                        try:
-                            imap.logout()
-                        except:
-                            pass
-                        imap = conectar_email(email_usuario, senha, log_callback=adicionar_log)
-                        
-            except Exception as e:
-                emails_com_erro += 1
-                adicionar_log(f"⚠️ Erro ao processar e-mail {i}: {str(e)[:100]}")
-                continue
+        # Sessões extras só se houver vaga no limite da conta; devolvidas ao fim do fluxo
+        extras = await pool_conexoes.obter_varias(email_usuario, senha, CONEXOES_PARALELAS - 1)
+        try:
+            resultado = await organizar_uids(
+                imap,
+                ids,
+                email_usuario,
+                log_callback=adicionar_log,
+                progress_callback=lambda p, t: atualizar_progresso(0.1 + p * 0.7, t),
+                conexoes_extras=extras,
+                excluir_inbox=excluir_inbox,
+                user_id=user_id,
+                pastas_aprendidas=pastas_aprendidas,
+                pastas_treinadas=pastas_treinadas
+            )
+        except Exception as e:
+            adicionar_log(f"❌ Erro ao organizar e-mails: {str(e)}")
+            for extra in extras:
+                await pool_conexoes.descartar(extra)
+            await pool_conexoes.descartar(imap)
+            emit_evento('erro', {'message': f"Erro ao organizar e-mails: {str(e)}"})
+            atualizar_progresso(0, "❌ Erro")
+            return
+        for extra in extras:
+            await pool_conexoes.devolver(extra)
+        
+        emails_movidos = resultado['movidos']
+        emails_organizados += emails_movidos
+        emails_com_erro = resultado['com_erro']
+        categorias_count = resultado['categorias']
+        categorias_criadas.extend(categorias_count)
         
         if emails_com_erro > 0:
             adicionar_log(f"⚠️ {emails_com_erro} e-mails com erro")
@@ -2012,32 +2967,34 @@ def processar_organizacao(email_usuario, senha, excluir_inbox, sid=None, user_id
         if excluir_inbox:
             try:
                 adicionar_log("🗑️ Removendo da INBOX...")
-                imap.expunge()
+                await imap.expunge()
             except Exception as e:
                 adicionar_log(f"⚠️ Erro ao limpar INBOX: {str(e)[:100]}")
         
-        # Duplicatas com timeout
-        try:
-            atualizar_progresso(0.85, "🔍 Verificando duplicatas...")
-            duplicatas = verificar_e_remover_duplicatas(
-                imap,
-                log_callback=adicionar_log,
-                progress_callback=lambda p, t: atualizar_progresso(0.85 + p * 0.15, t)
-            )
-        except Exception as e:
-            adicionar_log(f"⚠️ Erro ao verificar duplicatas: {str(e)[:100]}")
-            duplicatas = 0
+        # Duplicatas com timeout (o modo marcadores não cria cópias)
+        duplicatas = 0
+        if resultado['marcadores']:
+            adicionar_log("🏷️ Marcadores aplicados sem cópias: verificação de duplicatas dispensada")
+        else:
+            try:
+                atualizar_progresso(0.85, "🔍 Verificando duplicatas...")
+                duplicatas = await verificar_e_remover_duplicatas(
+                    imap,
+                    log_callback=adicionar_log,
+                    progress_callback=lambda p, t: atualizar_progresso(0.85 + p * 0.15, t),
+                    conta=email_usuario
+                )
+            except Exception as e:
+                adicionar_log(f"⚠️ Erro ao verificar duplicatas: {str(e)[:100]}")
         
-        # Fecha conexão de forma segura
-        try:
-            imap.logout()
-            adicionar_log("🔌 Conexão fechada")
-        except:
-            pass
+        # Devolve a sessão ao pool para a próxima execução da mesma conta
+        await pool_conexoes.devolver(imap)
+        adicionar_log("🔌 Conexão devolvida ao pool")
         
         # Registra a conclusão da organização
         if user_id:
-            registrar_atividade(
+            await em_executor(
+                registrar_atividade,
                 user_id=user_id,
                 action='email_organization_completed',
                 details={
@@ -2054,7 +3011,8 @@ def processar_organizacao(email_usuario, senha, excluir_inbox, sid=None, user_id
             )
             
             # Atualiza estatísticas do usuário
-            atualizar_estatisticas_usuario(
+            await em_executor(
+                atualizar_estatisticas_usuario,
                 user_id=user_id,
                 emails_organizados=emails_organizados,
                 duplicatas_removidas=duplicatas,
@@ -2078,7 +3036,8 @@ def processar_organizacao(email_usuario, senha, excluir_inbox, sid=None, user_id
         
         # Registra o erro
         if user_id:
-            registrar_atividade(
+            await em_executor(
+                registrar_atividade,
                 user_id=user_id,
                 action='email_organization_failed',
                 details={
@@ -2087,102 +3046,361 @@ def processar_organizacao(email_usuario, senha, excluir_inbox, sid=None, user_id
                     'timestamp': datetime.datetime.now().isoformat()
                 }
             )
-
-def processar_duplicatas(email_usuario, senha, user_id=None):
-    logs = []
+        
+        if 'imap' in locals():
+            await pool_conexoes.descartar(imap)
     
+    finally:
+        trava.release()
+
+async def processar_duplicatas(email_usuario, senha, user_id=None):
+    # Não roda junto com uma organização da mesma conta (STORE/EXPUNGE na INBOX)
+    async with trava_da_conta(email_usuario):
+        logs = []
+        
+        def adicionar_log(mensagem):
+            timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+            log_completo = f"[{timestamp}] {mensagem}"
+            logs.append(log_completo)
+            execucoes_logs.append(log_completo)
+            emit_evento('log', {'message': log_completo})
+            return log_completo
+        
+        def atualizar_progresso(progresso, texto):
+            emit_evento('progresso', {'progresso': progresso, 'texto': texto})
+        
+        try:
+            adicionar_log("🔍 ===== VERIFICANDO DUPLICATAS =====")
+            
+            try:
+                imap = await pool_conexoes.obter(email_usuario, senha, log_callback=adicionar_log)
+            except Exception as e:
+                adicionar_log(str(e))
+                emit_evento('erro', {'message': str(e)})
+                atualizar_progresso(0, "❌ Erro na conexão")
+                return
+            
+            try:
+                duplicatas = await verificar_e_remover_duplicatas(
+                    imap,
+                    log_callback=adicionar_log,
+                    progress_callback=atualizar_progresso,
+                    conta=email_usuario
+                )
+            except Exception as e:
+                adicionar_log(f"❌ Erro ao verificar duplicatas: {str(e)}")
+                duplicatas = 0
+            
+            await pool_conexoes.devolver(imap)
+            adicionar_log("🔌 Conexão devolvida ao pool")
+            
+            # Registra a conclusão da verificação
+            if user_id:
+                await em_executor(
+                    registrar_atividade,
+                    user_id=user_id,
+                    action='duplicate_check_completed',
+                    details={
+                        'gmail_account': email_usuario,
+                        'duplicatas_encontradas': duplicatas,
+                        'timestamp': datetime.datetime.now().isoformat()
+                    }
+                )
+                
+                # Atualiza estatísticas do usuário
+                await em_executor(
+                    atualizar_estatisticas_usuario,
+                    user_id=user_id,
+                    emails_organizados=0,
+                    duplicatas_removidas=duplicatas,
+                    categorias_criadas=0,
+                    incrementar=True
+                )
+            
+            atualizar_progresso(1.0, "✅ Concluído!")
+            emit_evento('duplicatas_resultado', {'duplicatas': duplicatas})
+            
+        except Exception as e:
+            error_msg = str(e)
+            adicionar_log(f"❌ Erro crítico: {error_msg}")
+            atualizar_progresso(0, "❌ Erro")
+            emit_evento('erro', {'message': error_msg})
+            
+            # Registra o erro
+            if user_id:
+                await em_executor(
+                    registrar_atividade,
+                    user_id=user_id,
+                    action='duplicate_check_failed',
+                    details={
+                        'gmail_account': email_usuario,
+                        'error': error_msg,
+                        'timestamp': datetime.datetime.now().isoformat()
+                    }
+                )
+            
+            if 'imap' in locals():
+                await pool_conexoes.descartar(imap)
+
+async def processar_treino_bayes(email_usuario, senha, user_id):
     def adicionar_log(mensagem):
         timestamp = datetime.datetime.now().strftime("%H:%M:%S")
         log_completo = f"[{timestamp}] {mensagem}"
-        logs.append(log_completo)
         execucoes_logs.append(log_completo)
         emit_evento('log', {'message': log_completo})
-        print(f"LOG EMITIDO: {log_completo}")  # Debug
         return log_completo
     
     def atualizar_progresso(progresso, texto):
         emit_evento('progresso', {'progresso': progresso, 'texto': texto})
-        print(f"PROGRESSO: {progresso*100}% - {texto}")  # Debug
     
     try:
-        adicionar_log("🔍 ===== VERIFICANDO DUPLICATAS =====")
+        adicionar_log("🧠 ===== TREINANDO MODELO NAIVE BAYES =====")
         
         try:
-            imap = conectar_email(email_usuario, senha, log_callback=adicionar_log)
+            imap = await pool_conexoes.obter(email_usuario, senha, log_callback=adicionar_log)
         except Exception as e:
             adicionar_log(str(e))
             emit_evento('erro', {'message': str(e)})
             atualizar_progresso(0, "❌ Erro na conexão")
             return
         
-        try:
-            duplicatas = verificar_e_remover_duplicatas(
-                imap,
-                log_callback=adicionar_log,
-                progress_callback=atualizar_progresso
-            )
-        except Exception as e:
-            adicionar_log(f"❌ Erro ao verificar duplicatas: {str(e)}")
-            duplicatas = 0
+        usados = await treinar_bayes_das_pastas(
+            imap, email_usuario, user_id, log_callback=adicionar_log, progress_callback=atualizar_progresso
+        )
+        await pool_conexoes.devolver(imap)
         
-        try:
-            imap.logout()
-            adicionar_log("🔌 Conexão fechada")
-        except:
-            pass
+        if usados is None:
+            adicionar_log("❌ Não foi possível listar as pastas")
+            emit_evento('erro', {'message': "Não foi possível listar as pastas"})
+            atualizar_progresso(0, "❌ Erro")
+            return
         
-        # Registra a conclusão da verificação
-        if user_id:
-            registrar_atividade(
-                user_id=user_id,
-                action='duplicate_check_completed',
-                details={
-                    'gmail_account': email_usuario,
-                    'duplicatas_encontradas': duplicatas,
-                    'timestamp': datetime.datetime.now().isoformat()
-                }
-            )
-            
-            # Atualiza estatísticas do usuário
-            atualizar_estatisticas_usuario(
-                user_id=user_id,
-                emails_organizados=0,
-                duplicatas_removidas=duplicatas,
-                categorias_criadas=0,
-                incrementar=True
-            )
+        resumo = await em_executor(resumo_modelo, user_id)
+        await em_executor(
+            registrar_atividade,
+            user_id=user_id,
+            action='bayes_trained',
+            details={
+                'gmail_account': email_usuario,
+                'mensagens': usados,
+                'categorias': len(resumo),
+                'timestamp': datetime.datetime.now().isoformat()
+            }
+        )
         
+        ativo = (await em_executor(classificacao_do_usuario, user_id))['bayes'] is not None
+        if not ativo:
+            adicionar_log("ℹ️ O modelo passa a ser usado com duas ou mais pastas de categoria com exemplos suficientes")
+        adicionar_log(f"✅ Treino concluído! {usados} mensagens novas, {len(resumo)} categorias")
         atualizar_progresso(1.0, "✅ Concluído!")
-        emit_evento('duplicatas_resultado', {'duplicatas': duplicatas})
+        emit_evento('bayes_resultado', {'mensagens': usados, 'categorias': resumo, 'ativo': ativo})
         
     except Exception as e:
         error_msg = str(e)
-        adicionar_log(f"❌ Erro crítico: {error_msg}")
+        adicionar_log(f"❌ Erro ao treinar modelo: {error_msg}")
         atualizar_progresso(0, "❌ Erro")
         emit_evento('erro', {'message': error_msg})
         
-        # Registra o erro
-        if user_id:
-            registrar_atividade(
-                user_id=user_id,
-                action='duplicate_check_failed',
-                details={
-                    'gmail_account': email_usuario,
-                    'error': error_msg,
-                    'timestamp': datetime.datetime.now().isoformat()
-                }
-            )
+        if 'imap' in locals():
+            await pool_conexoes.descartar(imap)
+
+# ===============================
+# MODO PUSH VIA IMAP IDLE
+# ===============================
+# Vigias ativas neste processo: user_id -> (concurrent.futures.Future da corrotina no loop IMAP, excluir_inbox)
+vigias_push = {}
+detem_lease_push = False  # Este processo é o dono do lease (só ele mantém vigias)
+coordenador_push = None  # Future de coordenar_modo_push, depois de iniciar_modo_push()
+
+def dono_lease_push():
+    """Identificação deste processo no lease"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+async def organizar_chegadas(imap, email_usuario, excluir_inbox=True, user_id=None, log_callback=None):
+    """Organiza só o que chegou à INBOX desde o checkpoint da conta"""
+    async with trava_da_conta(email_usuario):
+        ids = await selecionar_emails(imap, conta=email_usuario)
+        if not ids:
+            return 0
+        
+        resultado = await organizar_uids(imap, ids, email_usuario, excluir_inbox=excluir_inbox, user_id=user_id)
+        if excluir_inbox and resultado['movidos']:
+            await imap.expunge()
+    
+    if log_callback:
+        log_callback(f"📡 Push: {resultado['movidos']}/{len(ids)} novos e-mails organizados ({email_usuario})")
+    
+    if user_id and resultado['movidos']:
+        await em_executor(
+            registrar_atividade,
+            user_id=user_id,
+            action='email_push_organized',
+            details={
+                'gmail_account': email_usuario,
+                'emails_organizados': resultado['movidos'],
+                'emails_com_erro': resultado['com_erro'],
+                'categorias_count': resultado['categorias'],
+                'timestamp': datetime.datetime.now().isoformat()
+            }
+        )
+        await em_executor(
+            atualizar_estatisticas_usuario,
+            user_id=user_id,
+            emails_organizados=resultado['movidos'],
+            incrementar=True
+        )
+    
+    return resultado['movidos']
+
+async def vigiar_conta(user_id, excluir_inbox=True):
+    """
+    Mantém uma sessão IDLE na INBOX do usuário e organiza cada chegada.
+    O IDLE é renovado antes do limite do servidor; se a conexão cair,
+    reconecta com espera crescente.
+    """
+    def adicionar_log(mensagem):
+        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        log_completo = f"[{timestamp}] {mensagem}"
+        execucoes_logs.append(log_completo)
+        print(log_completo)
+    
+    espera = 5
+    while True:
+        credenciais = await em_executor(obter_credenciais_gmail, user_id)
+        if not credenciais:
+            adicionar_log(f"⚠️ Push desativado para {user_id}: credenciais do Gmail removidas")
+            return
+        email_usuario, senha = credenciais['gmail_email'], credenciais['gmail_password']
         
+        imap = None
         try:
-            if 'imap' in locals():
-                imap.logout()
-        except:
-            pass
+            imap = await pool_conexoes.obter(email_usuario, senha)
+            if 'IDLE' not in imap.capabilities:
+                adicionar_log(f"⚠️ Servidor sem suporte a IDLE; modo push indisponível para {email_usuario}")
+                await pool_conexoes.devolver(imap)
+                return
+            
+            adicionar_log(f"📡 Modo push ativo para {email_usuario}")
+            espera = 5
+            
+            # Conta sem histórico: começa do UIDNEXT, sem uma primeira passada pela INBOX inteira
+            if await iniciar_checkpoint_sem_historico(imap, email_usuario):
+                adicionar_log(f"📌 Push: só as mensagens que chegarem a partir de agora serão organizadas ({email_usuario})")
+            
+            # Organiza o que chegou enquanto a vigia estava parada, depois aguarda avisos
+            await organizar_chegadas(imap, email_usuario, excluir_inbox, user_id, adicionar_log)
+            while True:
+                status, avisos = await imap.idle(TEMPO_IDLE_SEGUNDOS)
+                if status != "OK":
+                    raise ErroIMAP(f"IDLE recusado: {avisos[0]!r}")
+                if avisos != [None]:
+                    await organizar_chegadas(imap, email_usuario, excluir_inbox, user_id, adicionar_log)
+        
+        except asyncio.CancelledError:
+            # Cancelada no meio de um IDLE: a sessão não pode voltar ao pool
+            if imap is not None:
+                await pool_conexoes.descartar(imap)
+            raise
+        
+        except Exception as e:
+            adicionar_log(f"⚠️ Push ({user_id}): {str(e)[:100]}. Reconectando em {espera}s...")
+            if imap is not None:
+                await pool_conexoes.descartar(imap)
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, 300)
+
+def iniciar_vigia_push(user_id, excluir_inbox=True):
+    """Inicia (ou reinicia) a vigia IDLE do usuário no loop IMAP"""
+    parar_vigia_push(user_id)
+    vigias_push[user_id] = (loop_imap.submeter(vigiar_conta(user_id, excluir_inbox)), excluir_inbox)
+
+def parar_vigia_push(user_id):
+    """Cancela a vigia IDLE do usuário, se houver"""
+    vigia = vigias_push.pop(user_id, None)
+    if vigia is not None:
+        vigia[0].cancel()
+
+def sincronizar_vigias_push(inscricoes):
+    """Deixa as vigias deste processo iguais às inscrições (novas, removidas ou com outras opções)"""
+    inscricoes = {i['user_id']: i['excluir_inbox'] for i in inscricoes}
+    for user_id in list(vigias_push):
+        if user_id not in inscricoes:
+            parar_vigia_push(user_id)
+    for user_id, excluir_inbox in inscricoes.items():
+        vigia = vigias_push.get(user_id)
+        if vigia is None or vigia[1] != excluir_inbox:
+            iniciar_vigia_push(user_id, excluir_inbox)
+
+async def coordenar_modo_push():
+    """
+    Roda em cada processo (workers do gunicorn, servidor de desenvolvimento):
+    só o dono do lease mantém vigias, renovando-o a cada terço da validade.
+    Se o dono parar, outro processo assume quando o lease vencer.
+    """
+    global detem_lease_push
+    dono = dono_lease_push()
+    try:
+        while True:
+            detem_lease_push = await em_executor(renovar_lease_push, dono)
+            if detem_lease_push:
+                sincronizar_vigias_push(await em_executor(obter_inscricoes_push))
+            else:
+                for user_id in list(vigias_push):
+                    parar_vigia_push(user_id)
+            await asyncio.sleep(DURACAO_LEASE_PUSH / 3)
+    finally:
+        detem_lease_push = False
+        for user_id in list(vigias_push):
+            parar_vigia_push(user_id)
+        await em_executor(liberar_lease_push, dono)
+
+def iniciar_modo_push():
+    """
+    Gancho de inicialização (post_worker_init no gunicorn.conf.py, ou o
+    __main__ fora do processo pai do reloader): inicia a coordenação das
+    vigias push uma vez por processo. Importar o módulo não inicia nada.
+    """
+    global coordenador_push
+    if coordenador_push is None:
+        coordenador_push = loop_imap.submeter(coordenar_modo_push())
+
+def encerrar_modo_push():
+    """Gancho de encerramento (worker_exit): para as vigias e libera o lease na hora"""
+    global coordenador_push
+    if coordenador_push is not None:
+        coordenador_push.cancel()
+        coordenador_push = None
+    liberar_lease_push(dono_lease_push())
+
+# ===============================
+# INICIALIZAÇÃO: PRONTIDÃO E AQUECIMENTO
+# ===============================
+def tarefas_aquecimento():
+    """Cargas feitas em segundo plano após o boot, para não atrasar o primeiro job"""
+    tarefas = []
+    if MOTOR_SENTIMENTO == "textblob":
+        tarefas.append(("textblob", aquecer_textblob))
+    # Classificação completa de um e-mail de exemplo (palavras-chave + sentimento, léxico do TextBlob)
+    tarefas.append(("classificação", lambda: classificar_conteudo([{'assunto': 'aquecimento', 'corpo': 'ok'}])))
+    return tarefas
+
+@app.route('/api/status', methods=['GET'])
+@login_required
+def status_route():
+    """Tempo até o app ficar pronto e duração de cada carga (imports sob demanda e aquecimento)"""
+    return jsonify({'success': True, 'motor_sentimento': MOTOR_SENTIMENTO, **estado_aquecimento()})
+
+marcar_pronto()
+if AQUECER_NA_INICIALIZACAO:
+    iniciar_aquecimento(tarefas_aquecimento())
 
 if __name__ == '__main__':
     import os
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('DEBUG', 'False').lower() == 'true'
+    # Com o reloader, só o processo filho (WERKZEUG_RUN_MAIN) serve requisições e mantém vigias
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        iniciar_modo_push()
     socketio.run(app, debug=debug, host='0.0.0.0', port=port)
 
 
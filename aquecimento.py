@@ -0,0 +1,113 @@
+"""
+Dependências pesadas de NLP sob demanda e aquecimento em segundo plano.
+
+O TextBlob (e o NLTK por trás dele) leva segundos para importar e carrega
+o léxico de sentimento só na primeira análise. Importado no topo, atrasava
+o boot do dyno; carregado na primeira análise, travava o primeiro job.
+Aqui o import acontece no primeiro uso (uma vez, protegido por trava), e
+uma thread opcional, iniciada logo depois que o app fica pronto, faz essas
+cargas antes do primeiro job. O tempo até ficar pronto e a duração de cada
+carga ficam registrados para o status do app.
+"""
+import importlib
+import threading
+import time
+
+# Importado primeiro pelo app: marca o início da carga
+INICIO_CARGA = time.perf_counter()
+
+_modulos = {}
+_trava_import = threading.Lock()
+_trava_estado = threading.Lock()
+_estado = {
+    'pronto_em': None,  # Segundos do início da carga até marcar_pronto()
+    'aquecimento': 'desligado',  # desligado → em andamento → concluído
+    'aquecimento_total': None,
+    'duracoes': {},  # carga → segundos
+    'erros': {},
+}
+_thread_aquecimento = None
+
+def _registrar(nome, inicio):
+    duracao = time.perf_counter() - inicio
+    with _trava_estado:
+        _estado['duracoes'][nome] = round(duracao, 3)
+    return duracao
+
+# ===============================
+# IMPORTS SOB DEMANDA
+# ===============================
+def importar(nome):
+    """Importa o módulo no primeiro uso (uma vez só, entre threads) e registra a duração"""
+    modulo = _modulos.get(nome)
+    if modulo is None:
+        with _trava_import:
+            modulo = _modulos.get(nome)
+            if modulo is None:
+                inicio = time.perf_counter()
+                modulo = importlib.import_module(nome)
+                _registrar(f"import {nome}", inicio)
+                _modulos[nome] = modulo
+    return modulo
+
+def carregar_textblob():
+    """Classe TextBlob, importada no primeiro uso"""
+    return importar('textblob').TextBlob
+
+def aquecer_textblob():
+    """Importa o TextBlob e carrega o léxico de sentimento (feito na primeira análise)"""
+    carregar_textblob()("warm up").sentiment
+
+# ===============================
+# PRONTIDÃO E AQUECIMENTO
+# ===============================
+def marcar_pronto(log_callback=print):
+    """Registra o tempo desde o início da carga até o app ficar pronto (só na primeira chamada)"""
+    with _trava_estado:
+        if _estado['pronto_em'] is not None:
+            return _estado['pronto_em']
+        _estado['pronto_em'] = round(time.perf_counter() - INICIO_CARGA, 3)
+    if log_callback:
+        log_callback(f"✅ App pronto em {_estado['pronto_em']:.2f}s")
+    return _estado['pronto_em']
+
+def iniciar_aquecimento(tarefas, log_callback=print):
+    """
+    Executa as tarefas [(nome, função)] numa thread daemon, uma após a outra,
+    registrando a duração (ou o erro) de cada. Só a primeira chamada inicia a
+    thread; as seguintes a retornam.
+    """
+    global _thread_aquecimento
+    with _trava_estado:
+        if _thread_aquecimento is not None:
+            return _thread_aquecimento
+        _estado['aquecimento'] = 'em andamento'
+
+        def aquecer():
+            inicio_total = time.perf_counter()
+            for nome, funcao in tarefas:
+                inicio = time.perf_counter()
+                try:
+                    funcao()
+                    duracao = _registrar(nome, inicio)
+                    if log_callback:
+                        log_callback(f"🔥 Aquecimento: {nome} em {duracao:.2f}s")
+                except Exception as e:
+                    with _trava_estado:
+                        _estado['erros'][nome] = str(e)
+                    if log_callback:
+                        log_callback(f"⚠️ Aquecimento: falha em {nome}: {e}")
+            with _trava_estado:
+                _estado['aquecimento'] = 'concluído'
+                _estado['aquecimento_total'] = round(time.perf_counter() - inicio_total, 3)
+            if log_callback:
+                log_callback(f"🔥 Aquecimento concluído em {_estado['aquecimento_total']:.2f}s")
+
+        _thread_aquecimento = threading.Thread(target=aquecer, name="aquecimento", daemon=True)
+        _thread_aquecimento.start()
+        return _thread_aquecimento
+
+def estado_aquecimento():
+    """Cópia do estado: pronto_em, aquecimento, aquecimento_total, duracoes e erros"""
+    with _trava_estado:
+        return {**_estado, 'duracoes': dict(_estado['duracoes']), 'erros': dict(_estado['erros'])}
@@ -0,0 +1,232 @@
+"""
+Cache de classificação por conteúdo (LRU em memória + tabela no SQLite).
+
+Newsletters, notificações e alertas chegam repetidos; a categoria de cada
+um é guardada sob um hash do remetente, assunto e começo do corpo
+normalizados, e as próximas cópias não passam por palavras-chave nem por
+sentimento.
+Cada entrada leva a versão das regras que a produziu: se as regras mudam,
+as entradas antigas deixam de valer e são apagadas. A tabela tem tamanho
+máximo; ao passar dele, as entradas usadas há mais tempo saem primeiro.
+"""
+from collections import OrderedDict
+from email.utils import parseaddr
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from classificador import normalizar
+
+# ===============================
+# CONFIGURAÇÕES
+# ===============================
+DB_PATH = 'organizer.db'
+PREFIXO_CORPO = 2000  # Caracteres do corpo que entram na chave
+MAX_ENTRADAS_MEMORIA = 20000  # LRU do processo
+MAX_ENTRADAS_BANCO = 200000  # Tabela classification_cache
+FOLGA_REMOCAO = 0.1  # Ao passar do limite, remove mais 10% para não limpar a cada lote
+CONTAR_A_CADA = 1000  # Gravações entre duas conferências do tamanho da tabela
+LOTE_SQL = 500  # Chaves por consulta IN (...)
+
+_ESPACOS = re.compile(r'\s+')
+
+def init_tabela_cache():
+    """Cria a tabela do cache de classificação, se não existir"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    # Categoria por hash de conteúdo; escopo '' = regras padrão
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS classification_cache (
+            escopo TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            versao TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            usado_em REAL,
+            PRIMARY KEY (escopo, chave)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cache_usado_em ON classification_cache(usado_em)')
+
+    conn.commit()
+    conn.close()
+
+# ===============================
+# CHAVES E VERSÕES
+# ===============================
+def chave_conteudo(assunto, corpo, remetente="", list_id=""):
+    """
+    Hash do remetente, List-Id, assunto e começo do corpo, sem diferença de
+    caixa, acentos e espaços (regras do usuário podem depender do remetente)
+    """
+    endereco = parseaddr(remetente)[1] if remetente else ''
+    texto = f"{endereco}\0{list_id or ''}\0{assunto or ''}\0{(corpo or '')[:PREFIXO_CORPO]}"
+    texto = _ESPACOS.sub(' ', normalizar(texto)).strip()
+    return hashlib.blake2b(texto.encode('utf-8', errors='ignore'), digest_size=16).hexdigest()
+
+def versao_regras(*regras):
+    """Hash das regras de classificação (qualquer estrutura serializável em JSON)"""
+    serializado = json.dumps(regras, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(serializado.encode('utf-8')).hexdigest()[:16]
+
+# ===============================
+# CACHE
+# ===============================
+class CacheClassificacao:
+    """
+    Categoria por conteúdo para um conjunto de regras (`versao`).
+    `escopo` separa conjuntos de regras diferentes na mesma tabela.
+    Seguro entre threads (a classificação roda fora do event loop).
+    """
+
+    def __init__(self, versao, escopo='', max_memoria=MAX_ENTRADAS_MEMORIA, max_banco=MAX_ENTRADAS_BANCO):
+        self.versao = versao
+        self.escopo = escopo
+        self.max_memoria = max_memoria
+        self.max_banco = max_banco
+        self._memoria = OrderedDict()
+        self._trava = threading.Lock()
+        self._banco_verificado = False
+        self._gravadas = CONTAR_A_CADA  # Confere o tamanho da tabela já na primeira gravação
+        self.acertos = 0
+        self.falhas = 0
+
+    def _verificar_banco(self):
+        """Na primeira consulta, apaga as entradas do escopo geradas por outras versões das regras"""
+        if self._banco_verificado:
+            return
+        self._banco_verificado = True
+        try:
+            conn = sqlite3.connect(DB_PATH)
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM classification_cache WHERE escopo = ? AND versao != ?',
+                           (self.escopo, self.versao))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Erro ao limpar cache de classificação: {e}")
+
+    def invalidar(self, versao):
+        """Troca a versão das regras: a memória é esvaziada e o banco limpo na próxima consulta"""
+        with self._trava:
+            self.versao = versao
+            self._memoria.clear()
+            self._banco_verificado = False
+
+    def _lembrar(self, chave, categoria):
+        self._memoria[chave] = categoria
+        self._memoria.move_to_end(chave)
+        if len(self._memoria) > self.max_memoria:
+            self._memoria.popitem(last=False)
+
+    def obter(self, chaves):
+        """Retorna {chave: categoria} das chaves conhecidas (memória primeiro, depois o banco)"""
+        encontradas = {}
+        faltando = []
+        with self._trava:
+            for chave in chaves:
+                categoria = self._memoria.get(chave)
+                if categoria is None:
+                    faltando.append(chave)
+                else:
+                    self._memoria.move_to_end(chave)
+                    encontradas[chave] = categoria
+
+        if faltando:
+            do_banco = self._obter_do_banco(faltando)
+            if do_banco:
+                with self._trava:
+                    for chave, categoria in do_banco.items():
+                        self._lembrar(chave, categoria)
+                encontradas.update(do_banco)
+
+        with self._trava:
+            self.acertos += len(encontradas)
+            self.falhas += len(chaves) - len(encontradas)
+        return encontradas
+
+    def _obter_do_banco(self, chaves):
+        self._verificar_banco()
+        encontradas = {}
+        try:
+            conn = sqlite3.connect(DB_PATH)
+            cursor = conn.cursor()
+            for inicio in range(0, len(chaves), LOTE_SQL):
+                parte = chaves[inicio:inicio + LOTE_SQL]
+                marcadores = ','.join('?' * len(parte))
+                cursor.execute(f'''
+                    SELECT chave, categoria FROM classification_cache
+                    WHERE escopo = ? AND versao = ? AND chave IN ({marcadores})
+                ''', (self.escopo, self.versao, *parte))
+                encontradas.update(cursor.fetchall())
+
+            # Marca o uso, para a remoção por idade poupar as entradas ativas
+            if encontradas:
+                agora = time.time()
+                cursor.executemany(
+                    'UPDATE classification_cache SET usado_em = ? WHERE escopo = ? AND chave = ?',
+                    [(agora, self.escopo, chave) for chave in encontradas]
+                )
+                conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Erro ao ler cache de classificação: {e}")
+        return encontradas
+
+    def salvar(self, pares):
+        """Grava {chave: categoria} na memória e no banco, respeitando o tamanho máximo"""
+        if not pares:
+            return
+        with self._trava:
+            for chave, categoria in pares.items():
+                self._lembrar(chave, categoria)
+
+        self._verificar_banco()
+        try:
+            conn = sqlite3.connect(DB_PATH)
+            cursor = conn.cursor()
+            agora = time.time()
+            cursor.executemany('''
+                INSERT OR REPLACE INTO classification_cache (escopo, chave, versao, categoria, usado_em)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(self.escopo, chave, self.versao, categoria, agora) for chave, categoria in pares.items()])
+
+            self._gravadas += len(pares)
+            excesso = 0
+            if self._gravadas >= CONTAR_A_CADA:
+                self._gravadas = 0
+                cursor.execute('SELECT COUNT(*) FROM classification_cache')
+                excesso = cursor.fetchone()[0] - self.max_banco
+            if excesso > 0:
+                excesso += int(self.max_banco * FOLGA_REMOCAO)
+                cursor.execute('''
+                    DELETE FROM classification_cache WHERE rowid IN (
+                        SELECT rowid FROM classification_cache ORDER BY usado_em LIMIT ?
+                    )
+                ''', (excesso,))
+
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Erro ao gravar cache de classificação: {e}")
+
+    def classificar(self, emails, classificar_lote):
+        """
+        Categorias dos e-mails ({'assunto', 'corpo'[, 'remetente', 'list_id']}):
+        as conhecidas vêm do cache e só as demais passam por
+        `classificar_lote(emails) -> categorias`.
+        """
+        chaves = [chave_conteudo(e['assunto'], e['corpo'], e.get('remetente'), e.get('list_id')) for e in emails]
+        conhecidas = self.obter(chaves)
+
+        novos = [i for i, chave in enumerate(chaves) if chave not in conhecidas]
+        if novos:
+            categorias = classificar_lote([emails[i] for i in novos])
+            calculadas = {chaves[i]: categoria for i, categoria in zip(novos, categorias)}
+            self.salvar(calculadas)
+            conhecidas.update(calculadas)
+
+        return [conhecidas[chave] for chave in chaves]
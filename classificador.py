@@ -0,0 +1,160 @@
+"""
+Classificação por palavras-chave, preparada uma única vez.
+
+As palavras de cada categoria são normalizadas (minúsculas, sem acentos) na
+carga do módulo; o texto é normalizado uma vez por e-mail e comparado na
+ordem de prioridade, parando na primeira categoria que casar: "reuniao" e
+"REUNIÃO" casam com "reunião". A busca usa `in` (busca de substring em C),
+que no CPython é mais rápida que uma expressão regular com todas as palavras.
+"""
+from email.utils import parseaddr
+import unicodedata
+
+# ===============================
+# CATEGORIAS PADRÃO
+# ===============================
+# Palavras-chave por categoria, em ordem de prioridade
+CATEGORIAS_PALAVRAS = {
+    "Faturas": ["boleto", "pagamento", "vencimento", "conta", "nota fiscal", "pix"],
+    "Trabalho": ["projeto", "relatório", "reunião", "anexo", "cliente", "documento"],
+    "Pessoal": ["amizade", "convite", "parabéns", "evento", "família"],
+    "Marketing": ["promoção", "desconto", "oferta", "newsletter", "cupom"],
+    "Sistema": ["erro", "bug", "alerta", "sistema", "login"],
+}
+
+# ===============================
+# NORMALIZAÇÃO
+# ===============================
+def _tabela_sem_acentos():
+    """Tabela para str.translate: letras acentuadas → base, marcas combinantes → removidas"""
+    tabela = {codigo: None for codigo in range(0x300, 0x370)}
+    for codigo in range(0xC0, 0x250):
+        letra = chr(codigo)
+        base = unicodedata.normalize('NFKD', letra).encode('ascii', 'ignore').decode('ascii')
+        if base and base != letra:
+            tabela[codigo] = base
+    return tabela
+
+_SEM_ACENTOS = _tabela_sem_acentos()
+
+def normalizar(texto):
+    """Minúsculas e sem acentos (ex.: 'Reunião' → 'reuniao')"""
+    if texto.isascii():
+        return texto.lower()
+    return texto.casefold().translate(_SEM_ACENTOS)
+
+# ===============================
+# CLASSIFICADOR PREPARADO
+# ===============================
+class ClassificadorPalavras:
+    """
+    Palavras-chave de todas as categorias, já normalizadas e sem repetição.
+    `categorias` é {categoria: [palavras]} em ordem de prioridade.
+    """
+
+    def __init__(self, categorias):
+        self._regras = []
+        for categoria, palavras in categorias.items():
+            termos = tuple(dict.fromkeys(normalizar(p) for p in palavras if p and p.strip()))
+            if termos:
+                self._regras.append((categoria, termos))
+
+    def categoria(self, texto):
+        """Retorna a categoria de maior prioridade com alguma palavra no texto, ou None"""
+        if not texto:
+            return None
+        texto = normalizar(texto)
+        for categoria, termos in self._regras:
+            for termo in termos:
+                if termo in texto:
+                    return categoria
+        return None
+
+# Preparado na carga do módulo, compartilhado por app.py e organizador.py
+CLASSIFICADOR_PADRAO = ClassificadorPalavras(CATEGORIAS_PALAVRAS)
+
+def classificar_por_palavras(texto):
+    """Retorna a categoria pelas palavras-chave padrão, ou None se nenhuma casar"""
+    return CLASSIFICADOR_PADRAO.categoria(texto)
+
+# ===============================
+# REGRAS DO USUÁRIO
+# ===============================
+CAMPOS_REGRA = ("remetente", "list_id", "assunto", "corpo")  # Ordem de avaliação
+
+def _dominios(endereco):
+    """'a@mail.exemplo.com' → ['mail.exemplo.com', 'exemplo.com', 'com']"""
+    dominio = endereco.rpartition("@")[2]
+    partes = dominio.split(".")
+    return [".".join(partes[i:]) for i in range(len(partes))] if dominio else []
+
+class ClassificadorRegras:
+    """
+    Regras de um usuário compiladas em uma estrutura de decisão.
+    `regras` é uma sequência de (categoria, campo, valor) já em ordem de
+    prioridade; `campo` é um de CAMPOS_REGRA. Remetentes viram dicionários
+    (endereço exato e domínio, incluindo subdomínios); List-Id, assunto e
+    corpo viram ClassificadorPalavras. Nenhuma regra é percorrida por e-mail.
+    """
+
+    def __init__(self, regras):
+        self._enderecos = {}
+        self._dominios = {}
+        termos = {campo: {} for campo in CAMPOS_REGRA[1:]}
+
+        for categoria, campo, valor in regras:
+            valor = normalizar((valor or "").strip())
+            if not valor or campo not in CAMPOS_REGRA:
+                continue
+            if campo == "remetente":
+                if "@" in valor.lstrip("@"):
+                    self._enderecos.setdefault(valor, categoria)
+                else:
+                    self._dominios.setdefault(valor.lstrip("@"), categoria)
+            else:
+                termos[campo].setdefault(categoria, []).append(valor)
+
+        self._por_campo = {campo: ClassificadorPalavras(por_categoria) for campo, por_categoria in termos.items()}
+        self.vazio = not (self._enderecos or self._dominios or any(c._regras for c in self._por_campo.values()))
+
+    def categoria_remetente(self, remetente):
+        """Categoria pelo endereço do remetente (exato, depois domínio), ou None"""
+        if not remetente or not (self._enderecos or self._dominios):
+            return None
+        endereco = normalizar(parseaddr(remetente)[1])
+        categoria = self._enderecos.get(endereco)
+        if categoria:
+            return categoria
+        for dominio in _dominios(endereco):
+            categoria = self._dominios.get(dominio)
+            if categoria:
+                return categoria
+        return None
+
+    def categoria(self, remetente="", list_id="", assunto="", corpo=""):
+        """Primeira categoria que casar, na ordem de CAMPOS_REGRA, ou None"""
+        return (self.categoria_remetente(remetente)
+                or self._por_campo["list_id"].categoria(list_id)
+                or self._por_campo["assunto"].categoria(assunto)
+                or self._por_campo["corpo"].categoria(corpo))
+
+def classificar_por_cabecalhos(registro, regras=None, indice=None, palavras=True):
+    """
+    Categoria só pelos cabeçalhos de um registro ({'assunto', 'remetente',
+    'list_id'}): regras do usuário primeiro, depois o índice de remetentes
+    aprendido (IndiceRemetentes) e por fim as palavras-chave padrão, só no
+    assunto (`palavras=False` as deixa para depois do corpo). Remetente e
+    List-Id ficam com as regras e o índice: por substring, "contato@" casaria
+    "conta" e "login@" casaria "login".
+    """
+    if regras:
+        categoria = regras.categoria(registro["remetente"], registro["list_id"], registro["assunto"])
+        if categoria:
+            return categoria
+    if indice:
+        categoria = indice.categoria(registro["remetente"])
+        if categoria:
+            return categoria
+    if not palavras:
+        return None
+    return classificar_por_palavras(registro["assunto"])
@@ -0,0 +1,21 @@
+"""
+Configuração do gunicorn (lida automaticamente do diretório de trabalho).
+
+As vigias do modo push (IMAP IDLE) não começam na importação do app:
+cada worker inicia a coordenação depois de carregado, e o lease no
+SQLite garante que só um processo mantenha as sessões IDLE.
+"""
+
+def post_worker_init(worker):
+    """Worker pronto: inicia a coordenação das vigias push"""
+    from app import iniciar_modo_push
+    iniciar_modo_push()
+
+def worker_exit(server, worker):
+    """Worker encerrando: para as vigias, libera o lease e faz LOGOUT das sessões livres do pool"""
+    from app import encerrar_modo_push, loop_imap, pool_conexoes
+    encerrar_modo_push()
+    try:
+        loop_imap.submeter(pool_conexoes.fechar()).result(timeout=10)
+    except Exception as e:
+        print(f"Erro ao fechar o pool IMAP: {e}")
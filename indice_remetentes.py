@@ -0,0 +1,168 @@
+"""
+Índice remetente → categoria aprendido (por conta de e-mail).
+
+A maioria das mensagens de um mesmo endereço ou domínio acaba sempre na
+mesma categoria. Cada observação (remetente, categoria) vem das
+organizações anteriores ou das mensagens já presentes nas pastas; os pesos
+decaem com o tempo (meia-vida), então mudanças de hábito se refletem aos
+poucos. Uma rota só é usada com observações suficientes e quando uma
+categoria domina as demais; o endereço exato tem precedência sobre o domínio.
+Consultado antes da análise do corpo, o índice dispensa o download do corpo
+das mensagens de remetentes conhecidos.
+"""
+from email.utils import parseaddr
+import sqlite3
+import time
+
+# ===============================
+# CONFIGURAÇÕES
+# ===============================
+DB_PATH = 'organizer.db'
+MEIA_VIDA_DIAS = 90  # Uma observação vale metade após este prazo
+MIN_OBSERVACOES = 2.5  # Peso mínimo (já com decaimento) da categoria vencedora: ~3 observações recentes
+CONFIANCA_MINIMA = 0.9  # Fração mínima do peso total do remetente na categoria vencedora
+LIMITE_APRENDIZADO_PASTA = 2000  # Mensagens mais recentes lidas por pasta em cada aprendizado
+
+# Categorias que dependem do conteúdo, não do remetente
+CATEGORIAS_NAO_APRENDIDAS = frozenset(("Problemas", "Positivos", "Neutros"))
+
+# Pastas de sistema comuns fora do Gmail (no Gmail ficam em [Gmail]/...)
+PASTAS_IGNORADAS = frozenset(("inbox", "sent", "sent items", "sent messages", "drafts", "trash", "deleted items",
+                              "junk", "spam", "archive", "outbox"))
+
+_MEIA_VIDA_SEGUNDOS = MEIA_VIDA_DIAS * 24 * 60 * 60
+
+def init_tabela_indice():
+    """Cria a tabela do índice de remetentes, se não existir"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    # Peso (com decaimento até atualizado_em) de cada categoria por endereço ou @domínio
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sender_routes (
+            gmail_account TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            peso REAL NOT NULL,
+            atualizado_em REAL NOT NULL,
+            PRIMARY KEY (gmail_account, chave, categoria)
+        )
+    ''')
+
+    conn.commit()
+    conn.close()
+
+# ===============================
+# CHAVES
+# ===============================
+def chaves_remetente(remetente):
+    """'Fulano <a@b.com>' → ('a@b.com', '@b.com'); () se não houver endereço"""
+    endereco = parseaddr(remetente or "")[1].strip().lower()
+    if "@" not in endereco:
+        return ()
+    return endereco, "@" + endereco.rpartition("@")[2]
+
+def pasta_aprendivel(pasta):
+    """Pastas de categoria: fora INBOX, pastas de sistema e categorias de sentimento"""
+    if not pasta or pasta.startswith("[Gmail]") or pasta in CATEGORIAS_NAO_APRENDIDAS:
+        return False
+    return pasta.lower() not in PASTAS_IGNORADAS
+
+def _decair(peso, desde, agora):
+    return peso * 0.5 ** (max(agora - desde, 0) / _MEIA_VIDA_SEGUNDOS)
+
+# ===============================
+# APRENDIZADO
+# ===============================
+def registrar_observacoes(conta, observacoes):
+    """
+    Soma as observações [(remetente, categoria)] da conta ao índice, aplicando
+    antes o decaimento aos pesos já salvos. Uma leitura e uma gravação por chamada.
+    """
+    contagem = {}
+    for remetente, categoria in observacoes:
+        if not categoria or categoria in CATEGORIAS_NAO_APRENDIDAS:
+            continue
+        for chave in chaves_remetente(remetente):
+            contagem[(chave, categoria)] = contagem.get((chave, categoria), 0) + 1
+    if not contagem:
+        return 0
+
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        agora = time.time()
+
+        chaves = sorted({chave for chave, _ in contagem})
+        salvos = {}
+        for inicio in range(0, len(chaves), 500):
+            parte = chaves[inicio:inicio + 500]
+            cursor.execute(f'''
+                SELECT chave, categoria, peso, atualizado_em FROM sender_routes
+                WHERE gmail_account = ? AND chave IN ({','.join('?' * len(parte))})
+            ''', (conta, *parte))
+            for chave, categoria, peso, atualizado_em in cursor.fetchall():
+                salvos[(chave, categoria)] = _decair(peso, atualizado_em, agora)
+
+        cursor.executemany('''
+            INSERT OR REPLACE INTO sender_routes (gmail_account, chave, categoria, peso, atualizado_em)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(conta, chave, categoria, salvos.get((chave, categoria), 0.0) + quantidade, agora)
+              for (chave, categoria), quantidade in contagem.items()])
+
+        conn.commit()
+        conn.close()
+        return len(contagem)
+    except Exception as e:
+        print(f"Erro ao registrar observações de remetentes: {e}")
+        return 0
+
+# ===============================
+# CONSULTA
+# ===============================
+class IndiceRemetentes:
+    """
+    Rotas confiáveis da conta ({endereço ou @domínio: categoria}), calculadas
+    uma vez na carga; cada consulta é uma busca em dicionário.
+    """
+
+    def __init__(self, rotas):
+        self.rotas = rotas
+
+    @classmethod
+    def carregar(cls, conta, min_observacoes=MIN_OBSERVACOES, confianca_minima=CONFIANCA_MINIMA):
+        """Lê o índice da conta e mantém só as rotas acima dos limites de confiança"""
+        pesos = {}
+        try:
+            conn = sqlite3.connect(DB_PATH)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT chave, categoria, peso, atualizado_em FROM sender_routes
+                WHERE gmail_account = ?
+            ''', (conta,))
+            agora = time.time()
+            for chave, categoria, peso, atualizado_em in cursor.fetchall():
+                pesos.setdefault(chave, {})[categoria] = _decair(peso, atualizado_em, agora)
+            conn.close()
+        except Exception as e:
+            print(f"Erro ao carregar índice de remetentes: {e}")
+
+        rotas = {}
+        for chave, por_categoria in pesos.items():
+            categoria, peso = max(por_categoria.items(), key=lambda item: item[1])
+            if peso >= min_observacoes and peso >= confianca_minima * sum(por_categoria.values()):
+                rotas[chave] = categoria
+        return cls(rotas)
+
+    def __len__(self):
+        return len(self.rotas)
+
+    def categoria(self, remetente):
+        """Categoria do endereço exato ou, na falta, do domínio; None se não houver rota confiável"""
+        if not self.rotas:
+            return None
+        for chave in chaves_remetente(remetente):
+            categoria = self.rotas.get(chave)
+            if categoria:
+                return categoria
+        return None
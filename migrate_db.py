@@ -2,6 +2,16 @@
 Script de migração do banco de dados para adicionar:
 - Colunas gmail_email e gmail_password na tabela users
 - Tabela user_statistics para métricas persistentes
+- Tabela sync_checkpoints para sincronização incremental por UID
+- Tabelas folder_modseq e folder_message_ids (CONDSTORE na verificação de duplicatas)
+- Tabela push_enrollments (contas no modo push via IMAP IDLE)
+- Tabela mailbox_metadata (capacidades, delimitador e pastas de cada conta)
+- Tabela classification_cache (categoria por hash de conteúdo)
+- Tabela user_rules (regras de classificação de cada usuário)
+- Tabela sender_routes (índice remetente → categoria aprendido)
+- Tabela bayes_models (contagens do Naive Bayes de cada usuário)
+- Tabela push_lease (processo que mantém as vigias do modo push)
+- Tabela uid_failures (execuções com falha de cada UID, para o checkpoint não travar)
 """
 import sqlite3
 import os
@@ -81,6 +91,242 @@ def migrate_database():
     else:
         print("   ℹ️  Tabela user_statistics já existe")
     
+    # ========== MIGRAÇÃO 3: Checkpoints de sincronização por UID ==========
+    print("\n🔄 Verificando tabela sync_checkpoints...")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='sync_checkpoints'")
+    if cursor.fetchone() is None:
+        print("   📝 Criando tabela sync_checkpoints...")
+        cursor.execute('''
+            CREATE TABLE sync_checkpoints (
+                gmail_account TEXT NOT NULL,
+                pasta TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                ultimo_uid INTEGER DEFAULT 0,
+                atualizado_em TIMESTAMP,
+                PRIMARY KEY (gmail_account, pasta)
+            )
+        ''')
+        changes_made = True
+        print("   ✅ Tabela sync_checkpoints criada!")
+    else:
+        print("   ℹ️  Tabela sync_checkpoints já existe")
+    
+    # ========== MIGRAÇÃO 4: Estado CONDSTORE das pastas ==========
+    tabelas_condstore = {
+        'folder_modseq': '''
+            CREATE TABLE folder_modseq (
+                gmail_account TEXT NOT NULL,
+                pasta TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                highestmodseq INTEGER NOT NULL,
+                atualizado_em TIMESTAMP,
+                PRIMARY KEY (gmail_account, pasta)
+            )
+        ''',
+        'folder_message_ids': '''
+            CREATE TABLE folder_message_ids (
+                gmail_account TEXT NOT NULL,
+                pasta TEXT NOT NULL,
+                uid INTEGER NOT NULL,
+                message_id TEXT,
+                PRIMARY KEY (gmail_account, pasta, uid)
+            )
+        ''',
+    }
+    for tabela, ddl in tabelas_condstore.items():
+        print(f"\n⚡ Verificando tabela {tabela}...")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (tabela,))
+        if cursor.fetchone() is None:
+            print(f"   📝 Criando tabela {tabela}...")
+            cursor.execute(ddl)
+            changes_made = True
+            print(f"   ✅ Tabela {tabela} criada!")
+        else:
+            print(f"   ℹ️  Tabela {tabela} já existe")
+    
+    # ========== MIGRAÇÃO 5: Contas no modo push (IMAP IDLE) ==========
+    print("\n📡 Verificando tabela push_enrollments...")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='push_enrollments'")
+    if cursor.fetchone() is None:
+        print("   📝 Criando tabela push_enrollments...")
+        cursor.execute('''
+            CREATE TABLE push_enrollments (
+                user_id TEXT PRIMARY KEY,
+                excluir_inbox BOOLEAN DEFAULT 1,
+                ativado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(user_id)
+            )
+        ''')
+        changes_made = True
+        print("   ✅ Tabela push_enrollments criada!")
+    else:
+        print("   ℹ️  Tabela push_enrollments já existe")
+    
+    # ========== MIGRAÇÃO 6: Metadados da caixa postal ==========
+    print("\n🗂️ Verificando tabela mailbox_metadata...")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='mailbox_metadata'")
+    if cursor.fetchone() is None:
+        print("   📝 Criando tabela mailbox_metadata...")
+        cursor.execute('''
+            CREATE TABLE mailbox_metadata (
+                gmail_account TEXT PRIMARY KEY,
+                capabilities TEXT,
+                delimitador TEXT,
+                pastas TEXT,
+                atualizado_em TIMESTAMP
+            )
+        ''')
+        changes_made = True
+        print("   ✅ Tabela mailbox_metadata criada!")
+    else:
+        print("   ℹ️  Tabela mailbox_metadata já existe")
+    
+    # ========== MIGRAÇÃO 7: Cache de classificação ==========
+    print("\n🧠 Verificando tabela classification_cache...")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='classification_cache'")
+    if cursor.fetchone() is None:
+        print("   📝 Criando tabela classification_cache...")
+        cursor.execute('''
+            CREATE TABLE classification_cache (
+                escopo TEXT NOT NULL,
+                chave TEXT NOT NULL,
+                versao TEXT NOT NULL,
+                categoria TEXT NOT NULL,
+                usado_em REAL,
+                PRIMARY KEY (escopo, chave)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_cache_usado_em ON classification_cache(usado_em)')
+        changes_made = True
+        print("   ✅ Tabela classification_cache criada!")
+    else:
+        print("   ℹ️  Tabela classification_cache já existe")
+    
+    # ========== MIGRAÇÃO 8: Regras de classificação do usuário ==========
+    print("\n🧩 Verificando tabela user_rules...")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user_rules'")
+    if cursor.fetchone() is None:
+        print("   📝 Criando tabela user_rules...")
+        cursor.execute('''
+            CREATE TABLE user_rules (
+                regra_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                categoria TEXT NOT NULL,
+                campo TEXT NOT NULL,
+                valor TEXT NOT NULL,
+                prioridade INTEGER DEFAULT 0,
+                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(user_id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_rules_user_id ON user_rules(user_id)')
+        changes_made = True
+        print("   ✅ Tabela user_rules criada!")
+    else:
+        print("   ℹ️  Tabela user_rules já existe")
+    
+    # ========== MIGRAÇÃO 9: Índice de remetentes ==========
+    print("\n🧭 Verificando tabela sender_routes...")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='sender_routes'")
+    if cursor.fetchone() is None:
+        print("   📝 Criando tabela sender_routes...")
+        cursor.execute('''
+            CREATE TABLE sender_routes (
+                gmail_account TEXT NOT NULL,
+                chave TEXT NOT NULL,
+                categoria TEXT NOT NULL,
+                peso REAL NOT NULL,
+                atualizado_em REAL NOT NULL,
+                PRIMARY KEY (gmail_account, chave, categoria)
+            )
+        ''')
+        changes_made = True
+        print("   ✅ Tabela sender_routes criada!")
+    else:
+        print("   ℹ️  Tabela sender_routes já existe")
+    
+    # ========== MIGRAÇÃO 10: Modelos Naive Bayes ==========
+    print("\n🧠 Verificando tabela bayes_models...")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='bayes_models'")
+    if cursor.fetchone() is None:
+        print("   📝 Criando tabela bayes_models...")
+        cursor.execute('''
+            CREATE TABLE bayes_models (
+                user_id TEXT NOT NULL,
+                categoria TEXT NOT NULL,
+                documentos INTEGER NOT NULL,
+                contagens BLOB NOT NULL,
+                atualizado_em REAL NOT NULL,
+                PRIMARY KEY (user_id, categoria)
+            )
+        ''')
+        changes_made = True
+        print("   ✅ Tabela bayes_models criada!")
+    else:
+        # Criada em versões anteriores com user_id INTEGER (users.user_id é TEXT)
+        cursor.execute("PRAGMA table_info(bayes_models)")
+        tipos = {col[1]: col[2] for col in cursor.fetchall()}
+        if tipos.get('user_id', '').upper() != 'TEXT':
+            print("   📝 Convertendo bayes_models.user_id para TEXT...")
+            cursor.execute('ALTER TABLE bayes_models RENAME TO bayes_models_antiga')
+            cursor.execute('''
+                CREATE TABLE bayes_models (
+                    user_id TEXT NOT NULL,
+                    categoria TEXT NOT NULL,
+                    documentos INTEGER NOT NULL,
+                    contagens BLOB NOT NULL,
+                    atualizado_em REAL NOT NULL,
+                    PRIMARY KEY (user_id, categoria)
+                )
+            ''')
+            cursor.execute('''
+                INSERT INTO bayes_models (user_id, categoria, documentos, contagens, atualizado_em)
+                SELECT CAST(user_id AS TEXT), categoria, documentos, contagens, atualizado_em
+                FROM bayes_models_antiga
+            ''')
+            cursor.execute('DROP TABLE bayes_models_antiga')
+            changes_made = True
+            print("   ✅ Coluna user_id convertida!")
+        else:
+            print("   ℹ️  Tabela bayes_models já existe")
+    
+    # ========== MIGRAÇÃO 11: Lease das vigias push ==========
+    print("\n🔒 Verificando tabela push_lease...")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='push_lease'")
+    if cursor.fetchone() is None:
+        print("   📝 Criando tabela push_lease...")
+        cursor.execute('''
+            CREATE TABLE push_lease (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                dono TEXT NOT NULL,
+                expira_em REAL NOT NULL
+            )
+        ''')
+        changes_made = True
+        print("   ✅ Tabela push_lease criada!")
+    else:
+        print("   ℹ️  Tabela push_lease já existe")
+    
+    # ========== MIGRAÇÃO 12: Falhas por UID ==========
+    print("\n🔁 Verificando tabela uid_failures...")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='uid_failures'")
+    if cursor.fetchone() is None:
+        print("   📝 Criando tabela uid_failures...")
+        cursor.execute('''
+            CREATE TABLE uid_failures (
+                gmail_account TEXT NOT NULL,
+                pasta TEXT NOT NULL,
+                uid INTEGER NOT NULL,
+                tentativas INTEGER DEFAULT 0,
+                atualizado_em TIMESTAMP,
+                PRIMARY KEY (gmail_account, pasta, uid)
+            )
+        ''')
+        changes_made = True
+        print("   ✅ Tabela uid_failures criada!")
+    else:
+        print("   ℹ️  Tabela uid_failures já existe")
+    
     # ========== COMMIT E VERIFICAÇÃO FINAL ==========
     if changes_made:
         conn.commit()
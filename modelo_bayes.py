@@ -0,0 +1,232 @@
+"""
+Naive Bayes multinomial por usuário, sobre palavras com hash (opcional).
+
+Cada usuário que ativa o modelo tem, por categoria, um vetor de contagens
+de palavras de tamanho fixo (NUM_FEATURES baldes, índice = crc32 da palavra
+normalizada) e o número de e-mails vistos. Os vetores ficam no SQLite como
+uint32 comprimidos com zlib e são somados aos poucos com as mensagens novas
+de cada pasta de categoria (treino incremental, com checkpoint por pasta).
+Na carga, as contagens viram uma matriz de log-probabilidades (categorias ×
+baldes); um lote de e-mails é pontuado em blocos de palavras de tamanho
+fixo, somando as colunas das palavras de cada e-mail (o produto escalar
+com o vetor de contagens do e-mail). Só as previsões com probabilidade alta são usadas;
+o resto segue para palavras-chave e sentimento.
+"""
+from itertools import chain
+import hashlib
+import re
+import sqlite3
+import time
+import zlib
+
+import numpy as np
+
+from classificador import normalizar
+
+# ===============================
+# CONFIGURAÇÕES
+# ===============================
+DB_PATH = 'organizer.db'
+NUM_FEATURES = 1 << 17  # Baldes de hash por categoria (~512 KB por categoria sem compressão)
+SUAVIZACAO = 1.0  # Suavização de Laplace das contagens
+MIN_DOCUMENTOS = 20  # E-mails mínimos para uma categoria entrar no modelo
+CONFIANCA_MINIMA = 0.8  # Probabilidade mínima da categoria prevista
+LIMITE_CARACTERES = 5000  # Caracteres de cada e-mail usados no treino e na previsão
+LIMITE_TREINO_PASTA = 1000  # Mensagens mais recentes lidas por pasta em cada treino
+PALAVRAS_POR_BLOCO = 1 << 16  # Palavras pontuadas por vez (memória: categorias × bloco × 4 bytes)
+
+_TOKEN = re.compile(r"\w+")
+_MASCARA = NUM_FEATURES - 1
+
+def init_tabela_bayes():
+    """Cria a tabela dos modelos Naive Bayes, se não existir"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    # Contagens de palavras (uint32 little-endian, zlib) por usuário e categoria
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bayes_models (
+            user_id TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            documentos INTEGER NOT NULL,
+            contagens BLOB NOT NULL,
+            atualizado_em REAL NOT NULL,
+            PRIMARY KEY (user_id, categoria)
+        )
+    ''')
+
+    conn.commit()
+    conn.close()
+
+def chave_checkpoint(user_id, pasta):
+    """Nome do checkpoint de treino da pasta (separado do aprendizado de remetentes)"""
+    return f"bayes:{user_id}:{pasta}"
+
+# ===============================
+# FEATURES
+# ===============================
+def texto_do_email(email):
+    """Texto usado pelo modelo: assunto + começo do corpo"""
+    return f"{email.get('assunto') or ''} {(email.get('corpo') or '')[:LIMITE_CARACTERES]}"
+
+def features(textos):
+    """Retorna (palavras por texto, índices dos baldes de todas as palavras em sequência)"""
+    tokens = [_TOKEN.findall(normalizar(texto)) if texto else [] for texto in textos]
+    contagens = np.fromiter(map(len, tokens), dtype=np.intp, count=len(tokens))
+    # crc32 é estável entre processos (hash() muda a cada execução)
+    indices = np.fromiter(
+        (zlib.crc32(token.encode('utf-8')) & _MASCARA for token in chain.from_iterable(tokens)),
+        dtype=np.intp, count=int(contagens.sum())
+    )
+    return contagens, indices
+
+def _ler_contagens(blob):
+    return np.frombuffer(zlib.decompress(blob), dtype='<u4').astype(np.int64)
+
+def _gravar_contagens(contagens):
+    return zlib.compress(np.minimum(contagens, 0xFFFFFFFF).astype('<u4').tobytes())
+
+# ===============================
+# TREINO
+# ===============================
+def treinar(user_id, exemplos):
+    """
+    Soma os exemplos [(categoria, texto)] às contagens do usuário.
+    Uma leitura e uma gravação por categoria; retorna o número de exemplos usados.
+    """
+    por_categoria = {}
+    for categoria, texto in exemplos:
+        if categoria:
+            por_categoria.setdefault(categoria, []).append(texto)
+    if not por_categoria:
+        return 0
+
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        agora = time.time()
+
+        for categoria, textos in por_categoria.items():
+            cursor.execute('''
+                SELECT documentos, contagens FROM bayes_models WHERE user_id = ? AND categoria = ?
+            ''', (user_id, categoria))
+            salvo = cursor.fetchone()
+            documentos, contagens = (salvo[0], _ler_contagens(salvo[1])) if salvo else (0, np.zeros(NUM_FEATURES, dtype=np.int64))
+
+            contagens += np.bincount(features(textos)[1], minlength=NUM_FEATURES)
+            cursor.execute('''
+                INSERT OR REPLACE INTO bayes_models (user_id, categoria, documentos, contagens, atualizado_em)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (user_id, categoria, documentos + len(textos), _gravar_contagens(contagens), agora))
+
+        conn.commit()
+        conn.close()
+        return sum(map(len, por_categoria.values()))
+    except Exception as e:
+        print(f"Erro ao treinar modelo Naive Bayes: {e}")
+        return 0
+
+def resumo_modelo(user_id):
+    """Retorna {categoria: e-mails vistos} do modelo do usuário ({} se não houver)"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute('SELECT categoria, documentos FROM bayes_models WHERE user_id = ? ORDER BY categoria', (user_id,))
+        resumo = dict(cursor.fetchall())
+        conn.close()
+        return resumo
+    except Exception as e:
+        print(f"Erro ao ler modelo Naive Bayes: {e}")
+        return {}
+
+def remover_modelo(user_id):
+    """Apaga o modelo do usuário e os checkpoints de treino das pastas"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM bayes_models WHERE user_id = ?', (user_id,))
+        prefixo = chave_checkpoint(user_id, '')
+        cursor.execute('DELETE FROM sync_checkpoints WHERE substr(pasta, 1, ?) = ?', (len(prefixo), prefixo))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Erro ao remover modelo Naive Bayes: {e}")
+        return False
+
+# ===============================
+# PREVISÃO
+# ===============================
+class ModeloBayes:
+    """
+    Log-probabilidades (categorias × baldes) e log das prioris, calculadas
+    uma vez na carga. `versao` muda sempre que o modelo é treinado.
+    """
+
+    def __init__(self, categorias, documentos, contagens, versao=''):
+        self.categorias = list(categorias)
+        self.versao = versao
+        documentos = np.asarray(documentos, dtype=np.float64)
+        contagens = np.asarray(contagens, dtype=np.float64)
+
+        self.log_prioris = np.log(documentos / documentos.sum())
+        totais = contagens.sum(axis=1, keepdims=True)
+        self.log_probabilidades = np.log(
+            (contagens + SUAVIZACAO) / (totais + SUAVIZACAO * contagens.shape[1])
+        ).astype(np.float32)
+
+    @classmethod
+    def carregar(cls, user_id, min_documentos=MIN_DOCUMENTOS):
+        """Modelo do usuário, ou None se houver menos de duas categorias com exemplos suficientes"""
+        try:
+            conn = sqlite3.connect(DB_PATH)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT categoria, documentos, contagens, atualizado_em FROM bayes_models
+                WHERE user_id = ? AND documentos >= ? ORDER BY categoria
+            ''', (user_id, min_documentos))
+            linhas = cursor.fetchall()
+            conn.close()
+        except Exception as e:
+            print(f"Erro ao carregar modelo Naive Bayes: {e}")
+            return None
+
+        if len(linhas) < 2:
+            return None
+
+        versao = hashlib.sha1(repr([(c, d, a) for c, d, _, a in linhas]).encode('utf-8')).hexdigest()[:16]
+        return cls(
+            [linha[0] for linha in linhas],
+            [linha[1] for linha in linhas],
+            np.vstack([_ler_contagens(linha[2]) for linha in linhas]),
+            versao
+        )
+
+    def probabilidades(self, textos):
+        """Matriz (textos × categorias) com a probabilidade de cada categoria"""
+        contagens, indices = features(textos)
+        pontos = np.tile(self.log_prioris, (len(textos), 1))
+
+        # Soma das colunas das palavras de cada texto, um bloco de palavras por vez
+        # (textos sem palavras ficam só com a priori; um texto pode cruzar blocos)
+        donos = np.repeat(np.arange(len(textos)), contagens)
+        for inicio in range(0, len(indices), PALAVRAS_POR_BLOCO):
+            bloco = slice(inicio, inicio + PALAVRAS_POR_BLOCO)
+            donos_bloco = donos[bloco]
+            inicios = np.flatnonzero(np.r_[True, donos_bloco[1:] != donos_bloco[:-1]])
+            colunas = self.log_probabilidades[:, indices[bloco]]
+            pontos[donos_bloco[inicios]] += np.add.reduceat(colunas, inicios, axis=1).T
+
+        pontos -= pontos.max(axis=1, keepdims=True)
+        probabilidades = np.exp(pontos)
+        return probabilidades / probabilidades.sum(axis=1, keepdims=True)
+
+    def prever(self, textos, confianca_minima=CONFIANCA_MINIMA):
+        """Categoria prevista de cada texto, ou None quando a probabilidade fica abaixo do mínimo"""
+        if not textos:
+            return []
+        probabilidades = self.probabilidades(textos)
+        melhores = probabilidades.argmax(axis=1)
+        confiancas = probabilidades[np.arange(len(textos)), melhores]
+        return [self.categorias[i] if confianca >= confianca_minima else None
+                for i, confianca in zip(melhores.tolist(), confiancas.tolist())]
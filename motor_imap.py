@@ -0,0 +1,797 @@
+"""
+Parte do motor IMAP que não faz E/S de rede, compartilhada por app.py e
+organizador.py (o cliente e os comandos ficam em motor_imap_async):
+- Compactação de conjuntos de IDs (ex.: 1:40,45,50:90) e divisão em lotes
+- Leitura da resposta de FETCH com múltiplos literais
+- Registro do e-mail a partir dos cabeçalhos (listagem em duas etapas)
+- Escolha da parte de texto pelo BODYSTRUCTURE e decodificação do trecho
+- Checkpoints da sincronização incremental por UID no organizer.db
+- Estado CONDSTORE (HIGHESTMODSEQ + Message-IDs) salvo por pasta
+- Nomes de pasta em UTF-7 modificado, X-GM-MSGID e resposta do LIST
+- Metadados da caixa postal (capacidades, delimitador, pastas) com validade
+"""
+import base64
+import datetime
+import json
+import quopri
+import re
+import sqlite3
+
+from parser_email import LIMITE_HTML_BYTES, decodificar_cabecalho, extrair_corpo, html_para_texto, ler_cabecalhos
+
+# ===============================
+# CONFIGURAÇÕES
+# ===============================
+TAMANHO_LOTE_FETCH = 200  # Mensagens por comando FETCH
+
+_INICIO_FETCH = re.compile(rb'^(\d+) \(')
+_TAMANHO_LITERAL = re.compile(rb'\{(\d+)\}$')
+
+# ===============================
+# CONJUNTOS DE IDS
+# ===============================
+def compactar_conjunto(ids):
+    """Converte uma lista de IDs em um conjunto IMAP compacto (ex.: 1:40,45,50:90)"""
+    numeros = sorted({int(i) for i in ids})
+    if not numeros:
+        return ""
+
+    faixas = []
+    inicio = fim = numeros[0]
+    for n in numeros[1:]:
+        if n == fim + 1:
+            fim = n
+            continue
+        faixas.append(f"{inicio}:{fim}" if inicio != fim else str(inicio))
+        inicio = fim = n
+    faixas.append(f"{inicio}:{fim}" if inicio != fim else str(inicio))
+
+    return ",".join(faixas)
+
+def dividir_em_lotes(ids, tamanho=TAMANHO_LOTE_FETCH):
+    """Divide uma lista de IDs em lotes de tamanho fixo"""
+    for i in range(0, len(ids), tamanho):
+        yield ids[i:i + tamanho]
+
+# ===============================
+# LEITURA DE RESPOSTAS FETCH
+# ===============================
+class _Literal:
+    """Marca um literal IMAP ({N}) já lido pelo imaplib"""
+    __slots__ = ('dados',)
+
+    def __init__(self, dados):
+        self.dados = dados
+
+def _tokenizar(pedacos):
+    """Quebra os pedaços de uma resposta FETCH em tokens IMAP"""
+    for pedaco in pedacos:
+        if isinstance(pedaco, _Literal):
+            yield pedaco
+            continue
+
+        i = 0
+        tamanho = len(pedaco)
+        while i < tamanho:
+            c = pedaco[i:i + 1]
+            if c in (b' ', b'\r', b'\n'):
+                i += 1
+            elif c in (b'(', b')'):
+                yield c
+                i += 1
+            elif c == b'"':
+                i += 1
+                valor = bytearray()
+                while i < tamanho and pedaco[i:i + 1] != b'"':
+                    if pedaco[i:i + 1] == b'\\':
+                        i += 1
+                    valor += pedaco[i:i + 1]
+                    i += 1
+                i += 1
+                yield bytes(valor).decode('utf-8', errors='replace')
+            else:
+                inicio = i
+                profundidade = 0
+                while i < tamanho:
+                    c = pedaco[i:i + 1]
+                    if c == b'[':
+                        profundidade += 1
+                    elif c == b']':
+                        profundidade -= 1
+                    elif profundidade == 0 and c in (b' ', b'(', b')', b'\r', b'\n'):
+                        break
+                    i += 1
+                atomo = pedaco[inicio:i].decode('utf-8', errors='replace')
+                yield None if atomo.upper() == 'NIL' else atomo
+
+def _montar_listas(tokens):
+    """Transforma a sequência de tokens em listas aninhadas"""
+    pilha = [[]]
+    for token in tokens:
+        if token == b'(':
+            pilha.append([])
+        elif token == b')':
+            if len(pilha) > 1:
+                lista = pilha.pop()
+                pilha[-1].append(lista)
+        elif isinstance(token, _Literal):
+            pilha[-1].append(token.dados)
+        else:
+            pilha[-1].append(token)
+    while len(pilha) > 1:
+        lista = pilha.pop()
+        pilha[-1].append(lista)
+    return pilha[0]
+
+def _montar_itens(pedacos):
+    """Converte os pedaços de uma mensagem em {ITEM: valor}"""
+    valores = _montar_listas(_tokenizar(pedacos))
+    itens = {}
+    if valores and isinstance(valores[0], list):
+        lista = valores[0]
+        for i in range(0, len(lista) - 1, 2):
+            chave = lista[i]
+            if isinstance(chave, str):
+                itens[chave.upper()] = lista[i + 1]
+    return itens
+
+def ler_resposta_fetch(data):
+    """
+    Lê a resposta de um FETCH com várias mensagens e vários literais.
+    Gera tuplas (numero_sequencia, {ITEM: valor}) à medida que cada
+    mensagem termina de ser percorrida.
+    """
+    numero = None
+    pedacos = []
+
+    for item in data:
+        if item is None:
+            continue
+
+        if isinstance(item, tuple):
+            cabecalho, literal = item
+        else:
+            cabecalho, literal = item, None
+
+        inicio = _INICIO_FETCH.match(cabecalho)
+        if inicio:
+            if numero is not None:
+                yield numero, _montar_itens(pedacos)
+            numero = int(inicio.group(1))
+            pedacos = [cabecalho[inicio.end() - 1:]]
+        elif numero is None:
+            continue
+        else:
+            pedacos.append(cabecalho)
+
+        if literal is not None:
+            pedacos[-1] = _TAMANHO_LITERAL.sub(b'', pedacos[-1])
+            pedacos.append(_Literal(literal))
+
+    if numero is not None:
+        yield numero, _montar_itens(pedacos)
+
+def obter_item(itens, prefixo):
+    """Retorna o primeiro item cujo nome começa com o prefixo (ex.: 'BODY[')"""
+    if prefixo in itens:
+        return itens[prefixo]
+    for chave, valor in itens.items():
+        if chave.startswith(prefixo):
+            return valor
+    return None
+
+# ===============================
+# FETCH EM LOTES
+# ===============================
+def indexar_lote(status, data, usar_uid=False):
+    """Indexa a resposta de um FETCH em {id_int: {ITEM: valor}}"""
+    recebidos = {}
+    if status == "OK":
+        for numero, valores in ler_resposta_fetch(data):
+            chave = int(valores['UID']) if usar_uid and 'UID' in valores else numero
+            recebidos[chave] = valores
+    return recebidos
+
+# ===============================
+# LISTAGEM EM DUAS ETAPAS (CABEÇALHOS → CORPO)
+# ===============================
+ITENS_CABECALHOS = "(BODY.PEEK[HEADER.FIELDS (SUBJECT FROM LIST-ID)])"
+LIMITE_CORPO_BYTES = 16 * 1024  # Prefixo máximo baixado por mensagem
+
+def registro_por_cabecalhos(num, itens, decidir):
+    """Monta o registro do e-mail a partir de Subject/From/List-Id (ou None)"""
+    cabecalhos = obter_item(itens, 'BODY[') if itens else None
+    if not isinstance(cabecalhos, bytes):
+        return None
+
+    msg = ler_cabecalhos(cabecalhos)
+    assunto = decodificar_cabecalho(msg["Subject"])
+    remetente = decodificar_cabecalho(msg["From"])
+    list_id = decodificar_cabecalho(msg["List-Id"])
+
+    registro = {
+        "id": num,
+        "assunto": assunto or "(Sem assunto)",
+        "corpo": "",
+        "remetente": remetente,
+        "list_id": list_id
+    }
+    registro["categoria"] = decidir(registro)
+    return registro
+
+# ===============================
+# BUSCA SELETIVA DA PARTE DE TEXTO (BODYSTRUCTURE)
+# ===============================
+def _parte_e_anexo(estrutura):
+    """Verifica se a parte simples tem Content-Disposition: attachment"""
+    # text/*: tipo, subtipo, params, id, descrição, encoding, tamanho, linhas, md5, disposição
+    indice = 9 if str(estrutura[0]).upper() == "TEXT" else 8
+    if len(estrutura) > indice and isinstance(estrutura[indice], list) and estrutura[indice]:
+        return str(estrutura[indice][0]).upper() == "ATTACHMENT"
+    return False
+
+def _percorrer_estrutura(estrutura, secao, candidatas):
+    """Coleta (secao, subtipo, encoding, charset) de cada parte text/plain ou text/html"""
+    if not isinstance(estrutura, list) or not estrutura:
+        return
+
+    if isinstance(estrutura[0], list):
+        # multipart: partes filhas vêm antes do subtipo
+        for i, parte in enumerate(estrutura, 1):
+            if not isinstance(parte, list):
+                break
+            _percorrer_estrutura(parte, f"{secao}.{i}" if secao else str(i), candidatas)
+        return
+
+    tipo = str(estrutura[0]).upper()
+    subtipo = str(estrutura[1]).upper() if len(estrutura) > 1 else ""
+    if tipo != "TEXT" or subtipo not in ("PLAIN", "HTML") or _parte_e_anexo(estrutura):
+        return
+
+    charset = "utf-8"
+    parametros = estrutura[2] if len(estrutura) > 2 and isinstance(estrutura[2], list) else []
+    for i in range(0, len(parametros) - 1, 2):
+        if str(parametros[i]).upper() == "CHARSET" and parametros[i + 1]:
+            charset = parametros[i + 1]
+
+    encoding = str(estrutura[5]).upper() if len(estrutura) > 5 and estrutura[5] else "7BIT"
+    candidatas.append((secao or "1", subtipo, encoding, charset))
+
+def localizar_parte_texto(estrutura):
+    """
+    Escolhe a primeira parte text/plain do BODYSTRUCTURE (ou text/html
+    como alternativa). Retorna (secao, subtipo, encoding, charset) ou None.
+    """
+    candidatas = []
+    _percorrer_estrutura(estrutura, "", candidatas)
+    for candidata in candidatas:
+        if candidata[1] == "PLAIN":
+            return candidata
+    return candidatas[0] if candidatas else None
+
+def decodificar_parte(dados, encoding, charset):
+    """Decodifica um trecho (possivelmente truncado) de uma parte MIME"""
+    if encoding == "BASE64":
+        dados = re.sub(rb'\s+', b'', dados)
+        dados = dados[:len(dados) - len(dados) % 4]
+        try:
+            dados = base64.b64decode(dados)
+        except Exception:
+            return ""
+    elif encoding == "QUOTED-PRINTABLE":
+        dados = quopri.decodestring(dados)
+
+    try:
+        return dados.decode(charset, errors="ignore")
+    except LookupError:
+        return dados.decode("utf-8", errors="ignore")
+
+def agrupar_por_secao(partes):
+    """Agrupa {id: parte} por (seção, subtipo), para que cada lote use um único FETCH"""
+    por_secao = {}
+    for num, parte in partes.items():
+        por_secao.setdefault((parte[0], parte[1]), []).append(num)
+    return por_secao
+
+def itens_da_parte(secao, subtipo, limite_corpo=LIMITE_CORPO_BYTES):
+    """Item de FETCH do trecho da parte; no HTML a marcação ocupa boa parte, então o trecho é maior"""
+    limite = max(limite_corpo, LIMITE_HTML_BYTES) if subtipo == "HTML" else limite_corpo
+    return f"(BODY.PEEK[{secao}]<0.{limite}>)"
+
+def corpo_da_parte(itens, parte):
+    """Decodifica o trecho baixado de uma parte de texto (ou None)"""
+    dados = obter_item(itens, 'BODY[') if itens else None
+    if not isinstance(dados, bytes):
+        return None
+
+    _, subtipo, encoding, charset = parte
+    texto = decodificar_parte(dados, encoding, charset)
+    return html_para_texto(texto) if subtipo == "HTML" else texto
+
+def corpo_do_prefixo(itens):
+    """Extrai o texto de um prefixo da mensagem inteira (ou None)"""
+    dados = obter_item(itens, 'BODY[') if itens else None
+    if not isinstance(dados, bytes):
+        return None
+    return extrair_corpo(dados)
+
+# ===============================
+# SINCRONIZAÇÃO INCREMENTAL POR UID (CHECKPOINTS NO SQLITE)
+# ===============================
+DB_PATH = 'organizer.db'
+MAX_TENTATIVAS_UID = 3  # Execuções com falha antes de o checkpoint passar adiante de um UID
+
+def init_tabelas_motor():
+    """Cria as tabelas usadas pelo motor IMAP, se não existirem"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    # Último UID processado por conta/pasta (válido enquanto o UIDVALIDITY não mudar)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_checkpoints (
+            gmail_account TEXT NOT NULL,
+            pasta TEXT NOT NULL,
+            uidvalidity INTEGER NOT NULL,
+            ultimo_uid INTEGER DEFAULT 0,
+            atualizado_em TIMESTAMP,
+            PRIMARY KEY (gmail_account, pasta)
+        )
+    ''')
+
+    # Execuções em que cada UID falhou; o checkpoint para antes dele até MAX_TENTATIVAS_UID
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS uid_failures (
+            gmail_account TEXT NOT NULL,
+            pasta TEXT NOT NULL,
+            uid INTEGER NOT NULL,
+            tentativas INTEGER DEFAULT 0,
+            atualizado_em TIMESTAMP,
+            PRIMARY KEY (gmail_account, pasta, uid)
+        )
+    ''')
+
+    # HIGHESTMODSEQ da última varredura de cada pasta (CONDSTORE)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS folder_modseq (
+            gmail_account TEXT NOT NULL,
+            pasta TEXT NOT NULL,
+            uidvalidity INTEGER NOT NULL,
+            highestmodseq INTEGER NOT NULL,
+            atualizado_em TIMESTAMP,
+            PRIMARY KEY (gmail_account, pasta)
+        )
+    ''')
+
+    # Message-IDs vistos em cada pasta, reaproveitados quando ela não muda
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS folder_message_ids (
+            gmail_account TEXT NOT NULL,
+            pasta TEXT NOT NULL,
+            uid INTEGER NOT NULL,
+            message_id TEXT,
+            PRIMARY KEY (gmail_account, pasta, uid)
+        )
+    ''')
+
+    # Metadados da caixa postal (capacidades, delimitador e pastas existentes)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS mailbox_metadata (
+            gmail_account TEXT PRIMARY KEY,
+            capabilities TEXT,
+            delimitador TEXT,
+            pastas TEXT,
+            atualizado_em TIMESTAMP
+        )
+    ''')
+
+    conn.commit()
+    conn.close()
+
+def obter_checkpoint(conta, pasta="INBOX"):
+    """Retorna {'uidvalidity', 'ultimo_uid'} da conta/pasta, ou None"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT uidvalidity, ultimo_uid FROM sync_checkpoints
+            WHERE gmail_account = ? AND pasta = ?
+        ''', (conta, pasta))
+
+        row = cursor.fetchone()
+        conn.close()
+
+        if row:
+            return {'uidvalidity': row[0], 'ultimo_uid': row[1]}
+        return None
+    except Exception as e:
+        print(f"Erro ao obter checkpoint: {e}")
+        return None
+
+def salvar_checkpoint(conta, pasta, uidvalidity, ultimo_uid):
+    """Grava (ou reinicia) o checkpoint da conta/pasta"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            INSERT OR REPLACE INTO sync_checkpoints (gmail_account, pasta, uidvalidity, ultimo_uid, atualizado_em)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (conta, pasta, uidvalidity, ultimo_uid, datetime.datetime.now().isoformat()))
+
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Erro ao salvar checkpoint: {e}")
+        return False
+
+def avancar_checkpoint(conta, pasta, ultimo_uid):
+    """Avança o último UID processado (nunca retrocede)"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            UPDATE sync_checkpoints
+            SET ultimo_uid = MAX(ultimo_uid, ?), atualizado_em = ?
+            WHERE gmail_account = ? AND pasta = ?
+        ''', (int(ultimo_uid), datetime.datetime.now().isoformat(), conta, pasta))
+
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Erro ao avançar checkpoint: {e}")
+        return False
+
+def registrar_falhas_uid(conta, pasta, uids):
+    """
+    Soma uma execução com falha a cada UID e retorna os que já falharam
+    MAX_TENTATIVAS_UID vezes: o checkpoint pode passar deles. Em caso de
+    erro no banco retorna set() (o UID continua segurando o checkpoint).
+    """
+    if not uids:
+        return set()
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        agora = datetime.datetime.now().isoformat()
+
+        cursor.executemany('''
+            INSERT OR IGNORE INTO uid_failures (gmail_account, pasta, uid, tentativas) VALUES (?, ?, ?, 0)
+        ''', [(conta, pasta, int(uid)) for uid in uids])
+        cursor.executemany('''
+            UPDATE uid_failures SET tentativas = tentativas + 1, atualizado_em = ?
+            WHERE gmail_account = ? AND pasta = ? AND uid = ?
+        ''', [(agora, conta, pasta, int(uid)) for uid in uids])
+
+        marcadores = ','.join('?' * len(uids))
+        cursor.execute(f'''
+            SELECT uid FROM uid_failures
+            WHERE gmail_account = ? AND pasta = ? AND tentativas >= ? AND uid IN ({marcadores})
+        ''', (conta, pasta, MAX_TENTATIVAS_UID, *[int(uid) for uid in uids]))
+        esgotados = {row[0] for row in cursor.fetchall()}
+
+        conn.commit()
+        conn.close()
+        return esgotados
+    except Exception as e:
+        print(f"Erro ao registrar falhas de UID: {e}")
+        return set()
+
+def limpar_falhas_uid(conta, pasta, ate_uid):
+    """Esquece as falhas dos UIDs até `ate_uid` (o checkpoint já passou deles)"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            DELETE FROM uid_failures WHERE gmail_account = ? AND pasta = ? AND uid <= ?
+        ''', (conta, pasta, int(ate_uid)))
+
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Erro ao limpar falhas de UID: {e}")
+        return False
+
+def limite_do_checkpoint(uids_ok, uids_com_erro, esgotados=()):
+    """
+    Maior UID até onde o checkpoint pode avançar: para antes do primeiro
+    erro ainda com tentativas (ele é tentado de novo na próxima execução);
+    UIDs em `esgotados` não seguram mais. None se nada puder avançar.
+    """
+    pendentes = [uid for uid in uids_com_erro if uid not in esgotados]
+    primeiro_erro = min(pendentes) if pendentes else None
+    validos = [uid for uid in uids_ok if primeiro_erro is None or uid < primeiro_erro]
+    return max(validos) if validos else None
+
+def ler_estado_status(status, dados):
+    """Extrai (UIDVALIDITY, HIGHESTMODSEQ) de uma resposta STATUS"""
+    if status != "OK" or not dados or not dados[0]:
+        return None, None
+    uidvalidity = re.search(rb'UIDVALIDITY (\d+)', dados[0])
+    modseq = re.search(rb'HIGHESTMODSEQ (\d+)', dados[0])
+    return (int(uidvalidity.group(1)) if uidvalidity else None,
+            int(modseq.group(1)) if modseq else None)
+
+def checkpoint_em_vigor(conta, pasta, uidvalidity):
+    """
+    Retorna o checkpoint da conta/pasta se ainda valer para este UIDVALIDITY;
+    caso contrário reinicia o checkpoint (quando possível) e retorna None.
+    """
+    if not conta or uidvalidity is None:
+        return None
+    checkpoint = obter_checkpoint(conta, pasta)
+    if not checkpoint or checkpoint['uidvalidity'] != uidvalidity:
+        salvar_checkpoint(conta, pasta, uidvalidity, 0)
+        return None
+    return checkpoint
+
+def uids_da_busca(dados, acima_de=0):
+    """Converte a resposta de UID SEARCH em UIDs ordenados, maiores que `acima_de`"""
+    # `n+1:*` sempre inclui a última mensagem, mesmo que já processada
+    uids = [u for u in dados[0].split() if int(u) > acima_de] if dados and dados[0] else []
+    return sorted(uids, key=int)
+
+# ===============================
+# DETECÇÃO DE MUDANÇAS POR PASTA (CONDSTORE / HIGHESTMODSEQ)
+# ===============================
+ITENS_MESSAGE_ID = "(BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])"
+
+_TRECHO_UTF7 = re.compile(r'&([^-]*)-')
+
+def codificar_utf7_imap(nome):
+    """Nome de pasta em UTF-7 modificado (RFC 3501 §5.1.3): 'Finanças' → 'Finan&AOc-as'"""
+    partes = []
+    fora_ascii = []
+
+    def fechar_trecho():
+        if fora_ascii:
+            dados = base64.b64encode(''.join(fora_ascii).encode('utf-16-be')).decode('ascii')
+            partes.append('&' + dados.rstrip('=').replace('/', ',') + '-')
+            fora_ascii.clear()
+
+    for caractere in nome:
+        if 0x20 <= ord(caractere) <= 0x7e:
+            fechar_trecho()
+            partes.append('&-' if caractere == '&' else caractere)
+        else:
+            fora_ascii.append(caractere)
+    fechar_trecho()
+    return ''.join(partes)
+
+def decodificar_utf7_imap(nome):
+    """Inverso de codificar_utf7_imap (nomes inválidos voltam sem alteração)"""
+    def trecho(m):
+        if not m.group(1):
+            return '&'
+        dados = m.group(1).replace(',', '/')
+        return base64.b64decode(dados + '=' * (-len(dados) % 4)).decode('utf-16-be')
+    try:
+        return _TRECHO_UTF7.sub(trecho, nome)
+    except (ValueError, UnicodeDecodeError):
+        return nome
+
+def nome_pasta_imap(pasta):
+    """Nome da pasta pronto para um comando: UTF-7 modificado e entre aspas (já entre aspas: sem alteração)"""
+    if pasta.startswith('"'):
+        return pasta
+    codificado = codificar_utf7_imap(pasta)
+    return '"' + codificado.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def ler_capacidades(status, dados):
+    """Converte a resposta de CAPABILITY em um conjunto de extensões"""
+    if status == "OK" and dados and dados[0]:
+        return set(dados[0].decode(errors="ignore").upper().split())
+    return set()
+
+def extrair_message_id(itens):
+    """Extrai o Message-ID de um item BODY[HEADER.FIELDS (MESSAGE-ID)]"""
+    cabecalho = obter_item(itens, 'BODY[') if itens else None
+    if not isinstance(cabecalho, bytes):
+        return ""
+    return (ler_cabecalhos(cabecalho).get("Message-ID") or "").strip()
+
+def obter_modseq_salvo(conta, pasta):
+    """Retorna {'uidvalidity', 'highestmodseq'} salvos para a pasta, ou None"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT uidvalidity, highestmodseq FROM folder_modseq
+            WHERE gmail_account = ? AND pasta = ?
+        ''', (conta, pasta))
+
+        row = cursor.fetchone()
+        conn.close()
+
+        if row:
+            return {'uidvalidity': row[0], 'highestmodseq': row[1]}
+        return None
+    except Exception as e:
+        print(f"Erro ao obter modseq: {e}")
+        return None
+
+def obter_message_ids_salvos(conta, pasta):
+    """Retorna {uid: message_id} guardados da última varredura da pasta"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT uid, message_id FROM folder_message_ids
+            WHERE gmail_account = ? AND pasta = ?
+        ''', (conta, pasta))
+
+        mapa = {row[0]: row[1] for row in cursor.fetchall()}
+        conn.close()
+        return mapa
+    except Exception as e:
+        print(f"Erro ao obter Message-IDs salvos: {e}")
+        return {}
+
+def salvar_estado_pasta(conta, pasta, uidvalidity, highestmodseq, message_ids):
+    """Substitui o estado salvo da pasta (modseq + {uid: message_id})"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            INSERT OR REPLACE INTO folder_modseq (gmail_account, pasta, uidvalidity, highestmodseq, atualizado_em)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (conta, pasta, uidvalidity, highestmodseq, datetime.datetime.now().isoformat()))
+
+        cursor.execute('DELETE FROM folder_message_ids WHERE gmail_account = ? AND pasta = ?', (conta, pasta))
+        cursor.executemany('''
+            INSERT INTO folder_message_ids (gmail_account, pasta, uid, message_id)
+            VALUES (?, ?, ?, ?)
+        ''', [(conta, pasta, uid, mid) for uid, mid in message_ids.items()])
+
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Erro ao salvar estado da pasta: {e}")
+        return False
+
+def pasta_inalterada(salvo, uidvalidity, modseq):
+    """Verifica se o estado salvo da pasta ainda corresponde ao do servidor"""
+    return bool(salvo and modseq is not None and salvo['uidvalidity'] == uidvalidity
+                and salvo['highestmodseq'] == modseq)
+
+# ===============================
+# DUPLICATAS NO GMAIL (X-GM-MSGID)
+# ===============================
+ITENS_GM_MSGID = "(X-GM-MSGID)"
+
+_GM_MSGID = re.compile(rb'X-GM-MSGID (\d+)')
+_UID_FETCH = re.compile(rb'UID (\d+)')
+
+def ler_gm_msgids(dados):
+    """
+    Converte a resposta de UID FETCH (X-GM-MSGID) em {uid: X-GM-MSGID}.
+    As linhas não têm literais: duas regex bastam, sem o leitor genérico de FETCH.
+    """
+    mapa = {}
+    for linha in dados or []:
+        if not isinstance(linha, bytes):
+            continue
+        msgid = _GM_MSGID.search(linha)
+        uid = _UID_FETCH.search(linha)
+        if msgid and uid:
+            mapa[int(uid.group(1))] = int(msgid.group(1))
+    return mapa
+
+# ===============================
+# METADADOS DA CAIXA POSTAL (CAPABILITY, DELIMITADOR, PASTAS)
+# ===============================
+TTL_METADADOS_SEGUNDOS = 6 * 60 * 60  # Depois disso, LIST e CAPABILITY são refeitos
+
+_LINHA_LIST = re.compile(rb'^\((?P<flags>[^)]*)\) (?P<delimitador>"(?:[^"\\]|\\.)*"|NIL) ?(?P<nome>.*)$', re.S)
+
+def _sem_aspas(texto):
+    """Remove as aspas (e os escapes) de uma string IMAP"""
+    if texto.startswith('"') and texto.endswith('"') and len(texto) >= 2:
+        return texto[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return texto
+
+def ler_lista_pastas(status, dados):
+    """
+    Converte a resposta de LIST em (delimitador, {nome_da_pasta}).
+    Aceita nomes entre aspas, atômicos ou enviados como literal; os nomes
+    voltam decodificados do UTF-7 modificado (ver nome_pasta_imap).
+    """
+    delimitador = None
+    pastas = set()
+    if status != "OK":
+        return delimitador, pastas
+
+    for item in dados or []:
+        if isinstance(item, tuple):
+            linha, literal = item
+        else:
+            linha, literal = item, None
+        if not isinstance(linha, bytes):
+            continue
+
+        resposta = _LINHA_LIST.match(linha)
+        if not resposta:
+            continue
+
+        bruto = resposta.group('delimitador').decode(errors='ignore')
+        if bruto != 'NIL' and delimitador is None:
+            delimitador = _sem_aspas(bruto)
+
+        if literal is not None:
+            nome = literal.decode(errors='ignore')
+        else:
+            nome = _sem_aspas(resposta.group('nome').decode(errors='ignore').strip())
+        if nome:
+            pastas.add(decodificar_utf7_imap(nome))
+
+    return delimitador, pastas
+
+def obter_metadados_caixa(conta, ttl=TTL_METADADOS_SEGUNDOS):
+    """Retorna {'capabilities', 'delimitador', 'pastas', 'idade'} salvos da conta, ou None se ausentes/vencidos"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT capabilities, delimitador, pastas, atualizado_em FROM mailbox_metadata
+            WHERE gmail_account = ?
+        ''', (conta,))
+
+        row = cursor.fetchone()
+        conn.close()
+
+        if not row or not row[3]:
+            return None
+        idade = (datetime.datetime.now() - datetime.datetime.fromisoformat(row[3])).total_seconds()
+        if idade > ttl:
+            return None
+        return {
+            'capabilities': set(json.loads(row[0] or '[]')),
+            'delimitador': row[1],
+            'pastas': set(json.loads(row[2] or '[]')),
+            'idade': idade
+        }
+    except Exception as e:
+        print(f"Erro ao obter metadados da caixa: {e}")
+        return None
+
+def salvar_metadados_caixa(conta, capacidades, delimitador, pastas):
+    """Grava os metadados da caixa postal da conta"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            INSERT OR REPLACE INTO mailbox_metadata (gmail_account, capabilities, delimitador, pastas, atualizado_em)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (conta, json.dumps(sorted(capacidades)), delimitador, json.dumps(sorted(pastas)),
+              datetime.datetime.now().isoformat()))
+
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Erro ao salvar metadados da caixa: {e}")
+        return False
+
+def remover_metadados_caixa(conta):
+    """Apaga os metadados salvos da conta (o próximo uso refaz o LIST)"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM mailbox_metadata WHERE gmail_account = ?', (conta,))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Erro ao remover metadados da caixa: {e}")
+        return False
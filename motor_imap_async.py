@@ -0,0 +1,1073 @@
+"""
+Motor IMAP assíncrono (asyncio), usado pelo app.py (Flask) e pelo
+organizador.py (Streamlit).
+
+Um único event loop em segundo plano atende os jobs de organização e de
+duplicatas de todos os usuários: cada job é uma corrotina, não uma thread.
+O cliente devolve as respostas no mesmo formato do imaplib ((status, dados),
+com literais em tuplas); a leitura das respostas, a escolha da parte de
+texto, os checkpoints e o cache CONDSTORE ficam em motor_imap, e aqui só
+os comandos que os usam.
+"""
+import asyncio
+from collections import deque
+import functools
+import re
+import ssl
+import threading
+import time
+import unicodedata
+
+from motor_imap import (
+    TAMANHO_LOTE_FETCH, ITENS_CABECALHOS, LIMITE_CORPO_BYTES, ITENS_MESSAGE_ID,
+    compactar_conjunto, dividir_em_lotes, indexar_lote, ler_resposta_fetch,
+    registro_por_cabecalhos, localizar_parte_texto, agrupar_por_secao, itens_da_parte,
+    corpo_da_parte, corpo_do_prefixo, ler_estado_status, checkpoint_em_vigor,
+    uids_da_busca, ler_capacidades, nome_pasta_imap, extrair_message_id,
+    obter_modseq_salvo, obter_message_ids_salvos, salvar_estado_pasta, pasta_inalterada,
+    ITENS_GM_MSGID, ler_gm_msgids, TTL_METADADOS_SEGUNDOS, ler_lista_pastas,
+    obter_metadados_caixa, salvar_metadados_caixa, remover_metadados_caixa,
+    obter_item, avancar_checkpoint, salvar_checkpoint, obter_checkpoint
+)
+from parser_email import decodificar_cabecalho, ler_cabecalhos
+
+# ===============================
+# CONFIGURAÇÕES
+# ===============================
+PORTA_IMAPS = 993
+TIMEOUT_COMANDO_SEGUNDOS = 120  # Espera máxima pela resposta de um comando
+TEMPO_IDLE_SEGUNDOS = 25 * 60  # Renova o IDLE antes do limite de 29 minutos do servidor
+
+_LITERAL = re.compile(rb'\{(\d+)\}$')
+_NAO_MARCADA = re.compile(rb'^\* (?:(?P<numero>\d+) )?(?P<tipo>[A-Za-z][A-Za-z0-9-]*)(?: (?P<resto>.*))?$', re.S)
+_CODIGO_RESPOSTA = re.compile(rb'^\[(?P<codigo>[A-Za-z0-9-]+)(?: (?P<dados>[^\]]*))?\]')
+
+class ErroIMAP(Exception):
+    """Resposta BAD, falha de login ou conexão encerrada"""
+
+def _citar(texto):
+    """Coloca um argumento entre aspas (usado no LOGIN)"""
+    return '"' + texto.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+class Literal:
+    """Argumento enviado como literal não sincronizado ({N+}), para texto UTF-8"""
+    __slots__ = ('dados',)
+
+    def __init__(self, texto):
+        self.dados = texto if isinstance(texto, bytes) else texto.encode('utf-8')
+
+def _resposta_esperada(nome, args):
+    """Tipo de resposta não marcada que o imaplib devolveria para o comando"""
+    nome = nome.upper()
+    if nome == 'UID':
+        subcomando = str(args[0]).upper() if args else ''
+        return subcomando if subcomando in ('SEARCH', 'SORT', 'THREAD') else 'FETCH'
+    return {'FETCH': 'FETCH', 'STORE': 'FETCH', 'SEARCH': 'SEARCH', 'EXPUNGE': 'EXPUNGE',
+            'LIST': 'LIST', 'STATUS': 'STATUS', 'CAPABILITY': 'CAPABILITY'}.get(nome)
+
+# ===============================
+# CLIENTE IMAP ASSÍNCRONO
+# ===============================
+class ClienteIMAPAssincrono:
+    """
+    Cliente IMAP sobre asyncio com a mesma interface do imaplib:
+    `await imap.uid('FETCH', '1:200', '(RFC822)')` retorna ('OK', dados).
+    Uma tarefa lê continuamente o socket e entrega cada resposta ao comando
+    dono da tag; respostas não marcadas vão para o comando mais antigo em curso.
+    """
+
+    def __init__(self, servidor, porta=PORTA_IMAPS, timeout=TIMEOUT_COMANDO_SEGUNDOS):
+        self.servidor = servidor
+        self.porta = porta
+        self.timeout = timeout
+        self.state = 'LOGOUT'
+        self.capabilities = ()
+        self._leitor = None
+        self._escritor = None
+        self._tarefa_leitura = None
+        self._pendentes = {}     # tag -> (future, {TIPO: [dados]})
+        self._ordem = deque()    # tags na ordem de envio
+        self._respostas = {}     # códigos de resposta (UIDVALIDITY, READ-WRITE...) para response()
+        self._contador = 0
+        self._erro = None
+        self._continuacao = None  # future do '+' esperado pelo IDLE
+        self._aviso = None        # Event sinalizado por EXISTS durante o IDLE
+        self.registro = None      # RegistroCaixa da conta (metadados em cache), se houver
+
+    # ---------- conexão ----------
+    async def conectar(self):
+        """Abre a conexão TLS e lê a saudação do servidor"""
+        self._leitor, self._escritor = await asyncio.wait_for(
+            asyncio.open_connection(self.servidor, self.porta, ssl=ssl.create_default_context()),
+            self.timeout
+        )
+        saudacao = await asyncio.wait_for(self._leitor.readline(), self.timeout)
+        if not saudacao.startswith((b'* OK', b'* PREAUTH')):
+            self._escritor.close()
+            raise ErroIMAP(f"Saudação inesperada do servidor: {saudacao[:100]!r}")
+
+        self.state = 'AUTH' if saudacao.startswith(b'* PREAUTH') else 'NONAUTH'
+        self._tarefa_leitura = asyncio.create_task(self._ler_respostas())
+        await self.capability()
+        return self
+
+    async def _ler_resposta(self):
+        """Lê uma resposta completa, incluindo literais ({N})"""
+        linha = await self._leitor.readline()
+        if not linha:
+            raise ErroIMAP("Conexão encerrada pelo servidor")
+        linha = linha.rstrip(b'\r\n')
+
+        itens = []
+        while True:
+            tamanho = _LITERAL.search(linha)
+            if not tamanho:
+                break
+            literal = await self._leitor.readexactly(int(tamanho.group(1)))
+            itens.append((linha, literal))
+            linha = (await self._leitor.readline()).rstrip(b'\r\n')
+        itens.append(linha)
+        return itens
+
+    async def _ler_respostas(self):
+        """Tarefa de leitura: distribui as respostas até a conexão cair"""
+        try:
+            while True:
+                itens = await self._ler_resposta()
+                primeira = itens[0][0] if isinstance(itens[0], tuple) else itens[0]
+
+                if primeira.startswith(b'* '):
+                    self._tratar_nao_marcada(primeira, itens)
+                elif primeira.startswith(b'+'):
+                    if self._continuacao is not None and not self._continuacao.done():
+                        self._continuacao.set_result(primeira)
+                else:
+                    self._concluir(primeira)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._falhar(e if isinstance(e, ErroIMAP) else ErroIMAP(str(e)))
+
+    def _tratar_nao_marcada(self, primeira, itens):
+        """Guarda `* ...` no formato do imaplib (sem o '* ' e o tipo)"""
+        resposta = _NAO_MARCADA.match(primeira)
+        if not resposta:
+            return
+
+        tipo = resposta.group('tipo').upper().decode()
+        numero, resto = resposta.group('numero'), resposta.group('resto')
+        if numero is not None:
+            dados = numero + b' ' + resto if resto is not None else numero
+        else:
+            dados = resto or b''
+
+        if tipo in ('OK', 'NO', 'BAD', 'PREAUTH', 'BYE'):
+            self._guardar_codigo(dados)
+
+        if isinstance(itens[0], tuple):
+            itens = [(dados, itens[0][1])] + itens[1:]
+        else:
+            itens = [dados]
+
+        destino = self._pendentes[self._ordem[0]][1] if self._ordem else self._respostas
+        destino.setdefault(tipo, []).extend(itens)
+
+        if tipo == 'EXISTS' and self._aviso is not None:
+            self._aviso.set()
+
+        if tipo == 'BYE':
+            self.state = 'LOGOUT'
+
+    def _guardar_codigo(self, texto):
+        """Guarda códigos como [UIDVALIDITY 123] para response()"""
+        codigo = _CODIGO_RESPOSTA.match(texto)
+        if codigo:
+            self._respostas.setdefault(codigo.group('codigo').upper().decode(), []).append(codigo.group('dados'))
+
+    def _concluir(self, linha):
+        """Resposta marcada: conclui o comando da tag"""
+        partes = linha.split(b' ', 2)
+        tag = partes[0]
+        status = partes[1].upper().decode() if len(partes) > 1 else 'BAD'
+        texto = partes[2] if len(partes) > 2 else b''
+        self._guardar_codigo(texto)
+
+        pendente = self._pendentes.pop(tag, None)
+        if pendente is None:
+            return
+        self._ordem.remove(tag)
+        futuro, dados = pendente
+        if not futuro.done():
+            futuro.set_result((status, texto, dados))
+
+    def _falhar(self, erro):
+        """Conexão perdida: falha todos os comandos em curso"""
+        self._erro = erro
+        self.state = 'LOGOUT'
+        for futuro, _ in self._pendentes.values():
+            if not futuro.done():
+                futuro.set_exception(erro)
+        self._pendentes.clear()
+        self._ordem.clear()
+
+    # ---------- envio de comandos ----------
+    def _enviar(self, nome, *args):
+        """Escreve um comando marcado no socket e retorna o future da resposta"""
+        if self._erro is not None or self._escritor is None:
+            raise ErroIMAP(f"Conexão IMAP indisponível: {self._erro}")
+
+        self._contador += 1
+        tag = f"A{self._contador:04d}".encode()
+        partes = [tag, nome.encode()]
+        for arg in args:
+            if arg is None:
+                continue
+            if isinstance(arg, Literal):
+                # LITERAL+/LITERAL- (RFC 7888): o servidor não responde '+' antes dos dados
+                partes.append(f"{{{len(arg.dados)}+}}\r\n".encode() + arg.dados)
+                continue
+            partes.append(arg if isinstance(arg, bytes) else str(arg).encode('ascii'))
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendentes[tag] = (futuro, {})
+        self._ordem.append(tag)
+        self._escritor.write(b' '.join(partes) + b'\r\n')
+        return futuro
+
+    async def _aguardar(self, futuro, nome, resposta=None):
+        """Espera a resposta marcada de um comando já enviado e devolve (status, dados)"""
+        try:
+            status, texto, dados = await asyncio.wait_for(futuro, self.timeout)
+        except asyncio.TimeoutError:
+            erro = ErroIMAP(f"Tempo esgotado aguardando {nome}")
+            self._falhar(erro)
+            self._escritor.close()
+            raise erro
+
+        if status == 'BAD':
+            raise ErroIMAP(f"{nome} rejeitado: {texto.decode(errors='ignore')}")
+        if status != 'OK' or resposta is None:
+            return status, [texto]
+        return status, dados.get(resposta, [None])
+
+    async def _comando(self, nome, *args, resposta=None):
+        """Envia o comando, espera a resposta marcada e devolve (status, dados)"""
+        futuro = self._enviar(nome, *args)
+        await self._escritor.drain()
+        return await self._aguardar(futuro, nome, resposta)
+
+    async def pipeline(self, comandos):
+        """
+        Envia vários comandos de uma vez e só depois lê as respostas, casadas
+        pela tag: um round trip para o grupo em vez de um por comando.
+        `comandos` é uma lista como [('CREATE', 'Faturas'), ('UID', 'COPY', '42', 'Faturas')].
+        Retorna, na mesma ordem, (status, dados) ou a exceção de cada comando.
+        """
+        enviados = []
+        for nome, *args in comandos:
+            enviados.append((self._enviar(nome, *args), nome, _resposta_esperada(nome, args)))
+        await self._escritor.drain()
+        return await asyncio.gather(
+            *(self._aguardar(futuro, nome, resposta) for futuro, nome, resposta in enviados),
+            return_exceptions=True
+        )
+
+    # ---------- comandos (mesma assinatura do imaplib) ----------
+    async def capability(self):
+        status, dados = await self._comando('CAPABILITY', resposta='CAPABILITY')
+        capacidades = ler_capacidades(status, dados)
+        if capacidades:
+            self.capabilities = tuple(sorted(capacidades))
+        return status, dados
+
+    async def login(self, usuario, senha, capacidades=None):
+        """LOGIN; `capacidades` (já conhecidas da conta) dispensa o CAPABILITY seguinte"""
+        status, dados = await self._comando('LOGIN', _citar(usuario), _citar(senha))
+        if status != 'OK':
+            raise ErroIMAP(dados[0].decode(errors='ignore') if dados and dados[0] else "LOGIN falhou")
+        self.state = 'AUTH'
+        if capacidades:
+            self.capabilities = tuple(sorted(capacidades))
+        else:
+            await self.capability()  # O Gmail anuncia mais extensões após o login
+        return status, dados
+
+    async def select(self, pasta='INBOX', readonly=False):
+        self._respostas = {}
+        status, dados = await self._comando('EXAMINE' if readonly else 'SELECT', pasta, resposta='EXISTS')
+        if status == 'OK':
+            self.state = 'SELECTED'
+        return status, dados
+
+    async def unselect(self):
+        status, dados = await self._comando('UNSELECT')
+        self.state = 'AUTH'
+        return status, dados
+
+    async def search(self, charset, *criterios):
+        return await self._comando('SEARCH', *(['CHARSET', charset] if charset else []), *criterios, resposta='SEARCH')
+
+    async def fetch(self, conjunto, itens):
+        return await self._comando('FETCH', conjunto, itens, resposta='FETCH')
+
+    async def store(self, conjunto, comando, flags):
+        return await self._comando('STORE', conjunto, comando, flags, resposta='FETCH')
+
+    async def copy(self, conjunto, pasta):
+        return await self._comando('COPY', conjunto, pasta)
+
+    async def expunge(self):
+        return await self._comando('EXPUNGE', resposta='EXPUNGE')
+
+    async def uid(self, comando, *args):
+        comando = comando.upper()
+        resposta = comando if comando in ('SEARCH', 'SORT', 'THREAD') else 'FETCH'
+        return await self._comando('UID', comando, *args, resposta=resposta)
+
+    async def create(self, pasta):
+        return await self._comando('CREATE', pasta)
+
+    async def list(self, diretorio='""', padrao='*'):
+        return await self._comando('LIST', diretorio, padrao, resposta='LIST')
+
+    async def status(self, pasta, nomes):
+        return await self._comando('STATUS', pasta, nomes, resposta='STATUS')
+
+    async def noop(self):
+        return await self._comando('NOOP')
+
+    async def idle(self, duracao=TEMPO_IDLE_SEGUNDOS, parar=None, fatia=5):
+        """
+        IDLE (RFC 2177) na pasta selecionada: espera o servidor anunciar novas
+        mensagens (EXISTS) por até `duracao` segundos, ou até `parar.is_set()`
+        (verificado a cada `fatia` segundos). Encerra com DONE e retorna
+        (status, [EXISTS recebidos]); ('OK', [None]) se nada chegou.
+        """
+        loop = asyncio.get_running_loop()
+        self._continuacao = loop.create_future()
+        self._aviso = asyncio.Event()
+        futuro = self._enviar('IDLE')
+        try:
+            await self._escritor.drain()
+            await asyncio.wait([self._continuacao, futuro], timeout=self.timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if not futuro.done():
+                if not self._continuacao.done():
+                    erro = ErroIMAP("Tempo esgotado aguardando IDLE")
+                    self._falhar(erro)
+                    self._escritor.close()
+                    raise erro
+
+                limite = loop.time() + duracao
+                while not self._aviso.is_set() and not (parar and parar.is_set()):
+                    restante = limite - loop.time()
+                    if restante <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(self._aviso.wait(), min(fatia, restante) if parar else restante)
+                    except asyncio.TimeoutError:
+                        pass
+
+                self._escritor.write(b'DONE\r\n')
+                await self._escritor.drain()
+        finally:
+            self._continuacao = None
+            self._aviso = None
+
+        return await self._aguardar(futuro, 'IDLE', resposta='EXISTS')
+
+    def response(self, codigo):
+        """Retorna (codigo, dados) do último código de resposta recebido"""
+        return codigo, self._respostas.pop(codigo.upper(), [None])
+
+    async def logout(self):
+        """Encerra a sessão e fecha o socket (não falha se já caiu)"""
+        try:
+            if self._erro is None and self._escritor is not None:
+                await self._comando('LOGOUT')
+        except Exception:
+            pass
+        finally:
+            self.state = 'LOGOUT'
+            if self._tarefa_leitura is not None:
+                self._tarefa_leitura.cancel()
+            if self._escritor is not None:
+                self._escritor.close()
+        return 'BYE', [b'']
+
+async def conectar(servidor, usuario, senha, porta=PORTA_IMAPS, timeout=TIMEOUT_COMANDO_SEGUNDOS):
+    """Abre e autentica uma sessão IMAP assíncrona"""
+    imap = ClienteIMAPAssincrono(servidor, porta=porta, timeout=timeout)
+    await imap.conectar()
+    try:
+        await imap.login(usuario, senha)
+    except Exception:
+        await imap.logout()
+        raise
+    return imap
+
+async def aguardar_chegada(servidor, usuario, senha, parar=None, pasta="INBOX"):
+    """
+    Abre uma sessão própria e espera em IDLE (renovado a cada 25 minutos)
+    até chegar uma mensagem na pasta ou `parar` ser sinalizado.
+    Retorna True se chegou mensagem, False se parou, ou None se o servidor não tem IDLE.
+    """
+    imap = await conectar(servidor, usuario, senha)
+    try:
+        if 'IDLE' not in imap.capabilities:
+            return None
+        await imap.select(nome_pasta_imap(pasta), readonly=True)
+        while not (parar and parar.is_set()):
+            status, avisos = await imap.idle(parar=parar)
+            if status != "OK":
+                raise ErroIMAP(f"IDLE recusado: {avisos[0]!r}")
+            if avisos != [None]:
+                return True
+        return False
+    finally:
+        await imap.logout()
+
+# ===============================
+# METADADOS DA CAIXA POSTAL
+# ===============================
+class RegistroCaixa:
+    """
+    Metadados da caixa postal de uma conexão: capacidades, delimitador de
+    hierarquia e pastas existentes. Valem por `ttl` segundos e são gravados
+    por conta no organizer.db, de modo que novas conexões não refazem o LIST.
+    """
+
+    def __init__(self, conta, ttl=TTL_METADADOS_SEGUNDOS):
+        self.conta = conta
+        self.ttl = ttl
+        self.capabilities = set()
+        self.delimitador = None
+        self.pastas = None  # None = desconhecidas
+        self._carregado_em = 0
+
+    def vigente(self):
+        return self.pastas is not None and time.monotonic() - self._carregado_em <= self.ttl
+
+    async def carregar(self, imap):
+        """Garante metadados válidos: da memória, do organizer.db ou, por último, do servidor (LIST)"""
+        if self.vigente():
+            return self
+
+        salvo = await em_executor(obter_metadados_caixa, self.conta, self.ttl)
+        if salvo:
+            self.capabilities = salvo['capabilities']
+            self.delimitador = salvo['delimitador']
+            self.pastas = salvo['pastas']
+            self._carregado_em = time.monotonic() - salvo['idade']
+            return self
+
+        status, dados = await imap.list()
+        if status != "OK":
+            return self  # Continua desconhecido: quem usa cai no comportamento sem cache
+
+        self.delimitador, self.pastas = ler_lista_pastas(status, dados)
+        self.capabilities = {str(c).upper() for c in imap.capabilities}
+        self._carregado_em = time.monotonic()
+        await self._salvar()
+        return self
+
+    async def _salvar(self):
+        # Cópias: o loop pode anotar pastas enquanto a gravação roda no executor
+        await em_executor(salvar_metadados_caixa, self.conta, set(self.capabilities), self.delimitador, set(self.pastas))
+
+    async def registrar_pasta(self, pasta):
+        """Anota uma pasta criada (ou confirmada) por esta conexão"""
+        if self.pastas is not None and pasta not in self.pastas:
+            self.pastas.add(pasta)
+            await self._salvar()
+
+    async def invalidar(self):
+        """Descarta os metadados (ex.: uma pasta anotada sumiu do servidor)"""
+        self.pastas = None
+        self._carregado_em = 0
+        await em_executor(remover_metadados_caixa, self.conta)
+
+async def pastas_existentes(imap):
+    """Conjunto de pastas da conta (LIST só quando os metadados venceram); None se o LIST falhar"""
+    registro = getattr(imap, 'registro', None)
+    if registro is not None:
+        await registro.carregar(imap)
+        if registro.pastas is not None:
+            return registro.pastas
+
+    status, dados = await imap.list()
+    if status != "OK":
+        return None
+    return ler_lista_pastas(status, dados)[1]
+
+async def comandos_para_criar(imap, pasta):
+    """[('CREATE', nome_pasta_imap(pasta))] se a pasta não consta como existente; [] se já existe"""
+    registro = getattr(imap, 'registro', None)
+    if registro is None:
+        return [('CREATE', nome_pasta_imap(pasta))]
+    await registro.carregar(imap)
+    if registro.pastas is not None and pasta in registro.pastas:
+        return []
+    return [('CREATE', nome_pasta_imap(pasta))]
+
+async def registrar_pasta(imap, pasta, existe=True):
+    """Atualiza os metadados da conexão após usar a pasta (ou descobrir que ela sumiu)"""
+    registro = getattr(imap, 'registro', None)
+    if registro is None:
+        return
+    if existe:
+        await registro.registrar_pasta(pasta)
+    else:
+        await registro.invalidar()
+
+# ===============================
+# EVENT LOOP COMPARTILHADO
+# ===============================
+class LoopIMAP:
+    """Event loop em uma thread de fundo, onde rodam todos os jobs IMAP"""
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+            return self._loop
+
+    def submeter(self, corrotina):
+        """Agenda a corrotina no loop e retorna um concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(corrotina, self._loop or self._iniciar())
+
+    def repetir(self, funcao, intervalo):
+        """
+        Executa `await funcao()` a cada `intervalo` segundos no loop (erros são
+        registrados e a repetição continua). Retorna o Future: cancelá-lo para.
+        """
+        async def repeticao():
+            while True:
+                await asyncio.sleep(intervalo)
+                try:
+                    await funcao()
+                except Exception as e:
+                    print(f"Erro na tarefa periódica {getattr(funcao, '__qualname__', funcao)}: {e}")
+
+        return self.submeter(repeticao())
+
+_loop_do_processo = LoopIMAP()
+
+def loop_do_processo():
+    """LoopIMAP único do processo (no Streamlit, sobrevive às reexecuções do script)"""
+    return _loop_do_processo
+
+async def em_executor(funcao, *args, **kwargs):
+    """Roda uma chamada bloqueante (SQLite, Socket.IO) no executor padrão, sem parar o loop IMAP"""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(funcao, *args, **kwargs))
+
+# ===============================
+# FETCH EM LOTES
+# ===============================
+async def _buscar_lote(imap, lote, itens, usar_uid=False):
+    """Executa um FETCH para o lote e retorna {id_int: {ITEM: valor}}"""
+    conjunto = compactar_conjunto(lote)
+    if usar_uid:
+        status, data = await imap.uid('FETCH', conjunto, itens)
+    else:
+        status, data = await imap.fetch(conjunto, itens)
+    return indexar_lote(status, data, usar_uid)
+
+async def fetch_em_lotes(imap, ids, itens, tamanho_lote=TAMANHO_LOTE_FETCH, usar_uid=False, conexoes_extras=None):
+    """
+    Busca mensagens em lotes usando conjuntos compactos (ex.: 1001:1200).
+    Gera (id, {ITEM: valor}) na mesma ordem de `ids`; mensagens ausentes
+    da resposta (ou de um lote com erro) são geradas como (id, None).
+    Com `conexoes_extras` (já com a mesma pasta selecionada), os lotes são
+    distribuídos entre elas e a conexão principal em paralelo.
+    """
+    lotes = list(dividir_em_lotes(list(ids), tamanho_lote))
+
+    if conexoes_extras and len(lotes) > 1:
+        async for resultado in _fetch_paralelo(imap, conexoes_extras, lotes, itens, usar_uid):
+            yield resultado
+        return
+
+    for lote in lotes:
+        try:
+            recebidos = await _buscar_lote(imap, lote, itens, usar_uid)
+        except Exception as e:
+            print(f"Erro ao buscar lote {compactar_conjunto(lote)}: {e}")
+            recebidos = {}
+
+        for id_msg in lote:
+            yield id_msg, recebidos.get(int(id_msg))
+
+async def _fetch_paralelo(imap, conexoes_extras, lotes, itens, usar_uid):
+    """
+    Uma tarefa por conexão (a principal inclusive) consome a fila de lotes;
+    os resultados são gerados na ordem original. Lotes de uma conexão extra
+    que falhou voltam para a fila.
+    """
+    fila = deque(range(len(lotes)))
+    resultados = {}
+    prontos = {i: asyncio.Event() for i in range(len(lotes))}
+
+    async def trabalhar(conexao, principal):
+        while fila:
+            i = fila.popleft()
+            try:
+                recebidos = await _buscar_lote(conexao, lotes[i], itens, usar_uid)
+            except Exception as e:
+                if not principal:
+                    print(f"Conexão paralela falhou no lote {compactar_conjunto(lotes[i])}: {e}")
+                    fila.appendleft(i)
+                    return
+                print(f"Erro ao buscar lote {compactar_conjunto(lotes[i])}: {e}")
+                recebidos = {}
+            resultados[i] = recebidos
+            prontos[i].set()
+
+    # Se todas as extras caírem, a principal termina a fila sozinha
+    tarefas = [asyncio.create_task(trabalhar(imap, True))]
+    tarefas += [asyncio.create_task(trabalhar(c, False)) for c in conexoes_extras]
+
+    try:
+        for proximo in range(len(lotes)):
+            await prontos[proximo].wait()
+            recebidos = resultados.pop(proximo)
+            for id_msg in lotes[proximo]:
+                yield id_msg, recebidos.get(int(id_msg))
+    finally:
+        # Garante que nenhuma conexão siga em uso após o retorno
+        fila.clear()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+
+# ===============================
+# LISTAGEM EM DUAS ETAPAS (CABEÇALHOS → CORPO)
+# ===============================
+async def listar_em_duas_etapas(imap, ids, decidir, limite_corpo=LIMITE_CORPO_BYTES,
+                                log_callback=None, progress_callback=None, usar_uid=False, conexoes_extras=None):
+    """
+    Lista e-mails baixando primeiro só Subject/From/List-Id.
+    `decidir(registro)` recebe {'assunto', 'remetente', 'list_id'} e retorna
+    a categoria ou None; apenas as mensagens sem categoria têm um prefixo
+    do corpo (limitado a `limite_corpo`) baixado.
+    """
+    total = len(ids)
+    emails = {}
+    pendentes = []
+
+    # Etapa 1: apenas cabeçalhos
+    idx = 0
+    async for num, itens in fetch_em_lotes(imap, ids, ITENS_CABECALHOS, usar_uid=usar_uid, conexoes_extras=conexoes_extras):
+        idx += 1
+        if progress_callback:
+            progress_callback((idx / total) * 0.5, f"Carregando cabeçalhos: {idx}/{total} ({int(idx / total * 100)}%)")
+
+        registro = registro_por_cabecalhos(num, itens, decidir)
+        if registro is None:
+            continue
+
+        emails[num] = registro
+        if not registro["categoria"]:
+            pendentes.append(num)
+
+    if log_callback:
+        log_callback(f"🏷️ {len(emails) - len(pendentes)} e-mails classificados só pelos cabeçalhos")
+        if pendentes:
+            log_callback(f"📥 Baixando corpo de {len(pendentes)} e-mails restantes (até {limite_corpo // 1024} KB cada)...")
+
+    # Etapa 2: só a parte de texto (via BODYSTRUCTURE) dos indecisos
+    if pendentes:
+        corpos = await buscar_corpos_por_estrutura(
+            imap,
+            pendentes,
+            limite_corpo=limite_corpo,
+            progress_callback=(lambda p, t: progress_callback(0.5 + p * 0.5, t)) if progress_callback else None,
+            usar_uid=usar_uid,
+            conexoes_extras=conexoes_extras
+        )
+        for num, corpo in corpos.items():
+            emails[num]["corpo"] = corpo
+
+    return [emails[num] for num in ids if num in emails]
+
+async def listar_em_fluxo(imap, ids, decidir, limite_corpo=LIMITE_CORPO_BYTES,
+                          progress_callback=None, usar_uid=False, conexoes_extras=None, tamanho_bloco=None):
+    """
+    Gera os e-mails de `ids` bloco a bloco (cabeçalhos e depois corpos de
+    cada bloco), mantendo na memória só o bloco atual. O bloco padrão
+    tem um lote por conexão, para aproveitar o FETCH em paralelo.
+    """
+    tamanho_bloco = tamanho_bloco or TAMANHO_LOTE_FETCH * (len(conexoes_extras or []) + 1)
+    total = len(ids)
+    feitos = 0
+
+    for bloco in dividir_em_lotes(list(ids), tamanho_bloco):
+        def progresso_bloco(p, texto, base=feitos, tamanho=len(bloco)):
+            atual = int(base + p * tamanho)
+            progress_callback((base + p * tamanho) / total, f"Carregando e-mails: {atual}/{total} ({int(atual / total * 100)}%)")
+
+        registros = await listar_em_duas_etapas(
+            imap,
+            bloco,
+            decidir,
+            limite_corpo=limite_corpo,
+            progress_callback=progresso_bloco if progress_callback else None,
+            usar_uid=usar_uid,
+            conexoes_extras=conexoes_extras
+        )
+        feitos += len(bloco)
+        for registro in registros:
+            yield registro
+
+async def buscar_corpos_por_estrutura(imap, ids, limite_corpo=LIMITE_CORPO_BYTES, progress_callback=None, usar_uid=False,
+                                      conexoes_extras=None):
+    """
+    Lê o BODYSTRUCTURE de cada mensagem e baixa apenas a parte de texto
+    escolhida com BODY.PEEK[n]<0.N>, sem trazer anexos. Retorna {id: corpo}.
+    """
+    total = len(ids)
+    partes = {}
+    sem_estrutura = []
+
+    idx = 0
+    async for num, itens in fetch_em_lotes(imap, ids, "(BODYSTRUCTURE)", usar_uid=usar_uid, conexoes_extras=conexoes_extras):
+        idx += 1
+        if progress_callback:
+            progress_callback((idx / total) * 0.2, f"Analisando estrutura: {idx}/{total}")
+
+        estrutura = itens.get('BODYSTRUCTURE') if itens else None
+        if estrutura is None:
+            sem_estrutura.append(num)
+            continue
+
+        parte = localizar_parte_texto(estrutura)
+        if parte:
+            partes[num] = parte
+
+    corpos = {}
+    baixados = 0
+    for (secao, subtipo), nums in agrupar_por_secao(partes).items():
+        itens_parte = itens_da_parte(secao, subtipo, limite_corpo)
+        async for num, itens in fetch_em_lotes(imap, nums, itens_parte, usar_uid=usar_uid, conexoes_extras=conexoes_extras):
+            baixados += 1
+            if progress_callback:
+                progress_callback(0.2 + (baixados / total) * 0.8, f"Carregando corpos: {baixados}/{total}")
+
+            corpo = corpo_da_parte(itens, partes[num])
+            if corpo is not None:
+                corpos[num] = corpo
+
+    # Servidor sem BODYSTRUCTURE utilizável: prefixo da mensagem inteira
+    itens_corpo = f"(BODY.PEEK[]<0.{limite_corpo}>)"
+    async for num, itens in fetch_em_lotes(imap, sem_estrutura, itens_corpo, usar_uid=usar_uid):
+        corpo = corpo_do_prefixo(itens)
+        if corpo is not None:
+            corpos[num] = corpo
+
+    return corpos
+
+# ===============================
+# PRÉ-CLASSIFICAÇÃO NO SERVIDOR (GMAIL X-GM-RAW)
+# ===============================
+def consulta_gmail(palavras, extras=()):
+    """Monta a busca do Gmail que casa qualquer das palavras (ex.: boleto OR "nota fiscal")"""
+    termos = [f'"{p}"' if ' ' in p else p for p in palavras]
+    return " OR ".join(termos + list(extras))
+
+def sem_acentos(texto):
+    """Remove acentos (ex.: reunião → reuniao)"""
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+
+async def pre_classificar_no_servidor(imap, uids, consultas):
+    """
+    Atribui categorias sem baixar as mensagens, pelo índice de busca do Gmail
+    (UID SEARCH X-GM-RAW) na pasta selecionada. `consultas` é [(categoria, busca)]
+    em ordem de prioridade: cada UID fica com a primeira busca que o encontra.
+    Retorna {uid_int: categoria} (vazio se o servidor não for Gmail).
+    """
+    if 'X-GM-EXT-1' not in imap.capabilities:
+        return {}
+
+    literais = bool({'LITERAL+', 'LITERAL-'} & set(imap.capabilities))
+    restantes = {int(u) for u in uids}
+    atribuidos = {}
+
+    for categoria, consulta in consultas:
+        if not restantes:
+            break
+
+        # A faixa mínima:máxima mantém o comando curto; a interseção vem depois
+        faixa = f"{min(restantes)}:{max(restantes)}"
+        if consulta.isascii():
+            criterios = ('UID', faixa, 'X-GM-RAW', _citar(consulta))
+        elif literais:
+            criterios = ('CHARSET', 'UTF-8', 'UID', faixa, 'X-GM-RAW', Literal(consulta))
+        else:
+            criterios = ('UID', faixa, 'X-GM-RAW', _citar(sem_acentos(consulta)))
+
+        try:
+            status, dados = await imap.uid('SEARCH', *criterios)
+        except ErroIMAP as e:
+            print(f"Erro na busca X-GM-RAW de {categoria}: {e}")
+            continue
+        if status != "OK":
+            continue
+
+        encontrados = {int(u) for u in uids_da_busca(dados)} & restantes
+        for uid in encontrados:
+            atribuidos[uid] = categoria
+        restantes -= encontrados
+
+    return atribuidos
+
+# ===============================
+# SINCRONIZAÇÃO INCREMENTAL POR UID
+# ===============================
+async def obter_uidvalidity(imap, pasta="INBOX"):
+    """Lê o UIDVALIDITY da pasta recém-selecionada (ou via STATUS)"""
+    _, dados = imap.response('UIDVALIDITY')
+    if dados and dados[0]:
+        return int(dados[0])
+    return ler_estado_status(*await imap.status(nome_pasta_imap(pasta), '(UIDVALIDITY)'))[0]
+
+async def selecionar_uids_pendentes(imap, conta=None, pasta="INBOX"):
+    """
+    Seleciona a pasta e retorna (uids, incremental).
+    Com checkpoint válido busca apenas `UID n+1:*`; sem checkpoint (ou se o
+    UIDVALIDITY mudou) busca todos os UIDs e reinicia o checkpoint da conta.
+    """
+    await imap.select(nome_pasta_imap(pasta))
+
+    checkpoint = await em_executor(checkpoint_em_vigor, conta, pasta, await obter_uidvalidity(imap, pasta)) if conta else None
+
+    if checkpoint and checkpoint['ultimo_uid']:
+        ultimo = checkpoint['ultimo_uid']
+        status, dados = await imap.uid('SEARCH', None, f'UID {ultimo + 1}:*')
+        if status != "OK":
+            return None, True
+        return uids_da_busca(dados, ultimo), True
+
+    status, dados = await imap.uid('SEARCH', None, 'ALL')
+    if status != "OK":
+        return None, False
+    return uids_da_busca(dados), False
+
+# ===============================
+# DETECÇÃO DE MUDANÇAS POR PASTA (CONDSTORE)
+# ===============================
+async def obter_capacidades(imap):
+    """Executa CAPABILITY (após o login) e retorna o conjunto de extensões"""
+    try:
+        capacidades = ler_capacidades(*await imap.capability())
+        if capacidades:
+            return capacidades
+    except Exception as e:
+        print(f"Erro ao obter capacidades: {e}")
+    return {str(c).upper() for c in imap.capabilities}
+
+async def suporta_condstore(imap):
+    """
+    Verifica se o servidor anuncia CONDSTORE. Não é preciso ENABLE: o
+    STATUS com HIGHESTMODSEQ e o FETCH com CHANGEDSINCE já ativam a extensão.
+    """
+    return 'CONDSTORE' in await obter_capacidades(imap)
+
+async def message_ids_da_pasta(imap, pasta, conta=None, condstore=False):
+    """
+    Retorna (conjunto de Message-IDs da pasta, origem).
+    Com CONDSTORE e `conta`, pastas cujo HIGHESTMODSEQ não mudou vêm do
+    cache ("cache") sem SELECT; pastas alteradas buscam só o delta com
+    CHANGEDSINCE ("delta"); o resto faz a varredura completa ("completa").
+    Retorna (None, None) se a pasta não puder ser lida.
+    """
+    uidvalidity = modseq = None
+    salvo = None
+    if condstore and conta:
+        uidvalidity, modseq = ler_estado_status(*await imap.status(nome_pasta_imap(pasta), '(UIDVALIDITY HIGHESTMODSEQ)'))
+        salvo = await em_executor(obter_modseq_salvo, conta, pasta)
+        if pasta_inalterada(salvo, uidvalidity, modseq):
+            return set((await em_executor(obter_message_ids_salvos, conta, pasta)).values()), "cache"
+
+    status, _ = await imap.select(nome_pasta_imap(pasta), readonly=True)
+    if status != "OK":
+        return None, None
+
+    status, dados = await imap.uid('SEARCH', None, 'ALL')
+    if status != "OK":
+        return None, None
+    uids_atuais = {int(u) for u in dados[0].split()} if dados[0] else set()
+
+    origem = "completa"
+    mapa = {}
+    if salvo and modseq is not None and salvo['uidvalidity'] == uidvalidity:
+        # Delta: mensagens novas ou alteradas desde o último modseq
+        salvos = await em_executor(obter_message_ids_salvos, conta, pasta)
+        mapa = {uid: mid for uid, mid in salvos.items() if uid in uids_atuais}
+        status, dados = await imap.uid('FETCH', '1:*', f"{ITENS_MESSAGE_ID} (CHANGEDSINCE {salvo['highestmodseq']})")
+        if status == "OK":
+            for _, itens in ler_resposta_fetch(dados):
+                if 'UID' in itens:
+                    mapa[int(itens['UID'])] = extrair_message_id(itens)
+            faltando = sorted(uids_atuais - set(mapa))
+            async for uid, itens in fetch_em_lotes(imap, faltando, ITENS_MESSAGE_ID, usar_uid=True):
+                mapa[uid] = extrair_message_id(itens)
+            origem = "delta"
+        else:
+            mapa = {}
+
+    if origem == "completa":
+        async for uid, itens in fetch_em_lotes(imap, sorted(uids_atuais), ITENS_MESSAGE_ID, usar_uid=True):
+            mapa[uid] = extrair_message_id(itens)
+
+    if condstore and conta and modseq is not None:
+        await em_executor(salvar_estado_pasta, conta, pasta, uidvalidity, modseq, mapa)
+
+    return {mid for mid in mapa.values() if mid}, origem
+
+# ===============================
+# DUPLICATAS NO GMAIL (X-GM-MSGID)
+# ===============================
+async def gm_msgids_da_pasta(imap, pasta, readonly=True):
+    """
+    Seleciona a pasta e retorna {uid: X-GM-MSGID} de todas as mensagens com
+    um único UID FETCH; None se a pasta não puder ser lida.
+    """
+    status, existentes = await imap.select(nome_pasta_imap(pasta), readonly=readonly)
+    if status != "OK":
+        return None
+    if existentes and existentes[-1] in (b'0', '0'):
+        return {}
+
+    status, dados = await imap.uid('FETCH', '1:*', ITENS_GM_MSGID)
+    if status != "OK":
+        return None
+    return ler_gm_msgids(dados)
+
+async def duplicatas_por_gm_msgid(imap, pastas, progress_callback=None):
+    """
+    No Gmail, a mesma mensagem tem o mesmo X-GM-MSGID em todas as pastas
+    (marcadores). Intersecta os X-GM-MSGID da INBOX com os de cada pasta e
+    retorna (uids_da_inbox_duplicados, pastas_com_erro), com a INBOX selecionada
+    para escrita ao final.
+    """
+    inbox = await gm_msgids_da_pasta(imap, "INBOX")
+    if inbox is None:
+        raise ErroIMAP("Não foi possível ler os X-GM-MSGID da INBOX")
+    ids_inbox = set(inbox.values())
+
+    duplicados = set()
+    pastas_com_erro = 0
+    for idx, pasta in enumerate(pastas, 1):
+        if not ids_inbox:
+            break
+        try:
+            mapa = await gm_msgids_da_pasta(imap, pasta)
+        except ErroIMAP:
+            mapa = None
+        if mapa is None:
+            pastas_com_erro += 1
+        else:
+            duplicados.update(ids_inbox.intersection(mapa.values()))
+
+        if progress_callback:
+            progress_callback(idx / len(pastas), f"Verificando: {idx}/{len(pastas)}")
+
+    await imap.select("INBOX")
+    return sorted(uid for uid, msgid in inbox.items() if msgid in duplicados), pastas_com_erro
+
+# ===============================
+# MENSAGENS NOVAS DAS PASTAS (APRENDIZADO DE CATEGORIAS)
+# ===============================
+ITENS_REMETENTE = "(BODY.PEEK[HEADER.FIELDS (FROM)])"
+
+async def uids_novos_da_pasta(imap, conta, pasta, checkpoint=None):
+    """
+    Seleciona a pasta (somente leitura) e retorna os UIDs acima do checkpoint
+    da conta, ou None se a pasta não puder ser lida. `checkpoint` é o nome
+    sob o qual o checkpoint é salvo (padrão: o nome da pasta).
+    """
+    checkpoint = checkpoint or pasta
+    status, _ = await imap.select(nome_pasta_imap(pasta), readonly=True)
+    if status != "OK":
+        return None
+
+    salvo = await em_executor(checkpoint_em_vigor, conta, checkpoint, await obter_uidvalidity(imap, pasta))
+    ultimo = salvo['ultimo_uid'] if salvo else 0
+    status, dados = await imap.uid('SEARCH', None, f'UID {ultimo + 1}:*')
+    if status != "OK":
+        return None
+    return uids_da_busca(dados, ultimo)
+
+async def remetentes_novos_da_pasta(imap, conta, pasta, limite=None):
+    """
+    Retorna o From das mensagens que chegaram à pasta desde a última leitura
+    (checkpoint da conta/pasta), no máximo as `limite` mais recentes, e
+    avança o checkpoint. None se a pasta não puder ser lida.
+    """
+    uids = await uids_novos_da_pasta(imap, conta, pasta)
+    if not uids:
+        return uids
+
+    remetentes = []
+    async for _, itens in fetch_em_lotes(imap, uids[-limite:] if limite else uids, ITENS_REMETENTE, usar_uid=True):
+        cabecalhos = obter_item(itens, 'BODY[') if itens else None
+        if isinstance(cabecalhos, bytes):
+            remetentes.append(decodificar_cabecalho(ler_cabecalhos(cabecalhos)["From"]))
+
+    await em_executor(avancar_checkpoint, conta, pasta, int(uids[-1]))
+    return remetentes
+
+async def obter_uidnext(imap, pasta):
+    """(UIDVALIDITY, UIDNEXT) da pasta via STATUS, sem trocar a pasta selecionada; (None, None) se falhar"""
+    status, dados = await imap.status(nome_pasta_imap(pasta), '(UIDVALIDITY UIDNEXT)')
+    uidvalidity, _ = ler_estado_status(status, dados)
+    uidnext = re.search(rb'UIDNEXT (\d+)', dados[0]) if status == "OK" and dados and dados[0] else None
+    if uidvalidity is None or uidnext is None:
+        return None, None
+    return uidvalidity, int(uidnext.group(1))
+
+async def pular_mensagens_da_pasta(imap, conta, pasta, checkpoints=None):
+    """
+    Leva o checkpoint da pasta (ou os nomes em `checkpoints`) até a última
+    mensagem atual (STATUS UIDNEXT), sem trocar a pasta selecionada: o que o
+    próprio app acabou de mover para lá não é lido de novo como observação.
+    """
+    uidvalidity, uidnext = await obter_uidnext(imap, pasta)
+    if uidvalidity is None:
+        return False
+    return all([await em_executor(salvar_checkpoint, conta, checkpoint, uidvalidity, uidnext - 1)
+                for checkpoint in checkpoints or (pasta,)])
+
+async def iniciar_checkpoint_sem_historico(imap, conta, pasta="INBOX"):
+    """
+    Sem checkpoint válido (ausente, zerado ou de outro UIDVALIDITY), começa
+    do UIDNEXT atual: só o que chegar depois é processado, sem uma primeira
+    passada pela pasta inteira. Retorna True se o checkpoint foi criado.
+    """
+    uidvalidity, uidnext = await obter_uidnext(imap, pasta)
+    if uidvalidity is None:
+        return False
+    salvo = await em_executor(obter_checkpoint, conta, pasta)
+    if salvo and salvo['ultimo_uid'] and salvo['uidvalidity'] == uidvalidity:
+        return False
+    return await em_executor(salvar_checkpoint, conta, pasta, uidvalidity, uidnext - 1)
+
+async def exemplos_novos_da_pasta(imap, conta, pasta, checkpoint, limite=None, limite_corpo=LIMITE_CORPO_BYTES):
+    """
+    Retorna [{'assunto', 'corpo', ...}] das mensagens que chegaram à pasta
+    desde o checkpoint `checkpoint` (no máximo as `limite` mais recentes),
+    com corpo limitado como na organização, e avança o checkpoint.
+    None se a pasta não puder ser lida.
+    """
+    uids = await uids_novos_da_pasta(imap, conta, pasta, checkpoint)
+    if not uids:
+        return uids
+
+    exemplos = await listar_em_duas_etapas(
+        imap, uids[-limite:] if limite else uids, lambda registro: None, limite_corpo=limite_corpo, usar_uid=True
+    )
+    await em_executor(avancar_checkpoint, conta, checkpoint, int(uids[-1]))
+    return exemplos
@@ -1,90 +1,204 @@
-import imaplib
-import email
-from email.header import decode_header
+# Primeiro import: marca o início da carga (tempo até o app ficar pronto)
+from aquecimento import aquecer_textblob, carregar_textblob, estado_aquecimento, iniciar_aquecimento, marcar_pronto
+import queue
 import re
-from textblob import TextBlob
 import streamlit as st
 import time
 import datetime
 import threading
 import traceback
+from pool_imap import pool_compartilhado
+from motor_imap_async import (
+    conectar, aguardar_chegada, fetch_em_lotes, listar_em_duas_etapas, selecionar_uids_pendentes,
+    suporta_condstore, message_ids_da_pasta, duplicatas_por_gm_msgid, RegistroCaixa, pastas_existentes,
+    comandos_para_criar, registrar_pasta, loop_do_processo
+)
+from parser_email import ler_mensagem
+from classificador import CATEGORIAS_PALAVRAS, classificar_por_cabecalhos, classificar_por_palavras
+from sentimento import LEXICO, NEGACOES, LIMITE_NEGATIVO, LIMITE_POSITIVO, categorias_por_sentimento
+from cache_classificacao import CacheClassificacao, init_tabela_cache, versao_regras
+from motor_imap import (
+    ITENS_MESSAGE_ID, MAX_TENTATIVAS_UID, avancar_checkpoint, compactar_conjunto, extrair_message_id,
+    init_tabelas_motor, limite_do_checkpoint, limpar_falhas_uid, nome_pasta_imap, registrar_falhas_uid
+)
 
 # ===============================
 # CONFIGURAÇÕES
 # ===============================
 SERVIDOR_IMAP = "imap.gmail.com"
 LIMITE_EMAILS = 2000
+MODO_LISTAGEM = "cabecalhos"  # "cabecalhos" (cabeçalhos primeiro, corpo sob demanda) ou "completo" (RFC822)
+CONEXOES_PARALELAS = 4  # Conexões usadas na listagem da INBOX (1 = sem paralelismo)
+MOTOR_SENTIMENTO = "lexico"  # "lexico" (léxico PT/EN com NumPy, em lote) ou "textblob" (um e-mail por vez)
+USAR_CACHE_CLASSIFICACAO = True  # Reaproveita a categoria de e-mails com o mesmo conteúdo (memória + SQLite)
+AQUECER_NA_INICIALIZACAO = True  # Após a carga, importa em segundo plano o que a primeira organização usaria
 INTERVALO_SEGUNDOS = 3 * 60 * 60  # 3 horas
 
+# Garante as tabelas do motor IMAP (checkpoints de sincronização) no organizer.db
+init_tabelas_motor()
+init_tabela_cache()
+
 # ===============================
 # FUNÇÕES AUXILIARES
 # ===============================
 def limpar_texto(texto):
     return re.sub(r"[^a-zA-Z0-9áéíóúãõâêôçÁÉÍÓÚÃÕÂÊÔÇ ]", "", texto)
 
-def classificar_email(assunto, corpo):
-    texto = f"{assunto} {corpo}".lower()
-    categorias = {
-        "Faturas": ["boleto", "pagamento", "vencimento", "conta", "nota fiscal", "pix"],
-        "Trabalho": ["projeto", "relatório", "reunião", "anexo", "cliente", "documento"],
-        "Pessoal": ["amizade", "convite", "parabéns", "evento", "família"],
-        "Marketing": ["promoção", "desconto", "oferta", "newsletter", "cupom"],
-        "Sistema": ["erro", "bug", "alerta", "sistema", "login"],
-    }
-    for categoria, palavras in categorias.items():
-        if any(p in texto for p in palavras):
-            return categoria
+def sentimento_textblob(texto):
+    TextBlob = carregar_textblob()  # Importado no primeiro uso
     blob = TextBlob(texto)
     sentimento = blob.sentiment.polarity
-    if sentimento < -0.1:
+    if sentimento < LIMITE_NEGATIVO:
         return "Problemas"
-    elif sentimento > 0.3:
+    elif sentimento > LIMITE_POSITIVO:
         return "Positivos"
     return "Neutros"
 
-def conectar_email(email_usuario, senha, log_callback=None):
+def classificar_conteudo(emails):
+    """Palavras-chave primeiro; os e-mails restantes passam juntos pela análise de sentimento"""
+    textos = [f"{e['assunto']} {e['corpo']}".lower() for e in emails]
+    categorias = [classificar_por_palavras(texto) for texto in textos]
+    sem_categoria = [i for i, categoria in enumerate(categorias) if not categoria]
+    if sem_categoria:
+        restantes = [textos[i] for i in sem_categoria]
+        if MOTOR_SENTIMENTO == "textblob":
+            sentimentos = [sentimento_textblob(texto) for texto in restantes]
+        else:
+            sentimentos = categorias_por_sentimento(restantes)
+        for i, categoria in zip(sem_categoria, sentimentos):
+            categorias[i] = categoria
+    return categorias
+
+# Cache por conteúdo; a versão muda (e o cache antigo é descartado) se as regras mudarem
+CACHE_CLASSIFICACAO = CacheClassificacao(versao_regras(
+    CATEGORIAS_PALAVRAS, MOTOR_SENTIMENTO, LEXICO, NEGACOES, LIMITE_NEGATIVO, LIMITE_POSITIVO
+)) if USAR_CACHE_CLASSIFICACAO else None
+
+def classificar_emails(emails):
+    """Mantém a 'categoria' decidida pelos cabeçalhos; as demais vêm do cache ou de classificar_conteudo"""
+    categorias = [e.get("categoria") for e in emails]
+    pendentes = [i for i, categoria in enumerate(categorias) if not categoria]
+    if pendentes:
+        lote = [emails[i] for i in pendentes]
+        if CACHE_CLASSIFICACAO:
+            novas = CACHE_CLASSIFICACAO.classificar(lote, classificar_conteudo)
+        else:
+            novas = classificar_conteudo(lote)
+        for i, categoria in zip(pendentes, novas):
+            categorias[i] = categoria
+    return categorias
+
+def classificar_email(assunto, corpo):
+    return classificar_emails([{"assunto": assunto, "corpo": corpo}])[0]
+
+# ===============================
+# MOTOR IMAP (MESMO EVENT LOOP ASSÍNCRONO DO APP)
+# ===============================
+_tela = threading.local()
+
+def _fila_da_tela():
+    if not hasattr(_tela, 'fila'):
+        _tela.fila = queue.Queue()
+    return _tela.fila
+
+def na_tela(funcao):
+    """
+    Envolve um callback de interface para ser chamado de dentro do loop IMAP:
+    a chamada é executada na thread que aguarda em executar() (a do Streamlit)
+    """
+    if funcao is None:
+        return None
+    fila = _fila_da_tela()
+    return lambda *args: fila.put((funcao, args))
+
+def executar(corrotina):
+    """Roda a corrotina no loop IMAP do processo e retorna o resultado, atendendo os callbacks de na_tela enquanto isso"""
+    fila = _fila_da_tela()
+    futuro = loop_do_processo().submeter(corrotina)
+    futuro.add_done_callback(fila.put)  # Acorda a espera quando a corrotina termina
+    while True:
+        chamada = fila.get()
+        if chamada is futuro:
+            return futuro.result()
+        if isinstance(chamada, tuple):
+            funcao, args = chamada
+            funcao(*args)
+
+async def conectar_email(email_usuario, senha, log_callback=None):
     if log_callback:
         log_callback(f"🔌 Iniciando conexão com {SERVIDOR_IMAP}...")
-    
-    imap = imaplib.IMAP4_SSL(SERVIDOR_IMAP)
-    
-    if log_callback:
         log_callback(f"🔐 Autenticando usuário: {email_usuario}")
     
-    imap.login(email_usuario, senha)
+    imap = await conectar(SERVIDOR_IMAP, email_usuario, senha)
+    imap.registro = RegistroCaixa(email_usuario)
     
     if log_callback:
         log_callback(f"✅ Conexão estabelecida com sucesso!")
     
     return imap
 
-def listar_emails(imap, limite=LIMITE_EMAILS, log_callback=None, progress_callback=None):
+async def listar_emails(imap, limite=LIMITE_EMAILS, log_callback=None, progress_callback=None, modo=MODO_LISTAGEM, conta=None,
+                  conexoes_extras=None):
     if log_callback:
         log_callback(f"📬 Selecionando caixa de entrada (INBOX)...")
     
-    imap.select("INBOX")
+    # UIDs em vez de números de sequência; com `conta`, só o que chegou após o checkpoint
+    ids, incremental = await selecionar_uids_pendentes(imap, conta, "INBOX")
     
     if log_callback:
         log_callback(f"🔍 Buscando e-mails na caixa de entrada...")
     
-    status, mensagens = imap.search(None, "ALL")
-    if status != "OK":
+    if ids is None:
         if log_callback:
-            log_callback(f"❌ Erro ao buscar e-mails. Status: {status}")
+            log_callback(f"❌ Erro ao buscar e-mails na INBOX")
         return []
     
-    ids = mensagens[0].split()
     total_inbox = len(ids)
     limite_real = min(limite, total_inbox)
     
-    if log_callback:
-        log_callback(f"📊 Total de e-mails encontrados: {total_inbox}")
-        log_callback(f"📥 Carregando os últimos {limite_real} e-mails...")
+    if incremental:
+        # Mais antigos primeiro, para o checkpoint nunca pular e-mails novos
+        ids_para_processar = ids[:limite_real]
+        if log_callback:
+            log_callback(f"📊 E-mails novos desde a última execução: {total_inbox}")
+            log_callback(f"📥 Carregando {limite_real} e-mails novos...")
+    else:
+        ids_para_processar = ids[-limite_real:] if limite_real else []
+        if log_callback:
+            log_callback(f"📊 Total de e-mails encontrados: {total_inbox}")
+            log_callback(f"📥 Carregando os últimos {limite_real} e-mails...")
+    
+    # Conexões extras leem a INBOX em modo somente leitura, em paralelo com a principal
+    extras = []
+    for extra in conexoes_extras or []:
+        try:
+            if (await extra.select("INBOX", readonly=True))[0] == "OK":
+                extras.append(extra)
+        except Exception:
+            pass
+    if extras and log_callback:
+        log_callback(f"🔀 Buscando em paralelo com {len(extras) + 1} conexões")
+    
+    if modo == "cabecalhos":
+        emails = await listar_em_duas_etapas(
+            imap,
+            ids_para_processar,
+            classificar_por_cabecalhos,
+            log_callback=log_callback,
+            progress_callback=progress_callback,
+            usar_uid=True,
+            conexoes_extras=extras
+        )
+        if log_callback:
+            log_callback(f"✅ {len(emails)} e-mails carregados com sucesso!")
+        return emails
     
     emails = []
-    ids_para_processar = ids[-limite_real:]
     
-    for idx, num in enumerate(ids_para_processar, 1):
+    # Um FETCH por lote (ex.: 1001:1200) em vez de um por mensagem
+    idx = 0
+    async for num, itens in fetch_em_lotes(imap, ids_para_processar, "(RFC822)", usar_uid=True, conexoes_extras=extras):
+        idx += 1
         # Atualiza progresso da listagem
         if progress_callback:
             percentual_listagem = (idx / limite_real) * 100
@@ -93,21 +207,13 @@ def listar_emails(imap, limite=LIMITE_EMAILS, log_callback=None, progress_callba
         if log_callback and idx % 50 == 0:
             log_callback(f"📖 Carregados {idx}/{limite_real} e-mails...")
         
-        status, data = imap.fetch(num, "(RFC822)")
-        if status != "OK":
+        if not itens or 'RFC822' not in itens:
             if log_callback and idx % 100 == 0:
                 log_callback(f"⚠️ Erro ao buscar e-mail ID {num.decode()}")
             continue
         
-        msg = email.message_from_bytes(data[0][1])
-        assunto, cod = decode_header(msg["Subject"])[0]
-        if isinstance(assunto, bytes):
-            assunto = assunto.decode(cod or "utf-8", errors="ignore")
-        
-        corpo = ""
-        for part in msg.walk():
-            if part.get_content_type() == "text/plain":
-                corpo += part.get_payload(decode=True).decode(errors="ignore")
+        # Só cabeçalhos e um trecho limitado da primeira parte de texto
+        assunto, corpo = ler_mensagem(itens['RFC822'])
         
         emails.append({
             "id": num,
@@ -120,23 +226,102 @@ def listar_emails(imap, limite=LIMITE_EMAILS, log_callback=None, progress_callba
     
     return emails
 
-def mover_email(imap, email_id, categoria, log_callback=None):
+async def mover_email(imap, email_id, categoria, log_callback=None):
+    """Copia o e-mail (UID) para a pasta e o marca para exclusão; True só se o COPY e o STORE deram certo"""
+    try:
+        # CREATE só para pasta que não consta nos metadados da conexão (uma vez por categoria)
+        if await comandos_para_criar(imap, categoria):
+            if log_callback:
+                log_callback(f"📁 Criando pasta: {categoria}")
+            await imap.create(nome_pasta_imap(categoria))
+        
+        if log_callback:
+            log_callback(f"📤 Copiando e-mail para: {categoria}")
+        
+        # email_id é um UID (ver listar_emails)
+        status, dados = await imap.uid('COPY', email_id, nome_pasta_imap(categoria))
+        if status != "OK":
+            if log_callback:
+                log_callback(f"⚠️ Falha ao copiar e-mail para {categoria}: {str(dados)[:100]}")
+            # A pasta anotada pode ter sido apagada: o próximo e-mail refaz o LIST
+            await registrar_pasta(imap, categoria, existe=False)
+            return False
+        
+        await registrar_pasta(imap, categoria)
+        
+        if log_callback:
+            log_callback(f"🗑️ Marcando e-mail original para exclusão")
+        
+        status, dados = await imap.uid('STORE', email_id, '+FLAGS', '\\Deleted')
+        if status != "OK":
+            if log_callback:
+                log_callback(f"⚠️ E-mail copiado, mas não marcado para exclusão: {str(dados)[:100]}")
+            return False
+        
+        return True
+    
+    except Exception as e:
+        if log_callback:
+            log_callback(f"⚠️ Erro ao mover e-mail: {str(e)[:100]}")
+        return False
+
+async def remover_duplicatas_gmail(imap, pastas_organizadas, log_callback=None, progress_callback=None, status_callback=None):
+    """Remove da INBOX as mensagens que já estão em alguma pasta, comparando X-GM-MSGID"""
+    if status_callback:
+        status_callback("🔍 **Fase 2/3:** Comparando X-GM-MSGID com as pastas organizadas...")
+    
     if log_callback:
-        log_callback(f"📁 Criando/verificando pasta: {categoria}")
+        log_callback("⚡ Gmail detectado: comparando X-GM-MSGID em lote")
+    
+    try:
+        duplicatas, pastas_com_erro = await duplicatas_por_gm_msgid(
+            imap,
+            pastas_organizadas,
+            progress_callback=(lambda p, t: progress_callback(0.1 + p * 0.7, t)) if progress_callback else None
+        )
+    except Exception as e:
+        if log_callback:
+            log_callback(f"❌ Erro ao mapear e-mails: {str(e)[:100]}")
+        return 0
     
-    imap.create(categoria)
+    if pastas_com_erro > 0 and log_callback:
+        log_callback(f"⚠️ {pastas_com_erro} pastas com erro")
+    
+    if not duplicatas:
+        if log_callback:
+            log_callback("\n✅ Nenhuma duplicata encontrada - INBOX está limpa")
+        if progress_callback:
+            progress_callback(1.0, "✅ Nenhuma duplicata encontrada")
+        if status_callback:
+            status_callback("✅ **Concluído:** Nenhuma duplicata encontrada")
+        return 0
+    
+    if status_callback:
+        status_callback(f"🗑️ **Fase 3/3:** Removendo {len(duplicatas)} duplicatas...")
     
     if log_callback:
-        log_callback(f"📤 Copiando e-mail para: {categoria}")
+        log_callback(f"\n🗑️ Removendo {len(duplicatas)} duplicatas da INBOX...")
     
-    imap.copy(email_id, categoria)
+    try:
+        status, _ = await imap.uid('STORE', compactar_conjunto(duplicatas), '+FLAGS.SILENT', '(\\Deleted)')
+        if status != "OK":
+            if log_callback:
+                log_callback("❌ Erro ao marcar duplicatas para remoção")
+            return 0
+        await imap.expunge()
+    except Exception as e:
+        if log_callback:
+            log_callback(f"❌ Erro ao remover duplicatas: {str(e)[:100]}")
+        return 0
     
     if log_callback:
-        log_callback(f"🗑️ Marcando e-mail original para exclusão")
+        log_callback(f"✅ {len(duplicatas)} e-mails duplicados removidos da INBOX")
+    if progress_callback:
+        progress_callback(1.0, f"✅ {len(duplicatas)} duplicatas removidas!")
     
-    imap.store(email_id, '+FLAGS', '\\Deleted')
+    return len(duplicatas)
 
-def verificar_e_remover_duplicatas(imap, log_callback=None, progress_callback=None, status_callback=None):
+async def verificar_e_remover_duplicatas(imap, log_callback=None, progress_callback=None, status_callback=None, conta=None):
     """
     Verifica se há e-mails duplicados entre INBOX e outras pastas.
     Remove da INBOX os e-mails que já existem em pastas organizadas.
@@ -153,16 +338,16 @@ def verificar_e_remover_duplicatas(imap, log_callback=None, progress_callback=No
     if log_callback:
         log_callback("📂 Listando todas as pastas do Gmail...")
     
-    status, pastas = imap.list()
-    if status != "OK":
+    # Vem dos metadados da conexão; o LIST só é refeito quando eles vencem
+    pastas = await pastas_existentes(imap)
+    if pastas is None:
         if log_callback:
             log_callback("❌ Erro ao listar pastas")
         return 0
     
     # Filtra apenas pastas organizadas (exclui INBOX e pastas do sistema)
     pastas_organizadas = []
-    for pasta in pastas:
-        pasta_nome = pasta.decode().split('"/"')[-1].strip(' "')
+    for pasta_nome in sorted(pastas):
         # Ignora INBOX e pastas do sistema do Gmail
         if pasta_nome not in ['INBOX', '[Gmail]'] and not pasta_nome.startswith('[Gmail]/'):
             pastas_organizadas.append(pasta_nome)
@@ -175,40 +360,44 @@ def verificar_e_remover_duplicatas(imap, log_callback=None, progress_callback=No
     if progress_callback:
         progress_callback(0.1, "📂 Pastas listadas")
     
-    # Obtém IDs dos e-mails na INBOX
+    # Gmail: compara X-GM-MSGID (inteiros) em lote, sem ler cabeçalhos
+    if 'X-GM-EXT-1' in imap.capabilities:
+        return await remover_duplicatas_gmail(imap, pastas_organizadas, log_callback, progress_callback, status_callback)
+    
+    # Obtém UIDs dos e-mails na INBOX
     if status_callback:
         status_callback("🔍 **Fase 2/5:** Analisando caixa de entrada...")
     
-    imap.select("INBOX")
-    status, msgs_inbox = imap.search(None, "ALL")
+    await imap.select("INBOX")
+    status, msgs_inbox = await imap.uid('SEARCH', None, "ALL")
     if status != "OK":
         if log_callback:
             log_callback("❌ Erro ao buscar e-mails da INBOX")
         return 0
     
-    ids_inbox = msgs_inbox[0].split()
-    if not ids_inbox:
+    uids_inbox = [int(uid) for uid in msgs_inbox[0].split()] if msgs_inbox[0] else []
+    if not uids_inbox:
         if log_callback:
             log_callback("📭 INBOX vazia - nada a verificar")
         if progress_callback:
             progress_callback(1.0, "✅ INBOX vazia")
         return 0
     
-    total_inbox = len(ids_inbox)
+    total_inbox = len(uids_inbox)
     
     # Limita a 1000 e-mails mais recentes para verificação
     LIMITE_VERIFICACAO = 1000
     if total_inbox > LIMITE_VERIFICACAO:
-        ids_inbox = ids_inbox[-LIMITE_VERIFICACAO:]  # Pega os últimos 1000
+        uids_inbox = uids_inbox[-LIMITE_VERIFICACAO:]  # Pega os últimos 1000
         if log_callback:
             log_callback(f"⚠️ INBOX possui {total_inbox} e-mails")
             log_callback(f"� Verificando apenas os últimos {LIMITE_VERIFICACAO} e-mails mais recentes")
     
     if log_callback:
-        log_callback(f"�📧 E-mails a verificar: {len(ids_inbox)}")
+        log_callback(f"�📧 E-mails a verificar: {len(uids_inbox)}")
     
     if progress_callback:
-        progress_callback(0.2, f"📧 {len(ids_inbox)} e-mails selecionados")
+        progress_callback(0.2, f"📧 {len(uids_inbox)} e-mails selecionados")
     
     # Cria um conjunto de Message-IDs únicos da INBOX
     if status_callback:
@@ -217,24 +406,26 @@ def verificar_e_remover_duplicatas(imap, log_callback=None, progress_callback=No
     if log_callback:
         log_callback("🔑 Extraindo Message-IDs da INBOX...")
     
+    # UID FETCH em lote (BODY.PEEK não marca como lido)
     inbox_message_ids = {}
-    total_inbox = len(ids_inbox)
+    total_inbox = len(uids_inbox)
     
-    for idx, email_id in enumerate(ids_inbox, 1):
-        status, data = imap.fetch(email_id, "(BODY[HEADER.FIELDS (MESSAGE-ID)])")
-        if status == "OK":
-            msg = email.message_from_bytes(data[0][1])
-            message_id = msg.get("Message-ID", "").strip()
+    try:
+        idx = 0
+        async for uid, itens in fetch_em_lotes(imap, uids_inbox, ITENS_MESSAGE_ID, usar_uid=True):
+            idx += 1
+            message_id = extrair_message_id(itens) if itens else None
             if message_id:
-                inbox_message_ids[message_id] = email_id
-        
-        # Atualiza progresso
-        if progress_callback and idx % 20 == 0:
-            progresso = 0.2 + (idx / total_inbox) * 0.2  # 20% a 40%
-            progress_callback(progresso, f"🔑 Mapeando INBOX: {idx}/{total_inbox}")
-        
-        if log_callback and idx % 100 == 0:
-            log_callback(f"   Processados: {idx}/{total_inbox} e-mails")
+                inbox_message_ids[message_id] = uid
+            
+            # Atualiza progresso
+            if progress_callback and idx % 100 == 0:
+                progresso = 0.2 + (idx / total_inbox) * 0.2  # 20% a 40%
+                progress_callback(progresso, f"🔑 Mapeando INBOX: {idx}/{total_inbox}")
+    except Exception as e:
+        if log_callback:
+            log_callback(f"❌ Erro ao mapear e-mails: {str(e)[:100]}")
+        return 0
     
     if log_callback:
         log_callback(f"🔑 Message-IDs únicos na INBOX: {len(inbox_message_ids)}")
@@ -252,47 +443,33 @@ def verificar_e_remover_duplicatas(imap, log_callback=None, progress_callback=No
     duplicatas_encontradas = set()
     total_pastas = len(pastas_organizadas)
     
+    # CONDSTORE: pastas sem mudança desde a última verificação vêm do cache
+    condstore = bool(conta) and await suporta_condstore(imap)
+    if condstore and log_callback:
+        log_callback("⚡ CONDSTORE disponível: pastas inalteradas serão puladas")
+    
     for idx_pasta, pasta in enumerate(pastas_organizadas, 1):
         try:
             if log_callback:
                 log_callback(f"\n📁 Verificando pasta [{idx_pasta}/{total_pastas}]: {pasta}")
             
-            status, _ = imap.select(f'"{pasta}"' if ' ' in pasta else pasta, readonly=True)
-            if status != "OK":
+            message_ids_pasta, origem = await message_ids_da_pasta(imap, pasta, conta=conta, condstore=condstore)
+            if message_ids_pasta is None:
                 if log_callback:
                     log_callback(f"   ⚠️ Não foi possível acessar a pasta")
                 continue
             
-            status, msgs_pasta = imap.search(None, "ALL")
-            if status != "OK":
-                continue
-            
-            ids_pasta = msgs_pasta[0].split()
-            if not ids_pasta:
-                if log_callback:
-                    log_callback(f"   📭 Pasta vazia")
-                continue
-            
             if log_callback:
-                log_callback(f"   📊 {len(ids_pasta)} e-mails nesta pasta")
+                if origem == "cache":
+                    log_callback(f"   ⚡ Pasta sem alterações desde a última verificação")
+                elif origem == "delta":
+                    log_callback(f"   🔄 Apenas mudanças recentes buscadas (CHANGEDSINCE)")
+                log_callback(f"   📊 {len(message_ids_pasta)} e-mails nesta pasta")
             
-            # Verifica cada e-mail da pasta
-            duplicatas_nesta_pasta = 0
-            for idx_email, email_id in enumerate(ids_pasta, 1):
-                status, data = imap.fetch(email_id, "(BODY[HEADER.FIELDS (MESSAGE-ID)])")
-                if status == "OK":
-                    msg = email.message_from_bytes(data[0][1])
-                    message_id = msg.get("Message-ID", "").strip()
-                    
-                    # Se este Message-ID existe na INBOX, é uma duplicata
-                    if message_id in inbox_message_ids:
-                        duplicatas_encontradas.add(message_id)
-                        duplicatas_nesta_pasta += 1
-                
-                # Atualiza progresso dentro da pasta
-                if progress_callback and len(ids_pasta) > 50 and idx_email % 25 == 0:
-                    progresso_pasta = 0.4 + ((idx_pasta - 1) / total_pastas) * 0.3 + (idx_email / len(ids_pasta)) * (0.3 / total_pastas)
-                    progress_callback(progresso_pasta, f"🔍 Verificando {pasta[:30]}... ({idx_email}/{len(ids_pasta)})")
+            # Se um Message-ID da pasta existe na INBOX, é uma duplicata
+            duplicatas_pasta = message_ids_pasta & inbox_message_ids.keys()
+            duplicatas_encontradas.update(duplicatas_pasta)
+            duplicatas_nesta_pasta = len(duplicatas_pasta)
             
             if log_callback:
                 if duplicatas_nesta_pasta > 0:
@@ -321,28 +498,24 @@ def verificar_e_remover_duplicatas(imap, log_callback=None, progress_callback=No
         if log_callback:
             log_callback(f"\n🗑️ Removendo {len(duplicatas_encontradas)} duplicatas da INBOX...")
         
-        imap.select("INBOX")
-        removidos = 0
-        total_duplicatas = len(duplicatas_encontradas)
+        await imap.select("INBOX")
         
-        for idx, message_id in enumerate(duplicatas_encontradas, 1):
-            if message_id in inbox_message_ids:
-                email_id = inbox_message_ids[message_id]
-                imap.store(email_id, '+FLAGS', '\\Deleted')
-                removidos += 1
-                
-                # Atualiza progresso
-                if progress_callback:
-                    progresso = 0.7 + (idx / total_duplicatas) * 0.25  # 70% a 95%
-                    progress_callback(progresso, f"🗑️ Removendo: {idx}/{total_duplicatas}")
-                
-                if log_callback and idx % 10 == 0:
-                    log_callback(f"   Removidos: {idx}/{total_duplicatas}")
+        # Uma única marcação por UID (no máximo LIMITE_VERIFICACAO mensagens)
+        uids_duplicados = [inbox_message_ids[message_id] for message_id in duplicatas_encontradas]
+        status, _ = await imap.uid('STORE', compactar_conjunto(uids_duplicados), '+FLAGS.SILENT', '(\\Deleted)')
+        if status != "OK":
+            if log_callback:
+                log_callback("❌ Erro ao marcar duplicatas para remoção")
+            return 0
+        removidos = len(uids_duplicados)
+        
+        if progress_callback:
+            progress_callback(0.95, f"🗑️ {removidos} duplicatas marcadas")
         
         if log_callback:
             log_callback(f"🗑️ Expurgando e-mails marcados para exclusão...")
         
-        imap.expunge()
+        await imap.expunge()
         
         if log_callback:
             log_callback(f"✅ {removidos} e-mails duplicados removidos da INBOX")
@@ -389,6 +562,7 @@ def organizar_emails(email_usuario, senha, progress_container, log_container, st
                 key=f"log_live_{len(logs)}"
             )
     
+    imap = None
     try:
         adicionar_log("🚀 ===== INICIANDO ORGANIZAÇÃO DE E-MAILS =====")
         atualizar_logs_tela()
@@ -397,7 +571,7 @@ def organizar_emails(email_usuario, senha, progress_container, log_container, st
         if status_container:
             status_container.info("🔌 **Fase 1/4:** Conectando ao Gmail...")
         
-        imap = conectar_email(email_usuario, senha, log_callback=adicionar_log)
+        imap = executar(pool_compartilhado(conectar_email).obter(email_usuario, senha, log_callback=adicionar_log))
         atualizar_logs_tela()
         
         # Fase 2: Listagem
@@ -413,19 +587,28 @@ def organizar_emails(email_usuario, senha, progress_container, log_container, st
             if progress_container:
                 progress_container.progress(progresso * 0.3, text=f"� {texto}")  # 30% do total
         
-        emails = listar_emails(
-            imap, 
-            log_callback=adicionar_log,
-            progress_callback=progress_listagem
-        )
+        # Sessões extras só se houver vaga no limite da conta; devolvidas logo após a listagem
+        pool = pool_compartilhado(conectar_email)
+        extras = executar(pool.obter_varias(email_usuario, senha, CONEXOES_PARALELAS - 1))
+        try:
+            emails = executar(listar_emails(
+                imap, 
+                log_callback=adicionar_log,
+                progress_callback=na_tela(progress_listagem),
+                conta=email_usuario,
+                conexoes_extras=extras
+            ))
+        finally:
+            for extra in extras:
+                executar(pool.devolver(extra))
         
         atualizar_logs_tela()
         total = len(emails)
         
         if not total:
             adicionar_log("⚠️ Nenhum e-mail encontrado para organizar.")
-            imap.logout()
-            adicionar_log("🔌 Desconectado do servidor.")
+            executar(pool_compartilhado(conectar_email).devolver(imap))
+            adicionar_log("🔌 Conexão devolvida ao pool.")
             
             if progress_container:
                 progress_container.progress(0.0, text="Nenhum e-mail para organizar")
@@ -456,11 +639,13 @@ def organizar_emails(email_usuario, senha, progress_container, log_container, st
             "Neutros": "📄"
         }
         
-        for i, e in enumerate(emails, 1):
-            # Classifica o email
+        # Classifica todos de uma vez (sentimento vetorizado para os sem palavra-chave)
+        categorias = classificar_emails(emails)
+        uids_com_erro = []
+        
+        for i, (e, categoria) in enumerate(zip(emails, categorias), 1):
             adicionar_log(f"\n📧 E-mail {i}/{total}: {e['assunto'][:70]}...")
             
-            categoria = classificar_email(e["assunto"], e["corpo"])
             icone = icones.get(categoria, "📧")
             
             adicionar_log(f"   🏷️ Categoria identificada: {icone} {categoria}")
@@ -472,8 +657,11 @@ def organizar_emails(email_usuario, senha, progress_container, log_container, st
             def log_movimento(msg):
                 adicionar_log(f"   {msg}")
             
-            mover_email(imap, e["id"], categoria, log_callback=log_movimento)
-            adicionar_log(f"   ✅ E-mail organizado com sucesso!")
+            if executar(mover_email(imap, e["id"], categoria, log_callback=log_movimento)):
+                adicionar_log(f"   ✅ E-mail organizado com sucesso!")
+            else:
+                uids_com_erro.append(int(e["id"]))
+                adicionar_log(f"   ⚠️ E-mail mantido na INBOX; será tentado de novo na próxima execução")
             
             # Atualiza progresso (30% listagem + 65% organização)
             progresso_organizacao = 0.3 + (i / total) * 0.65
@@ -502,6 +690,17 @@ def organizar_emails(email_usuario, senha, progress_container, log_container, st
             
             time.sleep(0.02)  # Pequeno delay para visualização
         
+        # Checkpoint: próximas execuções (inclusive do agendador) buscam só UIDs novos
+        # (para antes do primeiro erro, para que ele seja tentado de novo, até MAX_TENTATIVAS_UID execuções)
+        esgotados = registrar_falhas_uid(email_usuario, "INBOX", uids_com_erro)
+        if esgotados:
+            adicionar_log(f"⚠️ {len(esgotados)} e-mails falharam em {MAX_TENTATIVAS_UID} execuções seguidas "
+                          f"(UIDs {compactar_conjunto(sorted(esgotados))}): ficam na INBOX e o checkpoint segue adiante")
+        ultimo = limite_do_checkpoint([int(e["id"]) for e in emails], uids_com_erro, esgotados)
+        if ultimo:
+            avancar_checkpoint(email_usuario, "INBOX", ultimo)
+            limpar_falhas_uid(email_usuario, "INBOX", ultimo)
+        
         # Fase 4: Finalização
         adicionar_log("\n" + "=" * 50)
         adicionar_log("🧹 FASE DE FINALIZAÇÃO")
@@ -513,7 +712,7 @@ def organizar_emails(email_usuario, senha, progress_container, log_container, st
         
         if excluir_da_inbox:
             adicionar_log("🗑️ Removendo e-mails da caixa de entrada (INBOX)...")
-            imap.expunge()
+            executar(imap.expunge())
             adicionar_log("✅ E-mails excluídos da INBOX com sucesso")
         else:
             adicionar_log("📋 E-mails mantidos na INBOX (cópias criadas nas pastas)")
@@ -529,21 +728,22 @@ def organizar_emails(email_usuario, senha, progress_container, log_container, st
             if progress_container:
                 progress_container.progress(progresso, text=f"🔍 {texto}")
         
-        duplicatas_removidas = verificar_e_remover_duplicatas(
+        duplicatas_removidas = executar(verificar_e_remover_duplicatas(
             imap, 
             log_callback=adicionar_log,
-            progress_callback=progress_duplicatas,
-            status_callback=status_container.info if status_container else None
-        )
+            progress_callback=na_tela(progress_duplicatas),
+            status_callback=na_tela(status_container.info if status_container else None),
+            conta=email_usuario
+        ))
         
         atualizar_logs_tela()
         
         if duplicatas_removidas > 0:
             adicionar_log(f"🎯 Total de duplicatas removidas: {duplicatas_removidas}")
         
-        adicionar_log("\n🔌 Desconectando do servidor Gmail...")
-        imap.logout()
-        adicionar_log("✅ Desconexão realizada com sucesso")
+        adicionar_log("\n🔌 Devolvendo conexão ao pool...")
+        executar(pool_compartilhado(conectar_email).devolver(imap))
+        adicionar_log("✅ Conexão liberada para a próxima execução")
         
         # Estatísticas finais
         adicionar_log("\n" + "=" * 50)
@@ -593,6 +793,9 @@ def organizar_emails(email_usuario, senha, progress_container, log_container, st
         adicionar_log(f"❌ Tipo: {type(e).__name__}")
         traceback.print_exc()
         
+        if imap is not None:
+            executar(pool_compartilhado(conectar_email).descartar(imap))
+        
         if log_container:
             log_container.error(f"❌ Erro durante a organização: {e}")
         if status_container:
@@ -608,6 +811,8 @@ def organizar_emails(email_usuario, senha, progress_container, log_container, st
 def agendador(email_usuario, senha, stop_event):
     """
     Executa a organização de emails em background.
+    Com IMAP IDLE (modo push), cada chegada dispara uma organização incremental
+    em segundos; sem IDLE, a organização roda a cada INTERVALO_SEGUNDOS.
     Nota: Esta função roda em uma thread separada, sem ScriptRunContext do Streamlit.
     Os logs são armazenados mas não são exibidos em tempo real durante a execução agendada.
     """
@@ -622,7 +827,16 @@ def agendador(email_usuario, senha, stop_event):
         # Salva informações da execução (sem usar st.session_state que causa warnings)
         # Os dados serão atualizados quando o usuário interagir com a interface
         
-        # Aguarda próxima execução
+        # Aguarda novas mensagens via IDLE (só o que chegou será organizado, pelo checkpoint)
+        try:
+            chegou = executar(aguardar_chegada(SERVIDOR_IMAP, email_usuario, senha, parar=stop_event))
+        except Exception as e:
+            print(f"Erro no IDLE, voltando ao intervalo fixo: {e}")
+            chegou = None
+        if chegou is not None:
+            continue
+        
+        # Sem IDLE: aguarda próxima execução
         proxima = inicio + datetime.timedelta(seconds=INTERVALO_SEGUNDOS)
         
         while datetime.datetime.now() < proxima:
@@ -871,6 +1085,15 @@ def main():
         st.markdown("---")
         st.markdown("**Versão:** 2.0.0")
         st.markdown("**Status:** 🟢 Online")
+        
+        estado = estado_aquecimento()
+        with st.expander("⏱️ Inicialização"):
+            st.markdown(f"**Pronto em:** {estado['pronto_em'] or 0:.2f}s")
+            st.markdown(f"**Aquecimento:** {estado['aquecimento']}")
+            for nome, duracao in estado['duracoes'].items():
+                st.markdown(f"- {nome}: {duracao:.2f}s")
+            for nome, erro in estado['erros'].items():
+                st.markdown(f"- ⚠️ {nome}: {erro}")
 
     # Inicializa session state
     if "logs" not in st.session_state:
@@ -965,7 +1188,7 @@ def main():
                         
                         try:
                             status_container.info("� Conectando ao Gmail...")
-                            imap = conectar_email(email_usuario, senha, log_callback=log_temp)
+                            imap = executar(pool_compartilhado(conectar_email).obter(email_usuario, senha, log_callback=log_temp))
                             
                             status_container.info("🔍 Analisando pastas e removendo duplicatas...")
                             
@@ -975,14 +1198,15 @@ def main():
                             def status_temp(msg):
                                 status_container.info(msg)
                             
-                            duplicatas = verificar_e_remover_duplicatas(
+                            duplicatas = executar(verificar_e_remover_duplicatas(
                                 imap, 
                                 log_callback=log_temp,
-                                progress_callback=progress_temp,
-                                status_callback=status_temp
-                            )
+                                progress_callback=na_tela(progress_temp),
+                                status_callback=na_tela(status_temp),
+                                conta=email_usuario
+                            ))
                             
-                            imap.logout()
+                            executar(pool_compartilhado(conectar_email).devolver(imap))
                             
                             log_container_temp.text_area(
                                 "📋 Resultado da Verificação:",
@@ -999,6 +1223,8 @@ def main():
                             st.session_state.logs.extend(logs_duplicatas)
                             
                         except Exception as e:
+                            if 'imap' in locals():
+                                executar(pool_compartilhado(conectar_email).descartar(imap))
                             status_container.error(f"❌ Erro: {e}")
         
         with col3:
@@ -1015,7 +1241,7 @@ def main():
                         )
                         st.session_state.thread.start()
                         st.session_state.rodando = True
-                        st.success(f"✅ Agendador ativo! Executará a cada {intervalo_horas}h")
+                        st.success("✅ Agendador ativo! Novos e-mails serão organizados assim que chegarem (IMAP IDLE)")
                         st.rerun()
             else:
                 if st.button("⏹️ **Parar Agendador**", use_container_width=True, type="secondary"):
@@ -1153,5 +1379,21 @@ def main():
             Sim. Usamos protocolo IMAP SSL e não armazenamos suas credenciais.
             """)
 
+# ===============================
+# INICIALIZAÇÃO: PRONTIDÃO E AQUECIMENTO
+# ===============================
+def tarefas_aquecimento():
+    """Cargas feitas em segundo plano após a carga, para não atrasar a primeira organização"""
+    tarefas = []
+    if MOTOR_SENTIMENTO == "textblob":
+        tarefas.append(("textblob", aquecer_textblob))
+    tarefas.append(("classificação", lambda: classificar_conteudo([{'assunto': 'aquecimento', 'corpo': 'ok'}])))
+    return tarefas
+
+# O Streamlit reexecuta o script a cada interação: as duas chamadas só agem na primeira vez
+marcar_pronto()
+if AQUECER_NA_INICIALIZACAO:
+    iniciar_aquecimento(tarefas_aquecimento())
+
 if __name__ == "__main__":
     main()
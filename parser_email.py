@@ -0,0 +1,231 @@
+"""
+Leitura rápida e limitada das mensagens baixadas (RFC822 ou prefixos).
+
+O email.message_from_bytes monta a árvore MIME inteira e o walk() com
+get_payload(decode=True) decodifica todas as partes, anexos inclusive.
+Aqui só os cabeçalhos passam pelo BytesParser (compat32, headersonly); as
+partes são localizadas pelos delimitadores sobre o literal original e só
+um trecho limitado da primeira parte de texto é decodificado. Mensagens
+só com HTML têm o texto extraído pelo html.parser, também com limite.
+"""
+import binascii
+from email.header import decode_header
+from email.parser import BytesParser
+from email.policy import compat32
+from html.parser import HTMLParser
+import quopri
+import re
+
+# ===============================
+# CONFIGURAÇÕES
+# ===============================
+LIMITE_TEXTO_BYTES = 16 * 1024  # Texto decodificado mantido por mensagem
+LIMITE_HTML_BYTES = 64 * 1024  # HTML decodificado (marcação inclusa) lido por mensagem
+PROFUNDIDADE_MAXIMA = 8  # multipart dentro de multipart
+PEDACO_HTML = 4096  # Caracteres entregues ao html.parser por vez
+
+_FIM_CABECALHOS = re.compile(rb'\r?\n\r?\n')
+_ESPACOS_TEXTO = re.compile(r'\s+')
+_ESPACOS = b' \t\r\n'
+
+_parser = BytesParser(policy=compat32)
+
+# ===============================
+# CABEÇALHOS
+# ===============================
+def decodificar_cabecalho(valor):
+    """Decodifica um cabeçalho MIME (=?utf-8?...?=) para texto"""
+    if not valor:
+        return ""
+    partes = []
+    for texto, cod in decode_header(valor):
+        if isinstance(texto, bytes):
+            try:
+                texto = texto.decode(cod or "utf-8", errors="ignore")
+            except LookupError:
+                texto = texto.decode("utf-8", errors="ignore")
+        partes.append(texto)
+    return "".join(partes)
+
+def _limite_cabecalhos(dados, inicio, fim):
+    """Retorna (fim_dos_cabecalhos, inicio_do_corpo) dentro de dados[inicio:fim]"""
+    separador = _FIM_CABECALHOS.search(dados, inicio, fim)
+    if separador is None:
+        return fim, fim
+    return separador.start(), separador.end()
+
+def ler_cabecalhos(dados):
+    """Lê só os cabeçalhos (sem montar o corpo) e retorna um email.message.Message"""
+    fim_cabecalhos, _ = _limite_cabecalhos(dados, 0, len(dados))
+    return _parser.parsebytes(dados[:fim_cabecalhos], headersonly=True)
+
+# ===============================
+# LOCALIZAÇÃO DA PARTE DE TEXTO
+# ===============================
+def _partes_texto(dados, inicio, fim, profundidade=0, cabecalhos=None):
+    """
+    Gera (subtipo, encoding, charset, inicio, fim) de cada parte text/plain
+    ou text/html que não seja anexo, na ordem da mensagem, sem copiar o corpo.
+    """
+    fim_cabecalhos, inicio_corpo = _limite_cabecalhos(dados, inicio, fim)
+    if cabecalhos is None:
+        cabecalhos = _parser.parsebytes(dados[inicio:fim_cabecalhos], headersonly=True)
+    tipo = cabecalhos.get_content_type()
+
+    if tipo.startswith("multipart/"):
+        fronteira = cabecalhos.get_param("boundary")
+        if not fronteira or profundidade >= PROFUNDIDADE_MAXIMA:
+            return
+        delimitador = b"--" + str(fronteira).encode("ascii", errors="ignore")
+
+        posicao = dados.find(delimitador, inicio_corpo, fim)
+        while posicao != -1:
+            depois = posicao + len(delimitador)
+            if dados[depois:depois + 2] == b"--":
+                break  # Delimitador de fechamento
+            fim_linha = dados.find(b"\n", depois, fim)
+            if fim_linha == -1:
+                break
+            proxima = dados.find(b"\n" + delimitador, fim_linha, fim)
+            fim_parte = proxima if proxima != -1 else fim  # Prefixo truncado: vai até o fim
+            if fim_parte > fim_linha + 1 and dados[fim_parte - 1:fim_parte] == b"\r":
+                fim_parte -= 1
+
+            yield from _partes_texto(dados, fim_linha + 1, fim_parte, profundidade + 1)
+            posicao = proxima + 1 if proxima != -1 else -1
+        return
+
+    if tipo not in ("text/plain", "text/html"):
+        return
+    if (cabecalhos.get("Content-Disposition") or "").strip().lower().startswith("attachment"):
+        return
+
+    encoding = (cabecalhos.get("Content-Transfer-Encoding") or "7bit").strip().lower()
+    charset = cabecalhos.get_content_charset() or "utf-8"
+    yield tipo.split("/")[1], encoding, charset, inicio_corpo, fim
+
+def localizar_texto(dados, cabecalhos=None):
+    """
+    Escolhe a primeira parte text/plain (parando a busca nela) ou, na falta,
+    a primeira text/html. Retorna (subtipo, encoding, charset, inicio, fim) ou None.
+    `cabecalhos` evita reler os cabeçalhos principais, se já lidos.
+    """
+    alternativa = None
+    for parte in _partes_texto(dados, 0, len(dados), cabecalhos=cabecalhos):
+        if parte[0] == "plain":
+            return parte
+        if alternativa is None:
+            alternativa = parte
+    return alternativa
+
+# ===============================
+# DECODIFICAÇÃO LIMITADA
+# ===============================
+def decodificar_trecho(dados, inicio, fim, encoding, charset, limite=LIMITE_TEXTO_BYTES):
+    """
+    Decodifica no máximo `limite` bytes da parte dados[inicio:fim]. Só o
+    trecho necessário é lido (via memoryview) e convertido para texto.
+    """
+    visao = memoryview(dados)
+
+    if encoding == "base64":
+        # 4 caracteres codificam 3 bytes; sobra para as quebras de linha
+        bruto = bytes(visao[inicio:min(fim, inicio + limite * 4 // 3 + limite // 16 + 8)])
+        bruto = bruto.translate(None, _ESPACOS)
+        bruto = bruto[:len(bruto) - len(bruto) % 4]
+        try:
+            conteudo = binascii.a2b_base64(bruto)[:limite]
+        except binascii.Error:
+            return ""
+    elif encoding == "quoted-printable":
+        # Cada byte pode vir como =XX: até 3 bytes codificados por byte
+        conteudo = quopri.decodestring(bytes(visao[inicio:min(fim, inicio + limite * 3)]))[:limite]
+    else:
+        conteudo = bytes(visao[inicio:min(fim, inicio + limite)])
+
+    try:
+        return conteudo.decode(charset, errors="ignore")
+    except LookupError:
+        return conteudo.decode("utf-8", errors="ignore")
+
+# ===============================
+# TEXTO DE PARTES HTML
+# ===============================
+_TAGS_IGNORADAS = frozenset(("script", "style", "head", "title", "noscript", "template"))
+_TAGS_DE_BLOCO = frozenset(("p", "div", "br", "tr", "td", "th", "li", "h1", "h2", "h3", "h4", "h5", "h6",
+                            "table", "section", "article", "header", "footer", "blockquote"))
+
+class _ExtratorTexto(HTMLParser):
+    """Junta o texto visível do HTML até atingir o limite de caracteres"""
+
+    def __init__(self, limite):
+        super().__init__(convert_charrefs=True)
+        self.limite = limite
+        self.partes = []
+        self.tamanho = 0
+        self.cheio = False
+        self._ignorando = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            self._ignorando = 0  # <head> sem fechamento
+        elif tag in _TAGS_IGNORADAS:
+            self._ignorando += 1
+        elif tag in _TAGS_DE_BLOCO:
+            self.partes.append(" ")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in _TAGS_DE_BLOCO:
+            self.partes.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in _TAGS_IGNORADAS and self._ignorando:
+            self._ignorando -= 1
+        elif tag in _TAGS_DE_BLOCO:
+            self.partes.append(" ")
+
+    def handle_data(self, data):
+        if self._ignorando or self.cheio:
+            return
+        self.partes.append(data)
+        self.tamanho += len(data)
+        if self.tamanho >= self.limite:
+            self.cheio = True
+
+def html_para_texto(html_texto, limite=LIMITE_TEXTO_BYTES):
+    """
+    Extrai o texto visível do HTML (sem script/style), entregando-o ao
+    html.parser em pedaços e parando assim que `limite` caracteres forem reunidos.
+    """
+    extrator = _ExtratorTexto(limite)
+    try:
+        for inicio in range(0, len(html_texto), PEDACO_HTML):
+            extrator.feed(html_texto[inicio:inicio + PEDACO_HTML])
+            if extrator.cheio:
+                break
+        else:
+            extrator.close()
+    except Exception:
+        pass  # HTML malformado: fica o texto reunido até aqui
+    return _ESPACOS_TEXTO.sub(" ", "".join(extrator.partes)).strip()[:limite]
+
+def extrair_corpo(dados, limite=LIMITE_TEXTO_BYTES, cabecalhos=None):
+    """
+    Texto da primeira parte text/plain da mensagem (até `limite` bytes) ou,
+    se não houver, o texto da primeira parte text/html; "" se nenhuma existir.
+    """
+    if not dados:
+        return ""
+    parte = localizar_texto(dados, cabecalhos)
+    if parte is None:
+        return ""
+    subtipo, encoding, charset, inicio, fim = parte
+    if subtipo == "html":
+        html_texto = decodificar_trecho(dados, inicio, fim, encoding, charset, max(limite, LIMITE_HTML_BYTES))
+        return html_para_texto(html_texto, limite)
+    return decodificar_trecho(dados, inicio, fim, encoding, charset, limite)
+
+def ler_mensagem(dados, limite=LIMITE_TEXTO_BYTES):
+    """Retorna (assunto, corpo) de uma mensagem RFC822 completa ou truncada"""
+    cabecalhos = ler_cabecalhos(dados)
+    return decodificar_cabecalho(cabecalhos["Subject"]), extrair_corpo(dados, limite, cabecalhos)
@@ -0,0 +1,77 @@
+"""
+Pipeline em fluxo da organização: busca → classificação → movimentação.
+
+As três etapas rodam ao mesmo tempo, ligadas por filas limitadas: as
+movimentações começam enquanto a busca continua, e a memória usada depende
+da profundidade das filas, não do tamanho da caixa de entrada.
+"""
+import asyncio
+
+# ===============================
+# CONFIGURAÇÕES
+# ===============================
+PROFUNDIDADE_FILA = 200  # E-mails aguardando entre uma etapa e a seguinte
+TAMANHO_LOTE_CLASSIFICACAO = 100  # E-mails classificados por chamada, no máximo
+
+_FIM = object()
+
+async def executar_pipeline(origem, classificar, mover, profundidade=PROFUNDIDADE_FILA, ocioso=None):
+    """
+    Consome `origem` (iterador assíncrono de e-mails), classifica em lote com
+    `classificar([emails]) -> [categorias]` em uma thread auxiliar (CPU, fora
+    do event loop) e chama `await mover(email, categoria)` na ordem de chegada.
+    Cada lote reúne os e-mails já disponíveis na fila, sem esperar por mais.
+    `await ocioso()` é chamado sempre que a movimentação esvazia a fila (nada
+    classificado aguardando), para aplicar o que estiver acumulado.
+    Se uma etapa falhar, as outras são canceladas e o erro é propagado.
+    """
+    fila_classificacao = asyncio.Queue(profundidade)
+    fila_movimentacao = asyncio.Queue(profundidade)
+    loop = asyncio.get_running_loop()
+
+    async def etapa_busca():
+        try:
+            async for item in origem:
+                await fila_classificacao.put(item)
+        finally:
+            await fila_classificacao.put(_FIM)
+
+    async def etapa_classificacao():
+        try:
+            fim = False
+            while not fim:
+                lote = [await fila_classificacao.get()]
+                while len(lote) < TAMANHO_LOTE_CLASSIFICACAO and not fila_classificacao.empty():
+                    lote.append(fila_classificacao.get_nowait())
+                if lote[-1] is _FIM:
+                    lote.pop()
+                    fim = True
+                if not lote:
+                    continue
+                categorias = await loop.run_in_executor(None, classificar, lote)
+                for item, categoria in zip(lote, categorias):
+                    await fila_movimentacao.put((item, categoria))
+        finally:
+            await fila_movimentacao.put(_FIM)
+
+    async def etapa_movimentacao():
+        while True:
+            par = await fila_movimentacao.get()
+            if par is _FIM:
+                break
+            await mover(*par)
+            if ocioso and fila_movimentacao.empty():
+                await ocioso()
+
+    tarefas = [
+        asyncio.create_task(etapa_busca()),
+        asyncio.create_task(etapa_classificacao()),
+        asyncio.create_task(etapa_movimentacao())
+    ]
+    try:
+        await asyncio.gather(*tarefas)
+    except BaseException:
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        raise
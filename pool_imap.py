@@ -0,0 +1,195 @@
+"""
+Pool de conexões IMAP autenticadas, compartilhado por todo o processo.
+
+Evita um handshake TLS + LOGIN a cada execução: organização e verificação
+de duplicatas seguidas reaproveitam a mesma sessão. As conexões são
+separadas por conta (e-mail + hash da senha), verificadas com NOOP antes
+de serem entregues e fechadas depois de ficarem ociosas por muito tempo.
+
+As sessões são do cliente de motor_imap_async e só são usadas dentro do
+event loop compartilhado (LoopIMAP) em que o pool foi criado.
+"""
+import asyncio
+import atexit
+import hashlib
+import threading
+import time
+
+from motor_imap_async import loop_do_processo
+
+# ===============================
+# CONFIGURAÇÕES
+# ===============================
+MAX_CONEXOES_POR_CONTA = 6  # O Gmail aceita até 15 conexões simultâneas por conta
+TEMPO_OCIOSO_SEGUNDOS = 5 * 60  # Fecha conexões paradas há mais tempo que isso
+INTERVALO_LIMPEZA_SEGUNDOS = 60
+TIMEOUT_ESPERA_SEGUNDOS = 120  # Espera máxima por uma vaga quando a conta está no limite
+
+def chave_da_conta(conta, senha):
+    """A senha entra na chave: só quem tem a credencial recebe a sessão"""
+    return (conta.strip().lower(), hashlib.sha256(senha.encode()).hexdigest())
+
+class PoolIMAPAssincrono:
+    """
+    Pool de sessões IMAP autenticadas, por conta (usar sempre no mesmo event loop).
+    Com `loop` (motor_imap_async.LoopIMAP), uma tarefa periódica nesse loop
+    fecha as sessões ociosas mesmo sem novos pedidos; fechar() a cancela.
+    """
+
+    def __init__(self, conectar, max_por_conta=MAX_CONEXOES_POR_CONTA, tempo_ocioso=TEMPO_OCIOSO_SEGUNDOS, loop=None):
+        # await conectar(email_usuario, senha, log_callback=None) -> sessão autenticada
+        self._conectar = conectar
+        self.loop = loop
+        self.max_por_conta = max_por_conta
+        self.tempo_ocioso = tempo_ocioso
+        self._livres = {}   # chave -> [(imap, devolvida_em)]
+        self._vagas = {}    # chave -> asyncio.Semaphore(max_por_conta)
+        self._em_uso = {}   # id(imap) -> chave
+        self._ultima_limpeza = time.monotonic()
+        self._limpeza = loop.repetir(self.limpar_ociosas, INTERVALO_LIMPEZA_SEGUNDOS) if loop is not None else None
+
+    @staticmethod
+    async def _fechar(imap):
+        try:
+            await imap.logout()
+        except Exception:
+            pass
+
+    @staticmethod
+    async def _saudavel(imap):
+        try:
+            status, _ = await imap.noop()
+            return status == "OK"
+        except Exception:
+            return False
+
+    async def obter(self, conta, senha, log_callback=None, timeout=TIMEOUT_ESPERA_SEGUNDOS):
+        """Entrega uma sessão autenticada da conta (reaproveitada ou nova)"""
+        # Sem tarefa de limpeza no loop: as ociosas são fechadas aqui, de tempos em tempos
+        if self._limpeza is None and time.monotonic() - self._ultima_limpeza > INTERVALO_LIMPEZA_SEGUNDOS:
+            await self.limpar_ociosas()
+
+        chave = chave_da_conta(conta, senha)
+        vagas = self._vagas.setdefault(chave, asyncio.Semaphore(self.max_por_conta))
+
+        try:
+            if timeout == 0:
+                if vagas.locked():
+                    raise asyncio.TimeoutError()
+                await vagas.acquire()
+            else:
+                await asyncio.wait_for(vagas.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise Exception(f"❌ Limite de {self.max_por_conta} conexões simultâneas atingido para {conta}. "
+                            "Tente novamente em instantes.")
+
+        try:
+            livres = self._livres.get(chave)
+            while livres:
+                imap, devolvida_em = livres.pop()
+                if time.monotonic() - devolvida_em > self.tempo_ocioso or not await self._saudavel(imap):
+                    await self._fechar(imap)
+                    continue
+
+                if log_callback:
+                    log_callback(f"♻️ Reutilizando conexão autenticada de {conta}")
+                self._em_uso[id(imap)] = chave
+                return imap
+
+            imap = await self._conectar(conta, senha, log_callback=log_callback)
+            self._em_uso[id(imap)] = chave
+            return imap
+
+        except Exception:
+            vagas.release()
+            raise
+
+    async def obter_varias(self, conta, senha, quantidade, log_callback=None):
+        """Tenta obter até `quantidade` sessões extras sem esperar por vagas"""
+        conexoes = []
+        for _ in range(max(quantidade, 0)):
+            try:
+                conexoes.append(await self.obter(conta, senha, log_callback=log_callback, timeout=0))
+            except Exception:
+                break
+        return conexoes
+
+    async def devolver(self, imap, descartar=False):
+        """Devolve a sessão ao pool (ou fecha, se `descartar`)"""
+        chave = self._em_uso.pop(id(imap), None)
+        if chave is None:
+            return  # Já devolvida
+
+        if not descartar and imap.state == 'SELECTED':
+            try:
+                await imap.unselect()
+            except Exception:
+                descartar = True
+
+        if descartar or imap.state == 'LOGOUT':
+            await self._fechar(imap)
+        else:
+            self._livres.setdefault(chave, []).append((imap, time.monotonic()))
+
+        self._vagas[chave].release()
+
+    async def descartar(self, imap):
+        """Fecha a sessão em vez de devolvê-la (ex.: conexão caiu)"""
+        await self.devolver(imap, descartar=True)
+
+    async def limpar_ociosas(self):
+        """Fecha conexões livres paradas há mais de `tempo_ocioso` segundos"""
+        agora = time.monotonic()
+        self._ultima_limpeza = agora
+        fechar = []
+        for chave, livres in self._livres.items():
+            fechar.extend(imap for imap, t in livres if agora - t > self.tempo_ocioso)
+            self._livres[chave] = [(imap, t) for imap, t in livres if agora - t <= self.tempo_ocioso]
+        for imap in fechar:
+            await self._fechar(imap)
+        return len(fechar)
+
+    async def fechar(self):
+        """Cancela a limpeza periódica e fecha todas as sessões livres"""
+        if self._limpeza is not None:
+            self._limpeza.cancel()
+            self._limpeza = None
+        livres = [imap for lista in self._livres.values() for imap, _ in lista]
+        self._livres = {}
+        for imap in livres:
+            await self._fechar(imap)
+
+    def estatisticas(self):
+        """Retorna {'livres': N, 'em_uso': N, 'contas': N}"""
+        return {
+            'livres': sum(len(lista) for lista in self._livres.values()),
+            'em_uso': len(self._em_uso),
+            'contas': len(self._vagas)
+        }
+
+# ===============================
+# POOL DO PROCESSO
+# ===============================
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _fechar_na_saida(pool):
+    try:
+        pool.loop.submeter(pool.fechar()).result(timeout=10)
+    except Exception:
+        pass
+
+def pool_compartilhado(conectar):
+    """
+    Retorna o pool do processo associado à função de conexão, no LoopIMAP do
+    processo (pool.loop). Útil no Streamlit, que reexecuta o script (e
+    redefine as funções) a cada interação: o pool é identificado pelo nome
+    da função, não pelo objeto. As sessões livres são fechadas na saída.
+    """
+    chave = (conectar.__module__, conectar.__qualname__)
+    with _pools_lock:
+        if chave not in _pools:
+            pool = PoolIMAPAssincrono(conectar, loop=loop_do_processo())
+            atexit.register(_fechar_na_saida, pool)
+            _pools[chave] = pool
+        return _pools[chave]
@@ -0,0 +1,159 @@
+"""
+Análise de sentimento por léxico, vetorizada com NumPy.
+
+Substitui o TextBlob (só inglês, um objeto por e-mail) na classificação dos
+e-mails que não casam com nenhuma palavra-chave. A tabela palavra → polaridade
+(português e inglês) é montada uma vez, indexada pelo hash de cada palavra;
+um lote inteiro de textos vira um único vetor de hashes, e as polaridades
+são somadas por e-mail com np.bincount. A nota é a média das palavras com
+polaridade, invertida e atenuada após uma negação ("não", "not"), como no
+TextBlob, e os limites das categorias são os mesmos.
+"""
+from itertools import chain
+import re
+
+import numpy as np
+
+from classificador import normalizar
+
+# ===============================
+# CONFIGURAÇÕES
+# ===============================
+LIMITE_NEGATIVO = -0.1  # Abaixo disto: "Problemas"
+LIMITE_POSITIVO = 0.3  # Acima disto: "Positivos"
+FATOR_NEGACAO = -0.5  # Palavra logo após uma negação (mesmo fator do TextBlob)
+
+# ===============================
+# LÉXICO
+# ===============================
+# Polaridade de -1 (muito negativo) a 1 (muito positivo); acentos são ignorados
+LEXICO = {
+    # Português - positivas
+    "obrigado": 0.5, "obrigada": 0.5, "agradeco": 0.5, "agradecemos": 0.5, "agradecimento": 0.5,
+    "parabens": 0.8, "feliz": 0.8, "felizes": 0.8, "felicidade": 0.8, "alegria": 0.8,
+    "otimo": 0.8, "otima": 0.8, "excelente": 1.0, "maravilhoso": 1.0, "maravilhosa": 1.0,
+    "incrivel": 0.9, "perfeito": 1.0, "perfeita": 1.0, "bom": 0.5, "boa": 0.5, "bons": 0.5,
+    "boas": 0.5, "melhor": 0.5, "lindo": 0.7, "linda": 0.7, "legal": 0.5, "bacana": 0.5,
+    "sucesso": 0.7, "aprovado": 0.6, "aprovada": 0.6, "conquista": 0.6, "vitoria": 0.7,
+    "gostei": 0.6, "adorei": 0.8, "amei": 0.9, "amo": 0.8, "adoro": 0.7, "satisfeito": 0.6,
+    "satisfeita": 0.6, "recomendo": 0.6, "eficiente": 0.5, "rapido": 0.3, "facil": 0.4,
+    "seguro": 0.3, "confirmado": 0.4, "confirmada": 0.4, "concluido": 0.4, "concluida": 0.4,
+    "resolvido": 0.5, "resolvida": 0.5, "ganhou": 0.6, "premio": 0.6, "presente": 0.4,
+    "especial": 0.4, "bem": 0.3, "benvindo": 0.6, "bemvindo": 0.6, "saudades": 0.3,
+    "abraco": 0.4, "abracos": 0.4, "beijos": 0.4, "carinho": 0.6, "sorte": 0.5,
+    # Português - negativas
+    "problema": -0.5, "problemas": -0.5, "falha": -0.6, "falhas": -0.6, "falhou": -0.6,
+    "atraso": -0.5, "atrasado": -0.5, "atrasada": -0.5, "urgente": -0.3, "reclamacao": -0.6,
+    "ruim": -0.7, "pessimo": -1.0, "pessima": -1.0, "horrivel": -1.0, "terrivel": -1.0,
+    "triste": -0.7, "infelizmente": -0.5, "lamento": -0.5, "lamentamos": -0.5,
+    "desculpe": -0.3, "desculpas": -0.3, "cancelado": -0.5, "cancelada": -0.5,
+    "cancelamento": -0.4, "recusado": -0.6, "recusada": -0.6, "negado": -0.6, "negada": -0.6,
+    "reprovado": -0.6, "reprovada": -0.6, "suspenso": -0.6, "suspensa": -0.6, "bloqueado": -0.6,
+    "bloqueada": -0.6, "invalido": -0.5, "invalida": -0.5, "incorreto": -0.5, "incorreta": -0.5,
+    "defeito": -0.6, "quebrado": -0.6, "quebrada": -0.6, "perdido": -0.5, "perdida": -0.5,
+    "perda": -0.5, "prejuizo": -0.6, "multa": -0.5, "divida": -0.5, "debito": -0.3,
+    "pendente": -0.2, "pendencia": -0.4, "cobranca": -0.3, "inadimplente": -0.7,
+    "fraude": -0.9, "golpe": -0.8, "suspeita": -0.5, "suspeito": -0.5, "risco": -0.4,
+    "perigo": -0.7, "aviso": -0.2, "advertencia": -0.5, "irregular": -0.5, "irregularidade": -0.6,
+    "insatisfeito": -0.6, "insatisfeita": -0.6, "decepcionado": -0.7, "decepcionada": -0.7,
+    "raiva": -0.8, "absurdo": -0.7, "inaceitavel": -0.8, "dificil": -0.4, "dificuldade": -0.4,
+    "impossivel": -0.5, "pior": -0.7, "mal": -0.5, "mau": -0.5, "errado": -0.5, "errada": -0.5,
+    "expirado": -0.4, "expirada": -0.4, "vencido": -0.4, "vencida": -0.4, "indisponivel": -0.5,
+    # Inglês - positivas
+    "thanks": 0.4, "thank": 0.4, "congratulations": 0.8, "congrats": 0.8, "happy": 0.8,
+    "great": 0.8, "excellent": 1.0, "amazing": 0.9, "awesome": 1.0, "wonderful": 1.0,
+    "perfect": 1.0, "good": 0.7, "nice": 0.6, "best": 1.0, "better": 0.5, "love": 0.5,
+    "glad": 0.5, "pleased": 0.5, "success": 0.7, "successful": 0.7, "approved": 0.6,
+    "welcome": 0.8, "enjoy": 0.4, "fantastic": 0.9, "beautiful": 0.85, "fun": 0.3,
+    "win": 0.8, "winner": 0.8, "free": 0.4, "easy": 0.4, "resolved": 0.5, "confirmed": 0.4,
+    # Inglês - negativas
+    "problem": -0.5, "issue": -0.3, "error": -0.5, "failed": -0.5, "failure": -0.6,
+    "fail": -0.5, "bad": -0.7, "worst": -1.0, "worse": -0.7, "terrible": -1.0,
+    "horrible": -1.0, "awful": -1.0, "poor": -0.4, "sad": -0.5, "sorry": -0.5,
+    "unfortunately": -0.5, "unable": -0.5, "cancelled": -0.5, "canceled": -0.5,
+    "declined": -0.6, "denied": -0.6, "rejected": -0.6, "suspended": -0.6, "locked": -0.4,
+    "invalid": -0.5, "wrong": -0.5, "broken": -0.6, "lost": -0.5, "late": -0.3,
+    "overdue": -0.6, "expired": -0.4, "urgent": -0.3, "warning": -0.3, "fraud": -0.9,
+    "suspicious": -0.5, "angry": -0.8, "disappointed": -0.75, "complaint": -0.6,
+    "difficult": -0.5, "impossible": -0.6, "unavailable": -0.5,
+}
+
+# Palavras que invertem a seguinte ("não gostei", "not good")
+NEGACOES = ("nao", "nem", "nunca", "jamais", "sem", "not", "never", "dont", "cannot", "without")
+
+_TOKEN = re.compile(r"\w+")
+
+# ===============================
+# TABELA DE HASHES
+# ===============================
+# Cada palavra ocupa o balde hash(palavra) & máscara; a chave guarda o hash
+# inteiro para descartar palavras de fora do léxico que caiam no mesmo balde.
+# hash() nunca retorna -1 no CPython, então -1 marca balde vazio.
+_VAZIO = -1
+
+def _montar_tabela(lexico, negacoes):
+    """Retorna (mascara, chaves, polaridades, negacoes) sem colisões entre palavras do léxico"""
+    palavras = {normalizar(p): v for p, v in lexico.items()}
+    for negacao in negacoes:
+        palavras.setdefault(normalizar(negacao), 0.0)
+    hashes = {p: hash(p) for p in palavras}
+
+    tamanho = 1 << max(8, (4 * len(palavras)).bit_length())
+    while len({h & (tamanho - 1) for h in hashes.values()}) < len(hashes):
+        tamanho <<= 1
+    mascara = tamanho - 1
+
+    chaves = np.full(tamanho, _VAZIO, dtype=np.int64)
+    polaridades = np.zeros(tamanho, dtype=np.float64)
+    e_negacao = np.zeros(tamanho, dtype=bool)
+    conjunto_negacoes = {normalizar(n) for n in negacoes}
+    for palavra, valor in palavras.items():
+        balde = hashes[palavra] & mascara
+        chaves[balde] = hashes[palavra]
+        polaridades[balde] = valor
+        e_negacao[balde] = palavra in conjunto_negacoes
+    return mascara, chaves, polaridades, e_negacao
+
+_MASCARA, _CHAVES, _POLARIDADES, _NEGACOES = _montar_tabela(LEXICO, NEGACOES)
+
+# ===============================
+# PONTUAÇÃO EM LOTE
+# ===============================
+def polaridades(textos):
+    """Retorna um np.ndarray com a polaridade (-1 a 1) de cada texto do lote"""
+    quantidade = len(textos)
+    if quantidade == 0:
+        return np.zeros(0)
+
+    tokens = [_TOKEN.findall(normalizar(texto)) if texto else [] for texto in textos]
+    contagens = np.fromiter(map(len, tokens), dtype=np.intp, count=quantidade)
+    total = int(contagens.sum())
+    if total == 0:
+        return np.zeros(quantidade)
+
+    ids = np.fromiter(map(hash, chain.from_iterable(tokens)), dtype=np.int64, count=total)
+    baldes = ids & _MASCARA
+    conhecidos = _CHAVES[baldes] == ids
+    valores = np.where(conhecidos, _POLARIDADES[baldes], 0.0)
+    negacoes = conhecidos & _NEGACOES[baldes]
+
+    # Negação vale para a palavra seguinte do mesmo texto
+    texto_de = np.repeat(np.arange(quantidade), contagens)
+    negada = np.zeros(total, dtype=bool)
+    negada[1:] = negacoes[:-1] & (texto_de[1:] == texto_de[:-1])
+    valores = np.where(negada, valores * FATOR_NEGACAO, valores)
+
+    soma = np.bincount(texto_de, weights=valores, minlength=quantidade)
+    pesos = np.bincount(texto_de, weights=(valores != 0), minlength=quantidade)
+    return np.divide(soma, pesos, out=np.zeros(quantidade), where=pesos > 0)
+
+def categorias_por_sentimento(textos):
+    """Classifica um lote de textos em "Problemas", "Positivos" ou "Neutros"""
+    notas = polaridades(textos)
+    categorias = np.where(notas < LIMITE_NEGATIVO, "Problemas",
+                          np.where(notas > LIMITE_POSITIVO, "Positivos", "Neutros"))
+    return categorias.tolist()
+
+def categoria_por_sentimento(texto):
+    """Versão de um texto só de categorias_por_sentimento"""
+    return categorias_por_sentimento([texto])[0]
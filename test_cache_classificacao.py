@@ -0,0 +1,133 @@
+"""
+Testes do cache de classificação por conteúdo: chaves normalizadas,
+reaproveitamento entre lotes e processos (SQLite), troca da versão das
+regras e remoção das entradas menos usadas.
+
+    python -m pytest -q test_cache_classificacao.py
+"""
+import sqlite3
+
+import pytest
+
+import cache_classificacao
+from cache_classificacao import CacheClassificacao, chave_conteudo, versao_regras
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """organizer.db temporário com a tabela do cache"""
+    caminho = str(tmp_path / 'organizer.db')
+    monkeypatch.setattr(cache_classificacao, 'DB_PATH', caminho)
+    cache_classificacao.init_tabela_cache()
+    return caminho
+
+def linhas_no_banco(caminho):
+    conn = sqlite3.connect(caminho)
+    total = conn.execute('SELECT COUNT(*) FROM classification_cache').fetchone()[0]
+    conn.close()
+    return total
+
+class ClassificadorContado:
+    """classificar_lote de teste: categoria pelo assunto, contando os e-mails recebidos"""
+
+    def __init__(self):
+        self.recebidos = 0
+
+    def __call__(self, emails):
+        self.recebidos += len(emails)
+        return ["Faturas" if "boleto" in e['assunto'].lower() else "Outros" for e in emails]
+
+EMAILS = [
+    {'assunto': 'Seu boleto', 'corpo': 'vence amanhã', 'remetente': 'Banco <cobranca@banco.com>'},
+    {'assunto': 'Oi', 'corpo': 'tudo bem?', 'remetente': 'ana@exemplo.com'},
+]
+
+# ===============================
+# CHAVES E VERSÕES
+# ===============================
+def test_chave_conteudo_ignora_caixa_acentos_e_espacos():
+    assert chave_conteudo("Reunião  amanhã", "Pauta\n\nanexa") == chave_conteudo("REUNIAO amanha", "pauta anexa")
+    assert chave_conteudo("Reunião", "pauta") != chave_conteudo("Reunião", "outra pauta")
+
+def test_chave_conteudo_considera_o_endereco_do_remetente():
+    assert chave_conteudo("Oi", "", "Ana <ana@x.com>") == chave_conteudo("Oi", "", "ana@x.com")
+    assert chave_conteudo("Oi", "", "ana@x.com") != chave_conteudo("Oi", "", "bia@x.com")
+
+def test_versao_regras_muda_com_as_regras():
+    assert versao_regras({'Faturas': ['boleto']}) == versao_regras({'Faturas': ['boleto']})
+    assert versao_regras({'Faturas': ['boleto']}) != versao_regras({'Faturas': ['boleto', 'pix']})
+
+# ===============================
+# REAPROVEITAMENTO
+# ===============================
+def test_classificar_so_calcula_os_desconhecidos(banco):
+    cache = CacheClassificacao("v1")
+    classificar = ClassificadorContado()
+
+    assert cache.classificar(EMAILS, classificar) == ["Faturas", "Outros"]
+    assert cache.classificar(EMAILS + [dict(EMAILS[0])], classificar) == ["Faturas", "Outros", "Faturas"]
+    assert classificar.recebidos == 2
+
+def test_outro_processo_le_do_banco(banco):
+    CacheClassificacao("v1").classificar(EMAILS, ClassificadorContado())
+
+    classificar = ClassificadorContado()
+    assert CacheClassificacao("v1").classificar(EMAILS, classificar) == ["Faturas", "Outros"]
+    assert classificar.recebidos == 0
+
+def test_escopos_nao_se_misturam(banco):
+    CacheClassificacao("v1", escopo="ana").classificar(EMAILS, ClassificadorContado())
+
+    classificar = ClassificadorContado()
+    CacheClassificacao("v1", escopo="bia").classificar(EMAILS, classificar)
+    assert classificar.recebidos == 2
+
+# ===============================
+# VERSÃO DAS REGRAS
+# ===============================
+def test_invalidar_descarta_a_memoria(banco):
+    cache = CacheClassificacao("v1")
+    cache.classificar(EMAILS, ClassificadorContado())
+
+    cache.invalidar("v2")
+    classificar = ClassificadorContado()
+    cache.classificar(EMAILS, classificar)
+    assert classificar.recebidos == 2
+
+def test_nova_versao_apaga_as_entradas_antigas_do_banco(banco):
+    CacheClassificacao("v1").classificar(EMAILS, ClassificadorContado())
+    assert linhas_no_banco(banco) == 2
+
+    CacheClassificacao("v2").obter([chave_conteudo("x", "y")])
+    assert linhas_no_banco(banco) == 0
+
+# ===============================
+# LIMITES DE TAMANHO
+# ===============================
+def test_memoria_remove_a_entrada_usada_ha_mais_tempo(banco):
+    cache = CacheClassificacao("v1", max_memoria=2)
+    cache.salvar({'a': 'A', 'b': 'B'})
+    cache.obter(['a'])  # 'a' passa a ser a mais recente
+    cache.salvar({'c': 'C'})
+
+    assert list(cache._memoria) == ['a', 'c']
+
+    # 'b' saiu da memória, mas continua no banco
+    assert cache.obter(['b']) == {'b': 'B'}
+
+def test_banco_remove_as_entradas_menos_usadas(banco, monkeypatch):
+    monkeypatch.setattr(cache_classificacao, 'CONTAR_A_CADA', 1)
+    relogio = iter(range(1, 1000))
+    monkeypatch.setattr(cache_classificacao.time, 'time', lambda: next(relogio))  # Sem empates em usado_em
+    cache = CacheClassificacao("v1", max_banco=10)
+    for i in range(10):
+        cache.salvar({f'antiga{i}': 'X'})
+    CacheClassificacao("v1").obter(['antiga0'])  # Lida do banco por outro processo: marca o uso
+    cache.salvar({'nova': 'Y'})
+
+    # Passou do limite: remove o excesso e mais FOLGA_REMOCAO do limite
+    assert linhas_no_banco(banco) == 10 - int(10 * cache_classificacao.FOLGA_REMOCAO)
+    conn = sqlite3.connect(banco)
+    restantes = {linha[0] for linha in conn.execute('SELECT chave FROM classification_cache')}
+    conn.close()
+    assert {'antiga0', 'nova'} <= restantes
+    assert 'antiga1' not in restantes
@@ -0,0 +1,97 @@
+"""
+Testes da classificação por regras e palavras-chave: prioridade entre
+categorias, endereço exato antes do domínio, ordem dos campos e a ordem
+regras → índice de remetentes → palavras padrão nos cabeçalhos.
+
+    python -m pytest -q test_classificador.py
+"""
+from classificador import (
+    ClassificadorPalavras, ClassificadorRegras, classificar_por_cabecalhos, classificar_por_palavras, normalizar
+)
+
+# ===============================
+# PALAVRAS-CHAVE
+# ===============================
+def test_normalizar_remove_acentos_e_caixa():
+    assert normalizar("Reunião de AVALIAÇÃO") == "reuniao de avaliacao"
+
+def test_palavras_ignoram_acentos_dos_dois_lados():
+    classificador = ClassificadorPalavras({"Trabalho": ["reunião"]})
+    assert classificador.categoria("REUNIAO amanha") == "Trabalho"
+    assert classificador.categoria("") is None
+
+def test_palavras_seguem_a_ordem_das_categorias():
+    classificador = ClassificadorPalavras({"Faturas": ["boleto"], "Trabalho": ["projeto"]})
+    assert classificador.categoria("projeto: boleto do fornecedor") == "Faturas"
+    assert classificar_por_palavras("Boleto do projeto") == "Faturas"
+
+# ===============================
+# REGRAS DO USUÁRIO
+# ===============================
+def test_endereco_exato_antes_do_dominio():
+    regras = ClassificadorRegras([
+        ("Banco", "remetente", "banco.com"),
+        ("Gerente", "remetente", "gerente@banco.com"),
+    ])
+    assert regras.categoria("Gerente <Gerente@Banco.com>") == "Gerente"
+    assert regras.categoria("avisos@banco.com") == "Banco"
+
+def test_dominio_inclui_subdominios():
+    regras = ClassificadorRegras([("Banco", "remetente", "@banco.com")])
+    assert regras.categoria("avisos@mail.banco.com") == "Banco"
+    assert regras.categoria("avisos@outrobanco.com") is None
+
+def test_primeira_regra_vence():
+    regras = ClassificadorRegras([
+        ("Primeira", "remetente", "banco.com"),
+        ("Segunda", "remetente", "banco.com"),
+        ("Faturas", "assunto", "fatura"),
+        ("Cobranças", "assunto", "fatura"),
+    ])
+    assert regras.categoria("a@banco.com") == "Primeira"
+    assert regras.categoria(assunto="Sua fatura") == "Faturas"
+
+def test_campos_avaliados_na_ordem_remetente_list_id_assunto_corpo():
+    regras = ClassificadorRegras([
+        ("Corpo", "corpo", "oferta"),
+        ("Assunto", "assunto", "oferta"),
+        ("Lista", "list_id", "ofertas.loja.com"),
+        ("Remetente", "remetente", "loja.com"),
+    ])
+    assert regras.categoria("a@loja.com", "<ofertas.loja.com>", "oferta", "oferta") == "Remetente"
+    assert regras.categoria("a@x.com", "<ofertas.loja.com>", "oferta", "oferta") == "Lista"
+    assert regras.categoria("a@x.com", "", "oferta", "oferta") == "Assunto"
+    assert regras.categoria("a@x.com", "", "", "oferta") == "Corpo"
+
+def test_regras_invalidas_sao_ignoradas():
+    regras = ClassificadorRegras([("X", "remetente", "  "), ("Y", "cabecalho", "z"), ("Z", "assunto", None)])
+    assert regras.vazio
+    assert not ClassificadorRegras([("X", "corpo", "z")]).vazio
+
+# ===============================
+# CABEÇALHOS
+# ===============================
+class IndiceFixo:
+    """IndiceRemetentes de teste: uma categoria para qualquer remetente"""
+
+    def __init__(self, categoria):
+        self._categoria = categoria
+
+    def categoria(self, remetente):
+        return self._categoria
+
+REGISTRO = {'assunto': 'Boleto do projeto', 'remetente': 'ana@empresa.com', 'list_id': ''}
+
+def test_cabecalhos_regras_depois_indice_depois_palavras():
+    regras = ClassificadorRegras([("Empresa", "remetente", "empresa.com")])
+    assert classificar_por_cabecalhos(REGISTRO, regras, IndiceFixo("Aprendida")) == "Empresa"
+    assert classificar_por_cabecalhos(REGISTRO, ClassificadorRegras([]), IndiceFixo("Aprendida")) == "Aprendida"
+    assert classificar_por_cabecalhos(REGISTRO, None, IndiceFixo(None)) == "Faturas"
+
+def test_cabecalhos_sem_palavras_deixa_para_o_corpo():
+    assert classificar_por_cabecalhos(REGISTRO, palavras=False) is None
+
+def test_cabecalhos_nao_procuram_palavras_no_remetente():
+    # "contato@" contém "conta", palavra de Faturas
+    registro = {'assunto': 'Olá', 'remetente': 'contato@loja.com', 'list_id': ''}
+    assert classificar_por_cabecalhos(registro) is None
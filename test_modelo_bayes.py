@@ -0,0 +1,98 @@
+"""
+Testes do classificador Naive Bayes por usuário: treino incremental no
+SQLite, carga do modelo, previsão com confiança mínima e pontuação em blocos.
+
+    python -m pytest -q test_modelo_bayes.py
+"""
+import numpy as np
+import pytest
+
+import modelo_bayes
+from modelo_bayes import ModeloBayes, resumo_modelo, texto_do_email, treinar
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """organizer.db temporário com a tabela dos modelos"""
+    monkeypatch.setattr(modelo_bayes, 'DB_PATH', str(tmp_path / 'organizer.db'))
+    modelo_bayes.init_tabela_bayes()
+
+FATURAS = ["boleto vence amanhã pague pelo pix", "segunda via do boleto da fatura", "pagamento da fatura confirmado"]
+TRABALHO = ["pauta da reunião de projeto", "relatório do projeto em anexo", "reunião com o cliente sobre o projeto"]
+
+def exemplos(repeticoes=10):
+    return [("Faturas", t) for t in FATURAS * repeticoes] + [("Trabalho", t) for t in TRABALHO * repeticoes]
+
+# ===============================
+# TREINO E CARGA
+# ===============================
+def test_treinar_soma_as_contagens(banco):
+    assert treinar("ana", exemplos()) == 60
+    assert treinar("ana", [("Faturas", "outro boleto"), (None, "sem pasta")]) == 1
+
+    assert resumo_modelo("ana") == {"Faturas": 31, "Trabalho": 30}
+    assert resumo_modelo("bia") == {}
+
+def test_carregar_exige_duas_categorias_com_exemplos_suficientes(banco):
+    treinar("ana", [("Faturas", t) for t in FATURAS * 10])
+    assert ModeloBayes.carregar("ana") is None
+
+    treinar("ana", [("Trabalho", t) for t in TRABALHO])
+    assert ModeloBayes.carregar("ana") is None  # 3 < MIN_DOCUMENTOS
+    assert ModeloBayes.carregar("ana", min_documentos=3) is not None
+
+def test_versao_muda_a_cada_treino(banco):
+    treinar("ana", exemplos())
+    primeira = ModeloBayes.carregar("ana")
+    assert ModeloBayes.carregar("ana").versao == primeira.versao
+
+    treinar("ana", [("Faturas", "boleto")])
+    assert ModeloBayes.carregar("ana").versao != primeira.versao
+
+def test_contagens_gravadas_e_lidas_sem_perda(banco):
+    contagens = np.zeros(modelo_bayes.NUM_FEATURES, dtype=np.int64)
+    contagens[[0, 7, modelo_bayes.NUM_FEATURES - 1]] = [1, 70000, 0xFFFFFFFF + 5]
+
+    lidas = modelo_bayes._ler_contagens(modelo_bayes._gravar_contagens(contagens))
+    assert lidas[0] == 1 and lidas[7] == 70000
+    assert lidas[-1] == 0xFFFFFFFF  # Saturada em uint32, não volta a zero
+
+# ===============================
+# PREVISÃO
+# ===============================
+def test_prever_categoria_pelas_palavras(banco):
+    treinar("ana", exemplos())
+    modelo = ModeloBayes.carregar("ana")
+
+    assert modelo.categorias == ["Faturas", "Trabalho"]
+    assert modelo.prever(["Boleto da fatura de março", "Reunião do projeto amanhã"]) == ["Faturas", "Trabalho"]
+
+def test_prever_devolve_none_abaixo_da_confianca(banco):
+    treinar("ana", exemplos())
+    modelo = ModeloBayes.carregar("ana")
+
+    # Sem palavras conhecidas só restam as prioris (iguais): 50%
+    assert modelo.prever(["xyz"]) == [None]
+    assert modelo.prever(["xyz"], confianca_minima=0.5) == ["Faturas"]
+    assert modelo.prever([]) == []
+
+def test_probabilidades_somam_um(banco):
+    treinar("ana", exemplos())
+    probabilidades = ModeloBayes.carregar("ana").probabilidades(["boleto", "", "projeto boleto"])
+
+    assert probabilidades.shape == (3, 2)
+    assert probabilidades.sum(axis=1) == pytest.approx([1, 1, 1])
+
+def test_pontuacao_em_blocos_igual_a_de_um_bloco_so(banco, monkeypatch):
+    treinar("ana", exemplos())
+    modelo = ModeloBayes.carregar("ana")
+    textos = ["boleto " * 7, "", "projeto relatório cliente", "fatura", "reunião " * 5 + "pix"]
+    inteiro = modelo.probabilidades(textos)
+
+    # Blocos de 3 palavras: textos cruzam blocos e o texto vazio fica só com a priori
+    monkeypatch.setattr(modelo_bayes, 'PALAVRAS_POR_BLOCO', 3)
+    assert modelo.probabilidades(textos) == pytest.approx(inteiro)
+
+def test_texto_do_email_usa_assunto_e_comeco_do_corpo():
+    email = {'assunto': 'Fatura', 'corpo': 'x' * (modelo_bayes.LIMITE_CARACTERES + 10)}
+    assert texto_do_email(email) == "Fatura " + "x" * modelo_bayes.LIMITE_CARACTERES
+    assert texto_do_email({'assunto': None, 'corpo': None}) == " "
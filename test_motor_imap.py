@@ -0,0 +1,151 @@
+"""
+Testes do motor IMAP sem rede: conjuntos de UIDs, leitura de respostas
+FETCH, escolha da parte de texto pelo BODYSTRUCTURE, nomes de pasta em
+UTF-7 modificado e checkpoints por UID.
+
+    python -m pytest -q test_motor_imap.py
+"""
+import pytest
+
+import motor_imap
+from motor_imap import (
+    compactar_conjunto, corpo_da_parte, decodificar_utf7_imap, dividir_em_lotes, ler_resposta_fetch,
+    limite_do_checkpoint, localizar_parte_texto, nome_pasta_imap, obter_item
+)
+
+# ===============================
+# DADOS DE EXEMPLO
+# ===============================
+# Resposta de um UID FETCH com três mensagens, no formato do imaplib
+# (literais em tuplas, FLAGS depois do literal, BODYSTRUCTURE sem literal)
+RESPOSTA_FETCH = [
+    (b'1 (UID 101 BODY[HEADER.FIELDS (SUBJECT)] {16}', b'Subject: Oi\r\n\r\n'),
+    b' FLAGS (\\Seen))',
+    (b'2 (UID 102 BODY[1]<0> {5}', b'corpo'),
+    b')',
+    b'3 (UID 103 BODYSTRUCTURE (("TEXT" "HTML" ("CHARSET" "utf-8") NIL NIL "BASE64" 20 1 NIL NIL NIL)'
+    b'("TEXT" "PLAIN" ("CHARSET" "iso-8859-1") NIL NIL "QUOTED-PRINTABLE" 10 1 NIL NIL NIL) "ALTERNATIVE"))',
+]
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """organizer.db temporário com as tabelas do motor"""
+    monkeypatch.setattr(motor_imap, 'DB_PATH', str(tmp_path / 'organizer.db'))
+    motor_imap.init_tabelas_motor()
+
+# ===============================
+# CONJUNTOS DE IDS
+# ===============================
+def test_compactar_conjunto_junta_faixas_consecutivas():
+    assert compactar_conjunto([5, 1, 2, 3, 9, 10, 7]) == "1:3,5,7,9:10"
+
+def test_compactar_conjunto_aceita_bytes_e_repetidos():
+    assert compactar_conjunto([b'4', b'3', '3', 4]) == "3:4"
+    assert compactar_conjunto([]) == ""
+
+def test_dividir_em_lotes_preserva_a_ordem():
+    assert list(dividir_em_lotes([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+
+# ===============================
+# LEITURA DE RESPOSTAS FETCH
+# ===============================
+def test_ler_resposta_fetch_separa_mensagens_e_literais():
+    mensagens = dict(ler_resposta_fetch(RESPOSTA_FETCH))
+
+    assert sorted(mensagens) == [1, 2, 3]
+    assert mensagens[1]['UID'] == '101'
+    assert mensagens[1]['BODY[HEADER.FIELDS (SUBJECT)]'] == b'Subject: Oi\r\n\r\n'
+    assert mensagens[1]['FLAGS'] == ['\\Seen']
+    assert obter_item(mensagens[2], 'BODY[') == b'corpo'
+
+def test_ler_resposta_fetch_monta_listas_aninhadas():
+    estrutura = dict(ler_resposta_fetch(RESPOSTA_FETCH))[3]['BODYSTRUCTURE']
+
+    assert estrutura[-1] == 'ALTERNATIVE'
+    assert estrutura[0][:2] == ['TEXT', 'HTML']
+    assert estrutura[1][2] == ['CHARSET', 'iso-8859-1']
+    assert estrutura[1][3] is None
+
+def test_ler_resposta_fetch_ignora_linhas_soltas():
+    assert list(ler_resposta_fetch([None, b'lixo antes da resposta'])) == []
+
+# ===============================
+# ESCOLHA DA PARTE DE TEXTO
+# ===============================
+def test_localizar_parte_texto_prefere_text_plain():
+    estrutura = dict(ler_resposta_fetch(RESPOSTA_FETCH))[3]['BODYSTRUCTURE']
+
+    assert localizar_parte_texto(estrutura) == ("2", "PLAIN", "QUOTED-PRINTABLE", "iso-8859-1")
+
+def test_localizar_parte_texto_usa_html_sem_text_plain():
+    estrutura = [['TEXT', 'HTML', ['CHARSET', 'utf-8'], None, None, '7BIT', '10', '1', None, None, None],
+                 ['IMAGE', 'PNG', ['NAME', 'a.png'], None, None, 'BASE64', '99', None, None, None], 'MIXED']
+
+    assert localizar_parte_texto(estrutura) == ("1", "HTML", "7BIT", "utf-8")
+
+def test_localizar_parte_texto_ignora_anexos_e_percorre_subpartes():
+    anexo = ['TEXT', 'PLAIN', ['CHARSET', 'utf-8'], None, None, '7BIT', '10', '1', None,
+             ['ATTACHMENT', ['FILENAME', 'notas.txt']], None]
+    alternativa = [['TEXT', 'PLAIN', ['CHARSET', 'utf-8'], None, None, 'BASE64', '10', '1', None, None, None],
+                   'ALTERNATIVE']
+    estrutura = [anexo, alternativa, 'MIXED']
+
+    assert localizar_parte_texto(estrutura) == ("2.1", "PLAIN", "BASE64", "utf-8")
+
+def test_localizar_parte_texto_sem_texto():
+    assert localizar_parte_texto(['IMAGE', 'JPEG', None, None, None, 'BASE64', '10']) is None
+
+def test_corpo_da_parte_decodifica_charset_e_html():
+    itens = {'BODY[2]<0>': b'Reuni=E3o amanh=E3'}
+    assert corpo_da_parte(itens, ("2", "PLAIN", "QUOTED-PRINTABLE", "iso-8859-1")) == "Reunião amanhã"
+
+    itens = {'BODY[1]<0>': b'<p>Ol\xc3\xa1</p><style>p {}</style><p>mundo</p>'}
+    assert corpo_da_parte(itens, ("1", "HTML", "7BIT", "utf-8")) == "Olá mundo"
+
+# ===============================
+# NOMES DE PASTA (UTF-7 MODIFICADO)
+# ===============================
+@pytest.mark.parametrize("pasta", ["Faturas", "Promoções & Ofertas", "Trabalho/Relatórios", "日本語", "a&b"])
+def test_nome_pasta_imap_ida_e_volta(pasta):
+    nome = nome_pasta_imap(pasta)
+
+    assert nome.startswith('"') and nome.endswith('"')
+    assert nome.isascii()
+    assert decodificar_utf7_imap(nome[1:-1]) == pasta
+
+def test_nome_pasta_imap_codifica_como_o_gmail():
+    assert nome_pasta_imap("Promoções & Ofertas") == '"Promo&AOcA9Q-es &- Ofertas"'
+
+# ===============================
+# CHECKPOINTS POR UID
+# ===============================
+def test_limite_do_checkpoint_para_antes_do_primeiro_erro():
+    assert limite_do_checkpoint([1, 2, 3, 4, 5], [3, 5]) == 2
+    assert limite_do_checkpoint([1, 2, 3], []) == 3
+    assert limite_do_checkpoint([3], [3]) is None
+
+def test_limite_do_checkpoint_passa_dos_esgotados():
+    assert limite_do_checkpoint([1, 2, 3, 4, 5], [3, 5], esgotados={3}) == 4
+
+def test_avancar_checkpoint_nunca_retrocede(banco):
+    motor_imap.salvar_checkpoint('a@x', 'INBOX', 7, 0)
+    motor_imap.avancar_checkpoint('a@x', 'INBOX', 50)
+    motor_imap.avancar_checkpoint('a@x', 'INBOX', 20)
+
+    assert motor_imap.obter_checkpoint('a@x', 'INBOX') == {'uidvalidity': 7, 'ultimo_uid': 50}
+
+def test_checkpoint_em_vigor_reinicia_com_outro_uidvalidity(banco):
+    motor_imap.salvar_checkpoint('a@x', 'INBOX', 7, 50)
+
+    assert motor_imap.checkpoint_em_vigor('a@x', 'INBOX', 7)['ultimo_uid'] == 50
+    assert motor_imap.checkpoint_em_vigor('a@x', 'INBOX', 8) is None
+    assert motor_imap.obter_checkpoint('a@x', 'INBOX') == {'uidvalidity': 8, 'ultimo_uid': 0}
+
+def test_registrar_falhas_uid_esgota_apos_o_maximo(banco):
+    for _ in range(motor_imap.MAX_TENTATIVAS_UID - 1):
+        assert motor_imap.registrar_falhas_uid('a@x', 'INBOX', [5, 7]) == set()
+    assert motor_imap.registrar_falhas_uid('a@x', 'INBOX', [5, 7]) == {5, 7}
+
+    # O checkpoint passou do UID 5: as falhas dele são esquecidas
+    motor_imap.limpar_falhas_uid('a@x', 'INBOX', 6)
+    assert motor_imap.registrar_falhas_uid('a@x', 'INBOX', [5, 7]) == {7}
@@ -0,0 +1,91 @@
+"""
+Testes da leitura limitada de mensagens: escolha da parte de texto,
+decodificação (charset, quoted-printable, base64), anexos e extração de
+texto de mensagens só com HTML.
+
+    python -m pytest -q test_parser_email.py
+"""
+import base64
+
+from parser_email import extrair_corpo, html_para_texto, ler_mensagem
+
+# ===============================
+# MENSAGENS DE EXEMPLO
+# ===============================
+MULTIPART_ALTERNATIVA = (
+    b'Subject: =?utf-8?q?Reuni=C3=A3o?=\r\n'
+    b'Content-Type: multipart/alternative; boundary="XX"\r\n'
+    b'\r\n'
+    b'--XX\r\n'
+    b'Content-Type: text/html; charset=utf-8\r\n'
+    b'\r\n'
+    b'<p>vers\xc3\xa3o html</p>\r\n'
+    b'--XX\r\n'
+    b'Content-Type: text/plain; charset=iso-8859-1\r\n'
+    b'Content-Transfer-Encoding: quoted-printable\r\n'
+    b'\r\n'
+    b'Ol=E1 mundo\r\n'
+    b'--XX--\r\n'
+)
+
+SO_HTML = (
+    b'Subject: Oferta\r\n'
+    b'Content-Type: text/html; charset=utf-8\r\n'
+    b'Content-Transfer-Encoding: base64\r\n'
+    b'\r\n'
+    + base64.b64encode(
+        '<html><head><title>t</title><style>p {color: red}</style></head>'
+        '<body><script>rastrear()</script><p>Café</p><div>com&nbsp;desconto</div></body></html>'.encode('utf-8')
+    )
+)
+
+SO_ANEXO = (
+    b'Content-Type: multipart/mixed; boundary="Y"\r\n'
+    b'\r\n'
+    b'--Y\r\n'
+    b'Content-Type: text/plain\r\n'
+    b'Content-Disposition: attachment; filename="notas.txt"\r\n'
+    b'\r\n'
+    b'conteudo do anexo\r\n'
+    b'--Y--\r\n'
+)
+
+# ===============================
+# EXTRAÇÃO DO CORPO
+# ===============================
+def test_extrair_corpo_prefere_text_plain_e_decodifica_charset():
+    assert extrair_corpo(MULTIPART_ALTERNATIVA) == "Olá mundo"
+
+def test_ler_mensagem_decodifica_o_assunto():
+    assert ler_mensagem(MULTIPART_ALTERNATIVA) == ("Reunião", "Olá mundo")
+
+def test_extrair_corpo_de_mensagem_so_com_html():
+    assert extrair_corpo(SO_HTML) == "Café com desconto"
+
+def test_extrair_corpo_ignora_anexos():
+    assert extrair_corpo(SO_ANEXO) == ""
+
+def test_extrair_corpo_respeita_o_limite():
+    assert extrair_corpo(b'Subject: x\r\n\r\n' + b'b' * 100, limite=10) == "b" * 10
+
+def test_extrair_corpo_de_prefixo_truncado():
+    # Prefixo baixado com BODY.PEEK[]<0.N>: o fim da parte não chegou
+    truncado = MULTIPART_ALTERNATIVA[:MULTIPART_ALTERNATIVA.index(b'mundo') + 2]
+    assert extrair_corpo(truncado) == "Olá mu"
+
+def test_extrair_corpo_vazio():
+    assert extrair_corpo(b'') == ""
+    assert extrair_corpo(None) == ""
+
+# ===============================
+# HTML → TEXTO
+# ===============================
+def test_html_para_texto_remove_script_style_e_cabecalho():
+    html = "<html><head><title>Título</title></head><body><style>.a{}</style><script>x()</script>Olá</body></html>"
+    assert html_para_texto(html) == "Olá"
+
+def test_html_para_texto_separa_blocos_e_decodifica_entidades():
+    assert html_para_texto("<p>a &amp; b</p><div>c</div>linha<br>seguinte") == "a & b c linha seguinte"
+
+def test_html_para_texto_para_no_limite():
+    assert html_para_texto("<p>" + "a" * 50000 + "</p><p>fim</p>", limite=10) == "a" * 10
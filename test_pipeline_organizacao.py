@@ -0,0 +1,77 @@
+"""
+Testes do pipeline busca → classificação → movimentação: ordem de
+chegada, filas limitadas (a busca espera a movimentação) e propagação de erros.
+
+    python -m pytest -q test_pipeline_organizacao.py
+"""
+import asyncio
+
+import pytest
+
+from pipeline_organizacao import executar_pipeline
+
+async def gerar(itens, produzidos=None):
+    """Origem assíncrona que anota quantos itens já entregou"""
+    for item in itens:
+        if produzidos is not None:
+            produzidos.append(item)
+        yield item
+        await asyncio.sleep(0)
+
+def classificar_paridade(lote):
+    return ["par" if n % 2 == 0 else "impar" for n in lote]
+
+def test_executar_pipeline_move_na_ordem_de_chegada():
+    movidos = []
+
+    async def mover(item, categoria):
+        movidos.append((item, categoria))
+
+    asyncio.run(executar_pipeline(gerar(range(250)), classificar_paridade, mover, profundidade=10))
+
+    assert movidos == [(n, "par" if n % 2 == 0 else "impar") for n in range(250)]
+
+def test_executar_pipeline_limita_a_busca_pela_profundidade():
+    produzidos = []
+    adiantamento = []
+
+    async def mover(item, categoria):
+        # Movimentação parada no primeiro item: a busca só pode encher as filas
+        if item == 0:
+            await asyncio.sleep(0.05)
+            adiantamento.append(len(produzidos))
+
+    asyncio.run(executar_pipeline(gerar(range(1000), produzidos), classificar_paridade, mover, profundidade=5))
+
+    # Duas filas de 5, o lote em classificação (no máximo 5 já retirados) e o item em movimentação
+    assert adiantamento[0] <= 5 + 5 + 5 + 2
+    assert len(produzidos) == 1000
+
+def test_executar_pipeline_chama_ocioso_quando_a_fila_esvazia():
+    eventos = []
+
+    async def mover(item, categoria):
+        eventos.append(item)
+
+    async def ocioso():
+        eventos.append("ocioso")
+
+    asyncio.run(executar_pipeline(gerar([1, 2, 3]), classificar_paridade, mover, ocioso=ocioso))
+
+    # A origem entrega um item por vez: a fila de movimentação esvazia entre eles
+    assert [e for e in eventos if e != "ocioso"] == [1, 2, 3]
+    assert eventos[:2] == [1, "ocioso"]
+
+def test_executar_pipeline_propaga_erro_e_cancela_as_etapas():
+    produzidos = []
+
+    def classificar_com_erro(lote):
+        raise ValueError("falha na classificação")
+
+    async def mover(item, categoria):
+        pass
+
+    with pytest.raises(ValueError):
+        asyncio.run(executar_pipeline(gerar(range(10000), produzidos), classificar_com_erro, mover, profundidade=5))
+
+    assert len(produzidos) < 10000
@@ -0,0 +1,61 @@
+"""
+Testes do motor de sentimento por léxico: polaridade média das palavras
+conhecidas, limites das categorias e negação da palavra seguinte.
+
+    python -m pytest -q test_sentimento.py
+"""
+import pytest
+
+from sentimento import (
+    FATOR_NEGACAO, LEXICO, LIMITE_NEGATIVO, LIMITE_POSITIVO, categoria_por_sentimento, categorias_por_sentimento,
+    polaridades
+)
+
+def test_polaridade_e_a_media_das_palavras_conhecidas():
+    nota = polaridades(["O pagamento falhou, problema urgente"])[0]
+    assert nota == pytest.approx((LEXICO["falhou"] + LEXICO["problema"] + LEXICO["urgente"]) / 3)
+
+def test_acentos_e_caixa_sao_ignorados():
+    assert polaridades(["PARABÉNS"])[0] == pytest.approx(LEXICO["parabens"])
+
+def test_texto_sem_palavras_conhecidas_e_neutro():
+    assert polaridades(["Reunião amanhã às 10h", "", None]).tolist() == [0.0, 0.0, 0.0]
+    assert categorias_por_sentimento(["Reunião amanhã às 10h", "", None]) == ["Neutros"] * 3
+
+def test_lote_vazio():
+    assert polaridades([]).shape == (0,)
+    assert categorias_por_sentimento([]) == []
+
+# ===============================
+# LIMITES DAS CATEGORIAS
+# ===============================
+def test_limites_das_categorias():
+    assert LIMITE_NEGATIVO < 0 < LIMITE_POSITIVO
+    assert categoria_por_sentimento("Excelente trabalho, parabéns!") == "Positivos"
+    assert categoria_por_sentimento("Infelizmente o pedido foi cancelado") == "Problemas"
+
+def test_limites_sao_exclusivos():
+    # "seguro" vale exatamente LIMITE_POSITIVO: só acima dele é positivo
+    assert LEXICO["seguro"] == LIMITE_POSITIVO
+    assert categoria_por_sentimento("seguro") == "Neutros"
+    assert categoria_por_sentimento("bom") == "Positivos"
+
+def test_lote_classifica_cada_texto_separadamente():
+    assert categorias_por_sentimento(["ótimo", "péssimo", "reunião"]) == ["Positivos", "Problemas", "Neutros"]
+
+# ===============================
+# NEGAÇÃO
+# ===============================
+def test_negacao_inverte_a_palavra_seguinte():
+    assert polaridades(["não gostei"])[0] == pytest.approx(LEXICO["gostei"] * FATOR_NEGACAO)
+    assert categoria_por_sentimento("gostei") == "Positivos"
+    assert categoria_por_sentimento("não gostei") == "Problemas"
+    assert categoria_por_sentimento("not good") == "Problemas"
+
+def test_negacao_vale_so_para_a_palavra_seguinte():
+    # "é" é a palavra negada; "ruim" mantém a polaridade
+    assert polaridades(["não é ruim"])[0] == pytest.approx(LEXICO["ruim"])
+
+def test_negacao_nao_passa_para_o_texto_seguinte_do_lote():
+    notas = polaridades(["o serviço? não", "bom"])
+    assert notas[1] == pytest.approx(LEXICO["bom"])